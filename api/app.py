@@ -1,29 +1,44 @@
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, Response, request, jsonify, send_file
 from huggingface_hub import InferenceClient
 from flask_cors import CORS
 import fitz  # PyMuPDF
 import os
 import json
+import contextvars
 import re
+import gzip
+import sys
+import threading
+import time
 from dotenv import load_dotenv
-import yfinance as yf
-from yahooquery import search
 from datetime import datetime
 
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak, Image
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.graphics.shapes import Drawing, Rect
-from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT, TA_JUSTIFY
-from reportlab.graphics.charts.linecharts import HorizontalLineChart
-from reportlab.graphics.charts.barcharts import VerticalBarChart
-from reportlab.graphics.charts.piecharts import Pie
-import matplotlib.pyplot as plt
-import matplotlib.patches as mpatches
 from io import BytesIO
-import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+from prompts import (FINANCIAL_DATA_SCHEMA, FINANCIAL_DATA_EXTRACTION_PROMPT, FINANCIAL_QA_PROMPT,
+                     COMPREHENSIVE_REPORT_PROMPT, REPORT_SECTION_PROMPT, prompt_cache_key)
+from services.json_parsing import parse_json_tolerant, missing_fields, schema_subset, merge_json, to_json_schema
+from services.normalization import to_number
+from services.extraction_cascade import CASCADE_BACKEND, run_cascade, local_generate, cascade_stats
+from services.metrics_warehouse import MetricsWarehouse, file_signature
+from services.catalog import Catalog, backfill
+from services.artifact_store import ArtifactStore, MIMETYPES as ARTIFACT_MIMETYPES
+from services.document_store import DocumentStore, document_id
+from services.market_cache import symbol_cache, quote_cache
+from services.market_data import fetch_company_infos, get_provider
+from services.charts import render_chart, render_svg, chart_cache, ChartCache, CHART_DPI
+from services.symbol_index import symbol_index
+from services.report_templates import sections_from_text
+from services.report_build import (build_pdf_report, financial_chart_spec, format_number, format_percentage,
+                                   report_chart_data, report_company_rows, report_metric_rows)
+from services.analysis_store import AnalysisStore, analysis_key, market_data_hash
+from services.report_html import VIEW_FORMATS, VIEW_RENDERERS, view_etag
+from services.instrumentation import (span, record_tokens, register_collector, start_request, finish_request,
+                                      render_prometheus, stats as instrumentation_stats)
+from services.report_batch import run_batch, BATCH_REPORT_CONCURRENCY, BATCH_REPORT_PROCESSES, BATCH_REPORT_MAX_ITEMS
+from services.market_snapshots import (SnapshotStore, MarketRefresher, MARKET_REFRESH_ENABLED,
+                                       MARKET_REFRESH_FILED_COMPANIES, MARKET_SNAPSHOT_MAX_AGE_SECONDS)
 
 # Load environment variables
 load_dotenv()
@@ -47,99 +62,163 @@ os.makedirs(FINANCIAL_DATA_FOLDER, exist_ok=True)
 os.makedirs(REPORTS_FOLDER, exist_ok=True)
 os.makedirs(PDF_REPORTS_FOLDER, exist_ok=True)
 
-# Global storage for current document's financial data
-current_financial_data = {}
-current_pdf_text = ""
+# "single" asks one completion for the whole report, "sectioned" fans the
+# sections out as concurrent calls (see generate_sectioned_report)
+REPORT_GENERATION_MODE = os.getenv("REPORT_GENERATION_MODE", "single")
+REPORT_SECTION_WORKERS = int(os.getenv("REPORT_SECTION_WORKERS", "5"))
+# Report refresh (?refresh=true) keeps the previous narrative and only asks the
+# model for a new valuation section once the price has moved more than this
+REPORT_REFRESH_PRICE_MOVE_PERCENT = float(os.getenv("REPORT_REFRESH_PRICE_MOVE_PERCENT", "5"))
+
+# Processed documents by doc id, shared by every worker process
+document_store = DocumentStore()
+# Requests must name their document (?doc_id= from /upload-pdf). Single-user setups
+# can opt into falling back to the most recent upload, whoever made it
+DOCUMENT_FALLBACK_TO_LATEST = os.getenv("DOCUMENT_FALLBACK_TO_LATEST", "false").lower() == "true"
+
+# Index of generated reports and extractions, so listings never scan the folders
+catalog = Catalog()
+
+# Generated reports, deduplicated by content hash, compressed and pruned by the
+# retention policy; files in the old report folders are moved in by run_maintenance
+artifact_store = ArtifactStore(catalog, legacy_folders={
+  "pdf_report": PDF_REPORTS_FOLDER,
+  "json_report": REPORTS_FOLDER,
+  "pdf_data": REPORTS_FOLDER
+})
+
+# Point-in-time market data; the refresher keeps watched companies fresh off the request path
+snapshot_store = SnapshotStore()
+
+# Report analyses (market data + model text), rendered to JSON/PDF on demand
+analysis_store = AnalysisStore()
+
+# Rendered HTML/Markdown views (plain and gzipped) and gzipped /report envelopes by ETag;
+# same size-bounded LRU as charts
+view_cache = ChartCache(max_bytes=int(os.getenv("VIEW_CACHE_MAX_BYTES", str(16 * 1024 * 1024))))
+
+# Columnar table of every extracted metric, synced from FINANCIAL_DATA_FOLDER
+metrics_warehouse = MetricsWarehouse()
+metrics_warehouse_synced = False
+
+
+# Set when the inference provider rejects response_format; constrained decoding
+# is probed again once this time has passed
+json_mode_disabled_until = 0.0
+JSON_MODE_RETRY_SECONDS = float(os.getenv("JSON_MODE_RETRY_SECONDS", "3600"))
+
+
+def llm_completion(purpose, **kwargs):
+  """client.chat.completions.create, timed as stage llm.<purpose> and its token usage counted."""
+  with span(f"llm.{purpose}"):
+    response = client.chat.completions.create(**kwargs)
+  record_tokens(purpose, response)
+  return response
 
 
 def safe_json_loads(raw_text):
-  """Extract JSON from raw text and parse it safely."""
-  if not raw_text or not raw_text.strip():
-    return {}
+  """Extract JSON from raw text and parse it safely, recovering truncated objects."""
+  data, _ = parse_json_tolerant(raw_text)
+  return data
+
 
-  # Try to find JSON block inside text
-  match = re.search(r'\{.*\}', raw_text, re.DOTALL)
-  if match:
+def create_json_completion(messages, schema, max_tokens):
+  """Run a chat completion constrained to the schema when the provider supports it."""
+  global json_mode_disabled_until
+
+  if time.time() >= json_mode_disabled_until:
     try:
-      return json.loads(match.group())
-    except json.JSONDecodeError:
-      pass
+      return llm_completion(
+        "extraction",
+        model="meta-llama/Llama-3.2-3B-Instruct",
+        messages=messages,
+        max_tokens=max_tokens,
+        temperature=0.1,
+        response_format={
+          "type": "json_schema",
+          "json_schema": {"name": "financial_data", "schema": to_json_schema(schema)}
+        }
+      )
+    except Exception as e:
+      # Only a 400/422 means response_format itself was refused; timeouts, 429s and 5xx are transient
+      status = getattr(getattr(e, "response", None), "status_code", None)
+      if status in (400, 422):
+        json_mode_disabled_until = time.time() + JSON_MODE_RETRY_SECONDS
+      print(f"Constrained decoding failed ({status}), retrying without response_format: {e}")
+
+  return llm_completion(
+    "extraction",
+    model="meta-llama/Llama-3.2-3B-Instruct",
+    messages=messages,
+    max_tokens=max_tokens,
+    temperature=0.1
+  )
 
-  return {}
+
+def repair_financial_data(text, missing):
+  """Ask the model again for the missing fields only."""
+  subset = schema_subset(FINANCIAL_DATA_SCHEMA, missing)
+
+  # Same static prefix and document as the full extraction, only the suffix differs
+  repair_request = f"""A previous extraction from this financial document is missing or inconsistent for some fields.
+Return JSON containing ONLY the following structure:
+{json.dumps(subset, indent=2)}"""
+
+  repair_messages = FINANCIAL_DATA_EXTRACTION_PROMPT.messages(document=text, question=repair_request)
+
+  repair_response = create_json_completion(repair_messages, subset, max_tokens=512)
+  repaired, _ = parse_json_tolerant(repair_response.choices[0].message.content)
+  return repaired
 
 
 def extract_financial_data(text):
+  """Extract financial data, trying the local model first when the cascade is enabled."""
+  if not CASCADE_BACKEND:
+    return extract_financial_data_remote(text)
+
+  result, cascade_info = run_cascade(
+    text,
+    FINANCIAL_DATA_SCHEMA,
+    local_extract=extract_financial_data_local,
+    remote_extract=extract_financial_data_remote,
+    remote_repair=repair_financial_data
+  )
+  result["cascade"] = cascade_info
+  return result
+
+
+def extract_financial_data_local(text):
+  """Extract financial data with the configured local model."""
+  raw_content = local_generate(FINANCIAL_DATA_EXTRACTION_PROMPT.render(document=text), to_json_schema(FINANCIAL_DATA_SCHEMA))
+  extracted_data, _ = parse_json_tolerant(raw_content)
+  return extracted_data, raw_content
+
+
+def extract_financial_data_remote(text):
   """Extract comprehensive financial data from the full document text."""
   try:
-    extraction_instruction = f"""
-        Analyze this financial document and extract ALL available financial information.
-        Return a comprehensive JSON with the following structure:
-        {{
-          "company_info": {{
-            "name": "company name if found",
-            "sector": "industry/sector if mentioned",
-            "fiscal_year": "fiscal year period"
-          }},
-          "revenue_data": {{
-            "total_revenue": "current period revenue",
-            "revenue_growth": "growth rate or change",
-            "revenue_breakdown": "any segment breakdown"
-          }},
-          "profitability": {{
-            "gross_profit": "gross profit amount",
-            "operating_profit": "operating profit/EBIT",
-            "net_income": "net income/profit",
-            "profit_margins": "any margin percentages"
-          }},
-          "financial_position": {{
-            "total_assets": "total assets value",
-            "total_liabilities": "total liabilities",
-            "shareholders_equity": "equity amount",
-            "cash_position": "cash and equivalents"
-          }},
-          "cash_flow": {{
-            "operating_cash_flow": "cash from operations",
-            "free_cash_flow": "free cash flow",
-            "capex": "capital expenditures"
-          }},
-          "key_metrics": {{
-            "eps": "earnings per share",
-            "pe_ratio": "price to earnings if mentioned",
-            "debt_to_equity": "debt ratios",
-            "roe": "return on equity"
-          }},
-          "risks_and_outlook": {{
-            "key_risks": "main risk factors mentioned",
-            "guidance": "forward guidance or outlook",
-            "market_conditions": "market commentary"
-          }}
-        }}
-
-        If any field is not available in the document, set it to null.
-        Extract specific numbers, percentages, and monetary values.
-
-        Document text: {text}
-        """
-
-    extraction_messages = [
-      {"role": "system",
-       "content": "You are an expert financial analyst. Extract all financial information comprehensively and accurately from documents."},
-      {"role": "user", "content": extraction_instruction}
-    ]
+    extraction_messages = FINANCIAL_DATA_EXTRACTION_PROMPT.messages(document=text)
 
-    extraction_response = client.chat.completions.create(
-      model="meta-llama/Llama-3.2-3B-Instruct",
-      messages=extraction_messages,
-      max_tokens=1024,
-      temperature=0.1
-    )
+    extraction_response = create_json_completion(extraction_messages, FINANCIAL_DATA_SCHEMA, max_tokens=1024)
 
     raw_content = extraction_response.choices[0].message.content
-    extracted_data = safe_json_loads(raw_content)
+    extracted_data, _ = parse_json_tolerant(raw_content)
+
+    # Only re-ask for what is missing instead of redoing the whole extraction
+    missing = missing_fields(extracted_data, FINANCIAL_DATA_SCHEMA)
+    still_missing = missing
+    if missing:
+      try:
+        extracted_data = merge_json(extracted_data, repair_financial_data(text, missing))
+        still_missing = missing_fields(extracted_data, FINANCIAL_DATA_SCHEMA)
+      except Exception as e:
+        print(f"Error repairing missing fields: {e}")
 
     return {
       "financial_data": extracted_data,
       "extraction_success": bool(extracted_data),
+      "extraction_complete": not still_missing,
+      "repaired_fields": [field for field in missing if field not in still_missing],
       "raw_model_output": raw_content
     }
 
@@ -153,145 +232,129 @@ def extract_financial_data(text):
 
 
 def company_name_to_symbol(company_name):
-  """Convert company name to stock symbol using Yahoo Query."""
-  try:
-    results = search(company_name)
-    symbols = [quote['symbol'] for quote in results.get('quotes', [])]
-    return symbols if symbols else []
-  except Exception as e:
-    print(f"Error searching for company: {e}")
-    return []
+  """Convert company name to stock symbol.
 
+  Exact matches in the local symbol index are answered offline; anything
+  else goes to the market data provider's search (cached, see market_cache),
+  with the index's fuzzy matches as the fallback when the search finds nothing.
+  """
+  matches = symbol_index.lookup(company_name)
+  if matches and matches[0]["score"] == 1.0:
+    return [match["symbol"] for match in matches if match["score"] == 1.0]
 
-def get_company_info_for_symbols(symbols):
-  """Get detailed company information from Yahoo Finance."""
-  info_list = []
-  for symbol in symbols:
-    try:
-      ticker = yf.Ticker(symbol)
-      info = ticker.info
-      company_data = {
-        'symbol': symbol,
-        'longName': info.get('longName', 'N/A'),
-        'sector': info.get('sector', 'N/A'),
-        'industry': info.get('industry', 'N/A'),
-        'website': info.get('website', 'N/A'),
-        'description': info.get('longBusinessSummary', 'N/A'),
-        'marketCap': info.get('marketCap', 'N/A'),
-        'regularMarketPrice': info.get('regularMarketPrice', 'N/A'),
-        'regularMarketChangePercent': info.get('regularMarketChangePercent', 'N/A'),
-        'trailingPE': info.get('trailingPE', 'N/A'),
-        'forwardPE': info.get('forwardPE', 'N/A'),
-        'beta': info.get('beta', 'N/A'),
-        'dividendYield': info.get('dividendYield', 'N/A'),
-        'profitMargins': info.get('profitMargins', 'N/A'),
-        'revenueGrowth': info.get('revenueGrowth', 'N/A'),
-        'earningsGrowth': info.get('earningsGrowth', 'N/A'),
-        'debtToEquity': info.get('debtToEquity', 'N/A'),
-        'returnOnEquity': info.get('returnOnEquity', 'N/A'),
-        'currentRatio': info.get('currentRatio', 'N/A'),
-        'quickRatio': info.get('quickRatio', 'N/A')
-      }
-      info_list.append(company_data)
-    except Exception as e:
-      print(f"Error getting info for {symbol}: {e}")
-      continue
-  return info_list
-
-
-def format_number(value):
-  """Format large numbers for better readability."""
-  if value == 'N/A' or value is None or value == '':
-    return 'N/A'
+  def load():
+    with span("market_data.search"):
+      return get_provider().search(company_name)
 
   try:
-    num = float(value)
-    if num >= 1e12:
-      return f"${num / 1e12:.2f}T"
-    elif num >= 1e9:
-      return f"${num / 1e9:.2f}B"
-    elif num >= 1e6:
-      return f"${num / 1e6:.2f}M"
-    elif num >= 1e3:
-      return f"${num / 1e3:.2f}K"
-    else:
-      return f"${num:.2f}"
-  except:
-    return str(value)
+    symbols = list(symbol_cache.get_or_load(company_name.strip().lower(), load))
+  except Exception as e:
+    print(f"Error searching for company: {e}")
+    symbols = []
+  return symbols or [match["symbol"] for match in matches]
 
 
-def format_percentage(value):
-  """Format percentage values."""
-  if value == 'N/A' or value is None or value == '':
-    return 'N/A'
-  try:
-    num_val = float(value)
-    if abs(num_val) <= 1:
-      return f"{num_val * 100:.2f}%"
-    else:
-      return f"{num_val:.2f}%"
-  except:
-    return str(value)
+def fetch_company_info(symbol):
+  """Get detailed company information for one symbol, bounded by the market data deadline."""
+  with span("market_data.fetch"):
+    result = fetch_company_infos([symbol])[symbol]
+  if result["status"] != "ok":
+    raise RuntimeError(f"{result['status']}: {result['error']}")
+  snapshot_store.record(symbol, result["data"])
+  return result["data"]
 
 
-def create_financial_chart(data, chart_type="bar"):
-  """Create financial charts using matplotlib and return as image."""
-  plt.style.use('seaborn-v0_8')
-  fig, ax = plt.subplots(figsize=(10, 6))
-
-  if chart_type == "bar" and data:
-    # Create a sample financial metrics chart
-    metrics = list(data.keys())[:6]  # Take first 6 metrics
-    values = []
-
-    for metric in metrics:
-      val = data[metric]
-      if val and val != 'N/A':
-        try:
-          # Extract numeric value from formatted strings
-          if isinstance(val, str):
-            if '%' in val:
-              values.append(float(val.replace('%', '')))
-            elif '$' in val:
-              # Handle billion/million notations
-              val_clean = val.replace('$', '').replace(',', '')
-              if 'B' in val_clean:
-                values.append(float(val_clean.replace('B', '')) * 1000)
-              elif 'M' in val_clean:
-                values.append(float(val_clean.replace('M', '')))
-              else:
-                values.append(float(val_clean))
-            else:
-              values.append(float(val))
-          else:
-            values.append(float(val))
-        except:
-          values.append(0)
-      else:
-        values.append(0)
+def get_company_info(symbol):
+  """Cached company information for one symbol, or None if it cannot be fetched."""
+  try:
+    return dict(quote_cache.get_or_load(symbol, lambda: fetch_company_info(symbol)))
+  except Exception as e:
+    print(f"Error getting info for {symbol}: {e}")
+    return None
 
-    if values:
-      bars = ax.bar(metrics, values, color=['#2E86AB', '#A23B72', '#F18F01', '#C73E1D', '#4CAF50', '#9C27B0'])
-      ax.set_title('Key Financial Metrics', fontsize=16, fontweight='bold')
-      ax.set_ylabel('Value', fontsize=12)
-      plt.xticks(rotation=45, ha='right')
 
-      # Add value labels on bars
-      for bar, value in zip(bars, values):
-        height = bar.get_height()
-        ax.text(bar.get_x() + bar.get_width() / 2., height,
-                f'{value:.1f}',
-                ha='center', va='bottom')
+def get_first_company_info(symbols):
+  """Info for the first symbol that resolves; later symbols are only fetched if earlier ones fail."""
+  for symbol in symbols:
+    info = get_company_info(symbol)
+    if info is not None:
+      return info
+  return {}
 
-  plt.tight_layout()
 
-  # Save to BytesIO
-  img_buffer = BytesIO()
-  plt.savefig(img_buffer, format='png', dpi=300, bbox_inches='tight')
-  img_buffer.seek(0)
-  plt.close()
+def get_report_market_data(symbols):
+  """Market data for a report from the first symbol that resolves, in order.
 
-  return img_buffer
+  Symbols the market refresher keeps fresh are read from their latest
+  snapshot; any other symbol is fetched live through the quote cache, so its
+  data is never older than the quote TTL. Returns (company data, as-of ISO
+  timestamp).
+  """
+  for symbol in symbols:
+    if market_refresher.keeps_fresh(symbol):
+      snapshot = snapshot_store.latest(symbol, max_age=MARKET_SNAPSHOT_MAX_AGE_SECONDS)
+      if snapshot:
+        data, fetched_at = snapshot
+        return data, datetime.fromtimestamp(fetched_at).isoformat()
+    info = get_company_info(symbol)
+    if info is not None:
+      return info, datetime.now().isoformat()
+  return {}, datetime.now().isoformat()
+
+
+def filed_company_symbols():
+  """Tickers of companies with ingested filings, resolved offline."""
+  symbols = []
+  for name in catalog.company_names("extraction"):
+    matches = symbol_index.lookup(name)
+    if matches:
+      symbols.append(matches[0]["symbol"])
+  return symbols
+
+
+market_refresher = MarketRefresher(snapshot_store, fetch_company_infos,
+                                   filed_company_symbols if MARKET_REFRESH_FILED_COMPANIES else None)
+
+
+def run_maintenance():
+  """Index report files the catalog doesn't know yet, move legacy report files
+  into the artifact store and apply the retention rules.
+
+  Moves and deletes files, so it never runs on import: servers run it once at
+  startup (see startup), `python app.py --maintenance` runs it on its own.
+  """
+  backfill(catalog, PDF_REPORTS_FOLDER, REPORTS_FOLDER, FINANCIAL_DATA_FOLDER)
+  moved = artifact_store.migrate_legacy()
+  removed = artifact_store.apply_retention()
+  print(f"Maintenance: {moved} legacy files moved into the artifact store, {removed} artifacts removed by retention")
+
+
+# Importing app (batch CLI, spawned workers, tests) only builds objects; the
+# serving process runs startup once, before it handles requests
+started = False
+startup_lock = threading.Lock()
+
+
+def startup():
+  """Run maintenance and start the market refresher, once per process.
+
+  Called by the asgi lifespan and by `python app.py`; under any other WSGI
+  server the first request runs it.
+  """
+  global started
+  with startup_lock:
+    if started:
+      return
+    run_maintenance()
+    if MARKET_REFRESH_ENABLED:
+      market_refresher.start()
+    started = True
+
+
+def create_financial_chart(data, chart_type="bar", dpi=CHART_DPI):
+  """Create financial charts using matplotlib and return as image."""
+  _, image = render_chart(financial_chart_spec(data, chart_type), dpi=dpi)
+  return BytesIO(image)
 
 
 def generate_comprehensive_report(pdf_data, yahoo_data):
@@ -301,55 +364,12 @@ def generate_comprehensive_report(pdf_data, yahoo_data):
     pdf_summary = json.dumps(pdf_data, indent=2) if pdf_data else "No PDF data available"
     yahoo_summary = json.dumps(yahoo_data, indent=2) if yahoo_data else "No market data available"
 
-    report_prompt = f"""
-        Create a comprehensive, professional financial analysis report for this company. 
-        Write in clear, professional language suitable for a financial report.
-
-        Structure the analysis in these sections:
-
-        1. EXECUTIVE SUMMARY (2-3 paragraphs)
-        - Key investment thesis and recommendation
-        - Overall financial health assessment
-
-        2. COMPANY OVERVIEW (2 paragraphs)
-        - Business description and market position
-        - Competitive advantages
-
-        3. FINANCIAL PERFORMANCE (3-4 paragraphs)
-        - Revenue trends and profitability
-        - Key financial ratios analysis
-        - Cash flow assessment
-
-        4. VALUATION ANALYSIS (2 paragraphs)
-        - Current valuation metrics
-        - Peer comparison insights
-
-        5. RISK FACTORS (2 paragraphs)
-        - Major operational and market risks
-        - Financial stability concerns
-
-        6. INVESTMENT RECOMMENDATION (1-2 paragraphs)
-        - Buy/Hold/Sell recommendation with rationale
-        - Target price considerations if applicable
-
-        FINANCIAL DOCUMENT DATA:
-        {pdf_summary}
-
-        LIVE MARKET DATA:
-        {yahoo_summary}
-
-        Make each section substantive and include specific financial metrics and analysis.
-        """
-
-    report_messages = [
-      {
-        "role": "system",
-        "content": "You are a senior equity research analyst. Create professional, detailed investment reports with specific insights and clear recommendations."
-      },
-      {"role": "user", "content": report_prompt}
-    ]
+    report_messages = COMPREHENSIVE_REPORT_PROMPT.messages(
+      document=f"FINANCIAL DOCUMENT DATA:\n{pdf_summary}\n\nLIVE MARKET DATA:\n{yahoo_summary}"
+    )
 
-    report_response = client.chat.completions.create(
+    report_response = llm_completion(
+      "report",
       model="meta-llama/Llama-3.2-3B-Instruct",
       messages=report_messages,
       max_tokens=2048,
@@ -373,239 +393,178 @@ def generate_comprehensive_report(pdf_data, yahoo_data):
     }
 
 
-def create_professional_pdf_report(report_data, company_name, symbol):
-  """Create a professional-looking PDF report."""
-
-  # Generate filename
-  safe_company_name = re.sub(r'[^a-zA-Z0-9_-]', '_', company_name)
-  timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-  filename = f"{safe_company_name}_{symbol}_Financial_Report_{timestamp}.pdf"
-  filepath = os.path.join(PDF_REPORTS_FOLDER, filename)
-
-  # Create PDF document
-  doc = SimpleDocTemplate(filepath, pagesize=A4,
-                          rightMargin=72, leftMargin=72,
-                          topMargin=72, bottomMargin=18)
-
-  # Get styles
-  styles = getSampleStyleSheet()
-
-  # Custom styles
-  title_style = ParagraphStyle(
-    'CustomTitle',
-    parent=styles['Heading1'],
-    fontSize=24,
-    textColor=colors.HexColor('#2E86AB'),
-    spaceAfter=30,
-    alignment=TA_CENTER,
-    fontName='Helvetica-Bold'
+# Body sections are generated concurrently; the executive summary is written
+# afterwards from their outputs.
+REPORT_SECTIONS = [
+  {
+    "key": "company_overview",
+    "title": "Company Overview",
+    "instructions": "Write 2 paragraphs covering the business description, market position and competitive advantages.",
+    "max_tokens": 400
+  },
+  {
+    "key": "financial_performance",
+    "title": "Financial Performance",
+    "instructions": "Write 3-4 paragraphs covering revenue trends and profitability, key financial ratios and the cash flow assessment.",
+    "max_tokens": 600
+  },
+  {
+    "key": "valuation_analysis",
+    "title": "Valuation Analysis",
+    "instructions": "Write 2 paragraphs covering current valuation metrics and peer comparison insights.",
+    "max_tokens": 400
+  },
+  {
+    "key": "risk_factors",
+    "title": "Risk Factors",
+    "instructions": "Write 2 paragraphs covering major operational and market risks and financial stability concerns.",
+    "max_tokens": 400
+  },
+  {
+    "key": "investment_recommendation",
+    "title": "Investment Recommendation",
+    "instructions": "Write 1-2 paragraphs giving a Buy/Hold/Sell recommendation with rationale and target price considerations if applicable.",
+    "max_tokens": 300
+  }
+]
+
+# The one section whose content depends on the live price
+VALUATION_SECTION = next(section for section in REPORT_SECTIONS if section["key"] == "valuation_analysis")
+
+EXECUTIVE_SUMMARY_SECTION = {
+  "key": "executive_summary",
+  "title": "Executive Summary",
+  "instructions": "Write 2-3 paragraphs with the key investment thesis, the recommendation and an overall financial health assessment. Base it on the section drafts provided.",
+  "max_tokens": 400
+}
+
+
+def _compact_value(value):
+  """Drop empty and 'N/A' entries so the shared section context stays small."""
+  if isinstance(value, dict):
+    compacted = {k: _compact_value(v) for k, v in value.items()}
+    return {k: v for k, v in compacted.items() if v not in (None, '', 'N/A', {}, [])}
+  if isinstance(value, list):
+    return [v for v in (_compact_value(item) for item in value) if v not in (None, '', 'N/A', {}, [])]
+  return value
+
+
+def build_report_context(pdf_data, yahoo_data):
+  """Build the compact data context shared by every report section call."""
+  market_data = dict(yahoo_data or {})
+  if isinstance(market_data.get('description'), str):
+    market_data['description'] = market_data['description'][:600]
+
+  pdf_summary = json.dumps(_compact_value(pdf_data), separators=(',', ':')) if pdf_data else "No PDF data available"
+  yahoo_summary = json.dumps(_compact_value(market_data), separators=(',', ':')) if market_data else "No market data available"
+  return f"FINANCIAL DOCUMENT DATA:\n{pdf_summary}\n\nLIVE MARKET DATA:\n{yahoo_summary}"
+
+
+def generate_report_section(section, context, drafts=None):
+  """Generate the body text of a single report section."""
+  # Every section shares the static prefix and the data context, only the request differs
+  section_request = f"{section['title'].upper()}. {section['instructions']}"
+  if drafts:
+    section_request += f"\n\nSECTION DRAFTS:\n{drafts}"
+
+  section_messages = REPORT_SECTION_PROMPT.messages(document=context, question=section_request)
+
+  section_response = llm_completion(
+    "section",
+    model="meta-llama/Llama-3.2-3B-Instruct",
+    messages=section_messages,
+    max_tokens=section["max_tokens"],
+    temperature=0.3
   )
 
-  heading_style = ParagraphStyle(
-    'CustomHeading',
-    parent=styles['Heading2'],
-    fontSize=16,
-    textColor=colors.HexColor('#2E86AB'),
-    spaceBefore=20,
-    spaceAfter=12,
-    fontName='Helvetica-Bold'
-  )
+  return section_response.choices[0].message.content.strip()
 
-  subheading_style = ParagraphStyle(
-    'CustomSubHeading',
-    parent=styles['Heading3'],
-    fontSize=14,
-    textColor=colors.HexColor('#4A4A4A'),
-    spaceBefore=15,
-    spaceAfter=10,
-    fontName='Helvetica-Bold'
-  )
-
-  body_style = ParagraphStyle(
-    'CustomBody',
-    parent=styles['Normal'],
-    fontSize=11,
-    textColor=colors.HexColor('#333333'),
-    spaceAfter=12,
-    alignment=TA_JUSTIFY,
-    fontName='Helvetica'
-  )
 
-  # Build content
-  story = []
-
-  # Title Page
-  story.append(Spacer(1, 0.5 * inch))
-  story.append(Paragraph(f"FINANCIAL ANALYSIS REPORT", title_style))
-  story.append(Spacer(1, 0.3 * inch))
-
-  # Company header box
-  company_data = [
-    ['Company:', report_data['yahoo_data'].get('longName', company_name)],
-    ['Symbol:', symbol],
-    ['Sector:', report_data['yahoo_data'].get('sector', 'N/A')],
-    ['Industry:', report_data['yahoo_data'].get('industry', 'N/A')],
-    ['Report Date:', datetime.now().strftime('%B %d, %Y')]
-  ]
-
-  company_table = Table(company_data, colWidths=[2 * inch, 4 * inch])
-  company_table.setStyle(TableStyle([
-    ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor('#F8F9FA')),
-    ('TEXTCOLOR', (0, 0), (0, -1), colors.HexColor('#2E86AB')),
-    ('TEXTCOLOR', (1, 0), (1, -1), colors.HexColor('#333333')),
-    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-    ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-    ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
-    ('FONTSIZE', (0, 0), (-1, -1), 11),
-    ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#DDDDDD')),
-    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-    ('LEFTPADDING', (0, 0), (-1, -1), 12),
-    ('RIGHTPADDING', (0, 0), (-1, -1), 12),
-    ('TOPPADDING', (0, 0), (-1, -1), 8),
-    ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-  ]))
-
-  story.append(company_table)
-  story.append(Spacer(1, 0.5 * inch))
-
-  # Key Metrics Table
-  story.append(Paragraph("KEY FINANCIAL METRICS", heading_style))
-
-  yahoo_data = report_data['yahoo_data']
-  metrics_data = [
-    ['Metric', 'Value'],
-    ['Market Cap', format_number(yahoo_data.get('marketCap', 'N/A'))],
-    ['Current Price', f"${yahoo_data.get('regularMarketPrice', 'N/A')}"],
-    ['Daily Change', format_percentage(yahoo_data.get('regularMarketChangePercent', 'N/A'))],
-    ['P/E Ratio (TTM)', str(yahoo_data.get('trailingPE', 'N/A'))],
-    ['Forward P/E', str(yahoo_data.get('forwardPE', 'N/A'))],
-    ['Profit Margin', format_percentage(yahoo_data.get('profitMargins', 'N/A'))],
-    ['Revenue Growth', format_percentage(yahoo_data.get('revenueGrowth', 'N/A'))],
-    ['ROE', format_percentage(yahoo_data.get('returnOnEquity', 'N/A'))],
-    ['Debt-to-Equity', str(yahoo_data.get('debtToEquity', 'N/A'))],
-    ['Beta', str(yahoo_data.get('beta', 'N/A'))],
-    ['Dividend Yield', format_percentage(yahoo_data.get('dividendYield', 'N/A'))]
-  ]
-
-  metrics_table = Table(metrics_data, colWidths=[3 * inch, 2.5 * inch])
-  metrics_table.setStyle(TableStyle([
-    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2E86AB')),
-    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-    ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#F8F9FA')),
-    ('TEXTCOLOR', (0, 1), (-1, -1), colors.HexColor('#333333')),
-    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-    ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-    ('FONTSIZE', (0, 0), (-1, -1), 10),
-    ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#DDDDDD')),
-    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-    ('LEFTPADDING', (0, 0), (-1, -1), 12),
-    ('RIGHTPADDING', (0, 0), (-1, -1), 12),
-    ('TOPPADDING', (0, 0), (-1, -1), 6),
-    ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-  ]))
-
-  story.append(metrics_table)
-  story.append(PageBreak())
-
-  # Add financial chart if we have data
+def generate_sectioned_report(pdf_data, yahoo_data):
+  """Generate the report as concurrent per-section calls and assemble structured sections."""
   try:
-    chart_data = {
-      'Market Cap (B)': yahoo_data.get('marketCap', 0) / 1e9 if yahoo_data.get('marketCap') and yahoo_data.get(
-        'marketCap') != 'N/A' else 0,
-      'P/E Ratio': yahoo_data.get('trailingPE', 0) if yahoo_data.get('trailingPE') and yahoo_data.get(
-        'trailingPE') != 'N/A' else 0,
-      'Profit Margin (%)': yahoo_data.get('profitMargins', 0) * 100 if yahoo_data.get(
-        'profitMargins') and yahoo_data.get('profitMargins') != 'N/A' else 0,
-      'ROE (%)': yahoo_data.get('returnOnEquity', 0) * 100 if yahoo_data.get('returnOnEquity') and yahoo_data.get(
-        'returnOnEquity') != 'N/A' else 0,
-      'Beta': yahoo_data.get('beta', 0) if yahoo_data.get('beta') and yahoo_data.get('beta') != 'N/A' else 0
+    context = build_report_context(pdf_data, yahoo_data)
+
+    with ThreadPoolExecutor(max_workers=REPORT_SECTION_WORKERS) as executor:
+      # Each call runs in a copy of the request's context, so its llm.section span
+      # lands in the request's Server-Timing (as asgi.run_blocking does)
+      futures = {
+        section["key"]: executor.submit(contextvars.copy_context().run, generate_report_section, section, context)
+        for section in REPORT_SECTIONS
+      }
+      body = {key: future.result() for key, future in futures.items()}
+
+    drafts = "\n\n".join(f"{section['title'].upper()}:\n{body[section['key']]}" for section in REPORT_SECTIONS)
+    summary = generate_report_section(EXECUTIVE_SUMMARY_SECTION, context, drafts)
+
+    sections = [{
+      "key": EXECUTIVE_SUMMARY_SECTION["key"],
+      "title": EXECUTIVE_SUMMARY_SECTION["title"],
+      "content": summary
+    }]
+    sections += [
+      {"key": section["key"], "title": section["title"], "content": body[section["key"]]}
+      for section in REPORT_SECTIONS
+    ]
+
+    return {
+      "success": True,
+      "report_text": sections_report_text(sections),
+      "sections": sections,
+      "pdf_data": pdf_data,
+      "yahoo_data": yahoo_data
     }
 
-    chart_img = create_financial_chart(chart_data, "bar")
-    if chart_img:
-      story.append(Paragraph("FINANCIAL METRICS VISUALIZATION", heading_style))
-      img = Image(chart_img, width=6 * inch, height=3.6 * inch)
-      story.append(img)
-      story.append(Spacer(1, 0.3 * inch))
   except Exception as e:
-    print(f"Error creating chart: {e}")
+    return {
+      "success": False,
+      "error": str(e),
+      "report_text": None
+    }
 
-  # Report Content
-  # Report Content
-  story.append(Paragraph("DETAILED ANALYSIS", heading_style))
-
-  # Split the report text into sections more intelligently
-  report_text = report_data['report_text']
-
-  # First, try to split by common section patterns
-  section_patterns = [
-    r'\*\*(.*?)\*\*',  # **SECTION NAME**
-    r'(\d+\.\s+[A-Z][A-Z\s]+)',  # 1. SECTION NAME
-    r'^([A-Z][A-Z\s]{10,}?)$'  # ALL CAPS lines
-  ]
-
-  # Clean up the text and split into logical sections
-  cleaned_text = report_text.replace('**', '').strip()
-  paragraphs = [p.strip() for p in cleaned_text.split('\n') if p.strip()]
-
-  current_section_title = None
-  current_section_content = []
-
-  for paragraph in paragraphs:
-    # Check if this looks like a section header
-    is_header = (
-      paragraph.isupper() and len(paragraph) > 5 or  # All caps, reasonable length
-      any(keyword in paragraph.upper() for keyword in
-          ['EXECUTIVE SUMMARY', 'COMPANY OVERVIEW', 'FINANCIAL PERFORMANCE',
-           'VALUATION ANALYSIS', 'RISK FACTORS', 'INVESTMENT RECOMMENDATION']) or
-      re.match(r'^\d+\.\s+[A-Z]', paragraph)  # Numbered sections
-    )
 
-    if is_header:
-      # Add previous section if it exists
-      if current_section_title and current_section_content:
-        story.append(Paragraph(current_section_title, subheading_style))
-        story.append(Spacer(1, 0.1 * inch))
+def sections_report_text(sections):
+  """Plain report text assembled from structured sections."""
+  return "\n\n".join(f"**{section['title'].upper()}**\n\n{section['content']}" for section in sections)
 
-        # Join content paragraphs properly
-        section_text = ' '.join(current_section_content)
-        story.append(Paragraph(section_text, body_style))
-        story.append(Spacer(1, 0.2 * inch))
 
-      # Start new section
-      current_section_title = paragraph.title() if paragraph.isupper() else paragraph
-      current_section_content = []
-    else:
-      # Add to current section content
-      if paragraph and not paragraph.startswith('|'):  # Skip table-like content
-        current_section_content.append(paragraph)
+def generate_report_content(pdf_data, yahoo_data, mode=None):
+  """Generate report content using the requested (or configured) generation mode."""
+  if (mode or REPORT_GENERATION_MODE) == "sectioned":
+    return generate_sectioned_report(pdf_data, yahoo_data)
+  return generate_comprehensive_report(pdf_data, yahoo_data)
+
 
-  # Add the last section
-  if current_section_title and current_section_content:
-    story.append(Paragraph(current_section_title, subheading_style))
-    story.append(Spacer(1, 0.1 * inch))
+def report_prompt_version(mode=None):
+  """Version key of the prompt a report generation mode uses."""
+  if (mode or REPORT_GENERATION_MODE) == "sectioned":
+    return REPORT_SECTION_PROMPT.version_key
+  return COMPREHENSIVE_REPORT_PROMPT.version_key
 
-    section_text = ' '.join(current_section_content)
-    story.append(Paragraph(section_text, body_style))
-    story.append(Spacer(1, 0.2 * inch))
 
-  # Footer
-  story.append(Spacer(1, 0.5 * inch))
-  
-  
-  # Build PDF
-  doc.build(story)
+def create_professional_pdf_report(report_data, company_name, symbol):
+  """Build a report PDF into the artifact store's staging folder (see services/report_build.py)."""
+  return build_pdf_report(report_data, company_name, symbol, artifact_store.staging_dir)
 
-  return filename, filepath
+
+def load_cached_extraction(data_filepath, cache_key):
+  """Return a stored successful extraction produced for the same text and prompt version."""
+  if not os.path.exists(data_filepath):
+    return None
+  try:
+    with open(data_filepath, 'r') as f:
+      stored = json.load(f)
+  except (OSError, json.JSONDecodeError):
+    return None
+  if stored.get("cache_key") == cache_key and stored["extraction_result"].get("extraction_success"):
+    return stored["extraction_result"]
+  return None
 
 
 # ===== EXISTING ROUTES =====
 @app.route('/upload-pdf', methods=['POST'])
 def upload_pdf():
   """Upload PDF and extract financial data directly."""
-  global current_financial_data, current_pdf_text
-
   if 'file' not in request.files:
     return jsonify({"error": "No file part"}), 400
 
@@ -620,41 +579,72 @@ def upload_pdf():
   try:
     # Extract full text from PDF
     text = ""
-    with fitz.open(filepath) as pdf:
+    with span("pdf.text"), fitz.open(filepath) as pdf:
       for page in pdf:
         text += page.get_text()
 
-    # Store the full text for Q&A context
-    current_pdf_text = text
-
-    # Extract financial data using the model
-    extraction_result = extract_financial_data(text)
-
-    # Store the extracted data globally
-    current_financial_data = extraction_result["financial_data"]
-
-    # Save to file for persistence
     data_filename = file.filename.replace('.pdf', '_financial_data.json')
     data_filepath = os.path.join(FINANCIAL_DATA_FOLDER, data_filename)
 
-    with open(data_filepath, 'w') as f:
-      json.dump({
-        "filename": file.filename,
-        "extraction_result": extraction_result,
-        "text_length": len(text)
-      }, f, indent=2)
+    # Re-uploads of the same document reuse the stored extraction while the prompt is unchanged
+    cache_key = prompt_cache_key("financial_data_extraction", text)
+    extraction_result = load_cached_extraction(data_filepath, cache_key)
+    from_cache = extraction_result is not None
+
+    if not from_cache:
+      # Extract financial data using the model
+      with span("extraction"):
+        extraction_result = extract_financial_data(text)
+
+      # Save to file for persistence
+      with open(data_filepath, 'w') as f:
+        json.dump({
+          "filename": file.filename,
+          "extraction_result": extraction_result,
+          "text_length": len(text),
+          "cache_key": cache_key,
+          "prompt_version": FINANCIAL_DATA_EXTRACTION_PROMPT.version_key
+        }, f, indent=2)
+
+      try:
+        metrics_warehouse.add_extraction(data_filename, extraction_result["financial_data"],
+                                         file_signature(data_filepath))
+      except Exception as e:
+        print(f"Error adding extraction to metrics warehouse: {e}")
+
+      company_info = extraction_result["financial_data"].get("company_info") or {}
+      catalog.record(
+        "extraction", data_filename,
+        company_name=company_info.get("name"),
+        sector=company_info.get("sector"),
+        file_size=os.path.getsize(data_filepath),
+        metadata={"source_filename": file.filename}
+      )
+
+    # Store text and extraction under the document's id for Q&A and reports
+    document = document_store.put(document_id(text, extraction_result["financial_data"]), file.filename,
+                                  extraction_result["financial_data"], text)
+    financial_data = document["financial_data"]
+
+    # Offline ticker guess from the extracted company name, so reports need no company parameter
+    company_name = document_company_name(financial_data)
+    symbol_matches = symbol_index.lookup(company_name) if company_name else []
 
     # Clean up uploaded file
     os.remove(filepath)
 
     return jsonify({
       "status": "PDF processed successfully",
+      "doc_id": document["doc_id"],
       "filename": file.filename,
       "extraction_success": extraction_result["extraction_success"],
-      "financial_data": current_financial_data,
+      "from_cache": from_cache,
+      "company_symbol": symbol_matches[0]["symbol"] if symbol_matches else None,
+      "symbol_matches": symbol_matches,
+      "financial_data": financial_data,
       "document_stats": {
         "text_length": len(text),
-        "has_financial_data": bool(current_financial_data)
+        "has_financial_data": bool(financial_data)
       }
     }), 200
 
@@ -662,60 +652,93 @@ def upload_pdf():
     return jsonify({"error": f"Failed to process PDF: {str(e)}"}), 500
 
 
-@app.route('/financial-qa', methods=['GET'])
-def financial_qa():
-  """Answer questions using extracted financial data and full document context."""
-  query = request.args.get("q")
-  if not query:
-    return jsonify({"error": "Query parameter 'q' is required"}), 400
+def document_company_name(financial_data):
+  """Company name extracted from the document, if any."""
+  name = (financial_data.get("company_info") or {}).get("name")
+  return name.strip() if isinstance(name, str) and name.strip() else None
 
-  if not current_financial_data:
-    return jsonify({"error": "No financial data available. Please upload a document first."}), 400
 
-  try:
-    # Create context from extracted financial data
-    financial_context = json.dumps(current_financial_data, indent=2)
+def find_document(doc_id=None):
+  """Document doc_id. Without one, the most recent upload if DOCUMENT_FALLBACK_TO_LATEST
+  is on, else an error.
 
-    # Limit document text for context (use relevant portions)
-    text_sample = current_pdf_text[:5000] if len(current_pdf_text) > 5000 else current_pdf_text
+  Returns (document, error, status); document is None when there is an error.
+  """
+  with span("document.load"):
+    if doc_id:
+      document = document_store.get(doc_id)
+      if document is None:
+        return None, f"Unknown doc_id '{doc_id}'", 404
+    elif DOCUMENT_FALLBACK_TO_LATEST:
+      latest_id = document_store.latest_id()
+      document = document_store.get(latest_id) if latest_id else None
+    else:
+      return None, "Missing 'doc_id' parameter: pass the doc_id returned by /upload-pdf", 400
 
-    qa_prompt = f"""
-        You are a financial expert with access to comprehensive financial data from a company document.
+  if not document or not document["financial_data"]:
+    return None, "No financial data available. Please upload a document first using /upload-pdf", 400
+  return document, None, 200
 
-        Question: {query}
 
-        Use the extracted financial data and document context below to provide a detailed, accurate answer.
-        Include specific numbers, percentages, and financial metrics when relevant.
-        If the information isn't available in the data, clearly state that.
+def get_request_document():
+  """Document named by ?doc_id= (see find_document).
 
-        EXTRACTED FINANCIAL DATA:
-        {financial_context}
+  Returns (document, error_response); exactly one of them is None.
+  """
+  document, error, status = find_document(request.args.get('doc_id'))
+  if error:
+    return None, (jsonify({"error": error}), status)
+  return document, None
 
-        DOCUMENT CONTEXT:
-        {text_sample}
-        """
 
-    qa_messages = [
-      {"role": "system",
-       "content": "You are a financial expert providing precise answers based on company financial documents."},
-      {"role": "user", "content": qa_prompt}
-    ]
+def financial_qa_request(document, query):
+  """Chat completion arguments for a Q&A question about a document."""
+  # Create context from extracted financial data
+  financial_context = json.dumps(document["financial_data"], indent=2)
 
-    qa_response = client.chat.completions.create(
-      model="meta-llama/Llama-3.2-3B-Instruct",
-      messages=qa_messages,
-      max_tokens=512,
-      temperature=0.2
-    )
+  # Limit document text for context (use relevant portions)
+  pdf_text = document["pdf_text"]
+  text_sample = pdf_text[:5000] if len(pdf_text) > 5000 else pdf_text
+
+  # Document-stable context first and the question last so repeat questions share the prefix
+  return {
+    "model": "meta-llama/Llama-3.2-3B-Instruct",
+    "messages": FINANCIAL_QA_PROMPT.messages(
+      document=f"EXTRACTED FINANCIAL DATA:\n{financial_context}\n\nDOCUMENT CONTEXT:\n{text_sample}",
+      question=query
+    ),
+    "max_tokens": 512,
+    "temperature": 0.2
+  }
+
+
+def financial_qa_result(document, query, answer):
+  return {
+    "question": query,
+    "answer": answer,
+    "doc_id": document["doc_id"],
+    "data_available": True,
+    "context_used": "extracted_financial_data + document_sample"
+  }
+
+
+@app.route('/financial-qa', methods=['GET'])
+def financial_qa():
+  """Answer questions using extracted financial data and full document context."""
+  query = request.args.get("q")
+  if not query:
+    return jsonify({"error": "Query parameter 'q' is required"}), 400
+
+  document, error_response = get_request_document()
+  if error_response:
+    return error_response
+
+  try:
+    qa_response = llm_completion("qa", **financial_qa_request(document, query))
 
     answer = qa_response.choices[0].message.content
 
-    return jsonify({
-      "question": query,
-      "answer": answer,
-      "data_available": bool(current_financial_data),
-      "context_used": "extracted_financial_data + document_sample"
-    })
+    return jsonify(financial_qa_result(document, query, answer))
 
   except Exception as e:
     return jsonify({"error": f"Q&A processing failed: {str(e)}"}), 500
@@ -724,20 +747,23 @@ def financial_qa():
 @app.route('/company-overview', methods=['GET'])
 def company_overview():
   """Get complete financial overview of the processed document."""
-  if not current_financial_data:
-    return jsonify({"error": "No financial data available. Please upload a document first."}), 400
+  document, error_response = get_request_document()
+  if error_response:
+    return error_response
 
+  financial_data = document["financial_data"]
   return jsonify({
-    "financial_overview": current_financial_data,
-    "data_available": bool(current_financial_data),
+    "doc_id": document["doc_id"],
+    "financial_overview": financial_data,
+    "data_available": True,
     "summary": {
-      "has_company_info": bool(current_financial_data.get("company_info")),
-      "has_revenue_data": bool(current_financial_data.get("revenue_data")),
-      "has_profitability": bool(current_financial_data.get("profitability")),
-      "has_financial_position": bool(current_financial_data.get("financial_position")),
-      "has_cash_flow": bool(current_financial_data.get("cash_flow")),
-      "has_key_metrics": bool(current_financial_data.get("key_metrics")),
-      "has_risks_outlook": bool(current_financial_data.get("risks_and_outlook"))
+      "has_company_info": bool(financial_data.get("company_info")),
+      "has_revenue_data": bool(financial_data.get("revenue_data")),
+      "has_profitability": bool(financial_data.get("profitability")),
+      "has_financial_position": bool(financial_data.get("financial_position")),
+      "has_cash_flow": bool(financial_data.get("cash_flow")),
+      "has_key_metrics": bool(financial_data.get("key_metrics")),
+      "has_risks_outlook": bool(financial_data.get("risks_and_outlook"))
     }
   })
 
@@ -753,173 +779,640 @@ def get_company():
   if not symbols:
     return jsonify({"error": "No symbols found"}), 404
 
-  info_list = get_company_info_for_symbols(symbols)
-  if info_list:
-    return jsonify(info_list[0])
+  info = get_first_company_info(symbols)
+  if info:
+    return jsonify(info)
   return jsonify({"error": "No info found"}), 404
 
 
 # ===== NEW PDF REPORT GENERATION ROUTES =====
 
+def price_move_percent(old_market_data, new_market_data):
+  """Absolute price change between two market data snapshots in percent, or None if unknown."""
+  old_price = to_number(old_market_data.get('regularMarketPrice'))
+  new_price = to_number(new_market_data.get('regularMarketPrice'))
+  if not old_price or new_price is None:
+    return None
+  return abs(new_price - old_price) / abs(old_price) * 100
+
+
+def refresh_analysis(previous, analysis_id, document, yahoo_data, market_data_as_of):
+  """A previous analysis brought up to date with new market data.
+
+  The narrative is reused as is; the metrics table and chart follow from the
+  new market data when the analysis is rendered. Only a price move above
+  REPORT_REFRESH_PRICE_MOVE_PERCENT since the valuation was written costs a
+  model call, for the valuation section. Returns None when that would need
+  a full regeneration (reports generated in single mode have no separate
+  valuation section).
+  """
+  valuation_market_data = previous.get("valuation_market_data") or previous["market_data"]
+  move = price_move_percent(valuation_market_data, yahoo_data)
+  sections = previous["sections"]
+  regenerated = []
+
+  if move is None or move > REPORT_REFRESH_PRICE_MOVE_PERCENT:
+    keys = [section.get("key") for section in sections or []]
+    if VALUATION_SECTION["key"] not in keys:
+      return None
+    try:
+      context = build_report_context(document["financial_data"] if document else None, yahoo_data)
+      valuation = generate_report_section(VALUATION_SECTION, context)
+    except Exception as e:
+      return dict(previous, analysis_id=analysis_id, success=False, error=str(e))
+    sections = [dict(section, content=valuation) if section.get("key") == VALUATION_SECTION["key"] else section
+                for section in sections]
+    regenerated.append(VALUATION_SECTION["key"])
+    valuation_market_data = yahoo_data
+
+  return dict(
+    previous,
+    analysis_id=analysis_id,
+    market_data=yahoo_data,
+    market_data_as_of=market_data_as_of,
+    sections=sections,
+    report_text=sections_report_text(sections) if regenerated else previous["report_text"],
+    refreshed_from=previous["analysis_id"],
+    refreshed_sections=regenerated,
+    price_move_percent=round(move, 2) if move is not None else None,
+    valuation_market_data=valuation_market_data,
+    narrative_created_at=previous.get("narrative_created_at") or previous["created_at"],
+    created_at=datetime.now().isoformat()
+  )
+
+
+def get_report_analysis(document, company_name, mode=None, refresh=False):
+  """The analysis behind a report (market data and report text), shared by every output format.
+
+  Keyed by (document, symbol, market data, prompt version), so asking for the
+  JSON and the PDF report of the same company costs one model pass. With
+  refresh, new market data updates the latest analysis of the same document
+  and symbol (see refresh_analysis) instead of regenerating the narrative;
+  the refreshed analysis is stored under its own id (keyed by the analysis it
+  came from), so later full-analysis requests never get it. Returns
+  (analysis, cached), or (None, False) when no symbol matches company_name.
+  """
+  symbols = company_name_to_symbol(company_name)
+  if not symbols:
+    return None, False
+
+  print(f"Found symbols: {symbols}")
+  with span("market_data"):
+    yahoo_data, market_data_as_of = get_report_market_data(symbols)
+  doc_id = document["doc_id"] if document else None
+  symbol = yahoo_data.get('symbol', 'N/A')
+  prompt_version = report_prompt_version(mode)
+  analysis_id = analysis_key(doc_id, symbol, yahoo_data, prompt_version)
+
+  # A full analysis of this market data beats a refresh of an older one
+  previous = None
+  if refresh and analysis_store.get(analysis_id) is None:
+    previous = analysis_store.latest(doc_id, symbol, prompt_version)
+  if previous:
+    if market_data_hash(previous["market_data"]) == market_data_hash(yahoo_data):
+      return previous, True
+    refresh_id = analysis_key(doc_id, symbol, yahoo_data, prompt_version, refreshed_from=previous["analysis_id"])
+
+    def create_refresh():
+      refreshed = refresh_analysis(previous, refresh_id, document, yahoo_data, market_data_as_of)
+      if refreshed:
+        print(f"Refreshed report analysis {previous['analysis_id']} -> {refresh_id} for {company_name}")
+      return refreshed
+
+    refreshed, cached = analysis_store.get_or_create(refresh_id, create_refresh)
+    if refreshed:
+      return refreshed, cached
+
+  def create():
+    print(f"Running report analysis {analysis_id} for {company_name}")
+    report_result = generate_report_content(document["financial_data"] if document else None, yahoo_data, mode)
+    return {
+      "analysis_id": analysis_id,
+      "success": report_result["success"],
+      "error": report_result.get("error"),
+      "doc_id": doc_id,
+      "company_name": company_name,
+      "symbol": symbol,
+      "market_data": yahoo_data,
+      "market_data_as_of": market_data_as_of,
+      "report_text": report_result["report_text"],
+      "sections": report_result.get("sections"),
+      "prompt_version": prompt_version,
+      "created_at": datetime.now().isoformat()
+    }
+
+  return analysis_store.get_or_create(analysis_id, create)
+
+
+def analysis_report_data(analysis):
+  """An analysis in the shape create_professional_pdf_report takes."""
+  return {
+    "report_text": analysis["report_text"],
+    "sections": analysis["sections"],
+    "yahoo_data": analysis["market_data"]
+  }
+
+
+def analysis_generation_info(analysis):
+  return {
+    "ai_model": "meta-llama/Llama-3.2-3B-Instruct",
+    "prompt_version": analysis["prompt_version"],
+    "analysis_id": analysis["analysis_id"],
+    "analysis_created_at": analysis["created_at"],
+    "narrative_created_at": analysis.get("narrative_created_at") or analysis["created_at"],
+    "refreshed_from": analysis.get("refreshed_from"),
+    "refreshed_sections": analysis.get("refreshed_sections"),
+    "market_data_as_of": analysis["market_data_as_of"],
+    "generation_timestamp": datetime.now().isoformat()
+  }
+
+
+def record_pdf_report(pdf_filename, pdf_filepath, company_name, document, analysis):
+  """Move a built PDF report into the artifact store and store its JSON data file.
+
+  Returns (json_filename, report_metadata).
+  """
+  yahoo_data = analysis["market_data"]
+  json_filename = pdf_filename.replace('.pdf', '_data.json')
+  catalog_fields = {
+    "company_name": yahoo_data.get('longName', company_name),
+    "symbol": yahoo_data.get('symbol', 'N/A'),
+    "sector": yahoo_data.get('sector', 'N/A'),
+    "industry": yahoo_data.get('industry', 'N/A'),
+    "generated_at": analysis_generation_info(analysis)["generation_timestamp"]
+  }
+  with span("artifact.store"):
+    stored_pdf = artifact_store.put_file("pdf_report", pdf_filename, pdf_filepath, data_filename=json_filename,
+                                         **catalog_fields)
+
+  report_metadata = {
+    "report_metadata": {
+      "title": f"Financial Analysis Report - {yahoo_data.get('longName', company_name)}",
+      "generated_date": datetime.now().strftime("%Y-%m-%d"),
+      "company_symbol": yahoo_data.get('symbol', 'N/A'),
+      "company_name": yahoo_data.get('longName', company_name),
+      "sector": yahoo_data.get('sector', 'N/A'),
+      "industry": yahoo_data.get('industry', 'N/A'),
+      "pdf_filename": pdf_filename,
+      "pdf_filepath": stored_pdf["path"],
+      "doc_id": document["doc_id"] if document else None
+    },
+    "financial_data": document["financial_data"] if document else None,
+    "market_data": yahoo_data,
+    "report_text": analysis["report_text"],
+    "report_sections": analysis["sections"],
+    "generation_info": analysis_generation_info(analysis)
+  }
+
+  artifact_store.put_json("pdf_data", json_filename, report_metadata, **catalog_fields)
+  return json_filename, report_metadata
+
+
+def render_pdf_report(analysis, company_name, document):
+  """PDF artifact of an analysis, plus its JSON data file."""
+  pdf_filename, pdf_filepath = create_professional_pdf_report(
+    analysis_report_data(analysis), company_name, analysis["symbol"])
+  json_filename, report_metadata = record_pdf_report(pdf_filename, pdf_filepath, company_name, document, analysis)
+  return {
+    "pdf_filename": pdf_filename,
+    "pdf_path": report_metadata["report_metadata"]["pdf_filepath"],
+    "json_data_file": json_filename,
+    "report_metadata": report_metadata["report_metadata"]
+  }
+
+
+def render_json_report(analysis, company_name, document):
+  """JSON artifact of an analysis."""
+  yahoo_data = analysis["market_data"]
+  report_data = {
+    "report_metadata": {
+      "title": f"Financial Analysis Report - {yahoo_data.get('longName', 'Company Analysis')}",
+      "generated_date": datetime.now().strftime("%Y-%m-%d"),
+      "company_symbol": yahoo_data.get('symbol', 'N/A'),
+      "company_name": yahoo_data.get('longName', 'N/A'),
+      "sector": yahoo_data.get('sector', 'N/A'),
+      "industry": yahoo_data.get('industry', 'N/A'),
+      "doc_id": document["doc_id"] if document else None
+    },
+    "executive_summary": {
+      "full_analysis": analysis["report_text"],
+      "sections": analysis["sections"],
+      "key_metrics_snapshot": {
+        "market_cap": format_number(yahoo_data.get('marketCap')),
+        "current_price": f"${yahoo_data.get('regularMarketPrice', 'N/A')}",
+        "daily_change": format_percentage(yahoo_data.get('regularMarketChangePercent')),
+        "trailing_pe": yahoo_data.get('trailingPE', 'N/A'),
+        "forward_pe": yahoo_data.get('forwardPE', 'N/A'),
+        "profit_margin": format_percentage(yahoo_data.get('profitMargins')),
+        "revenue_growth": format_percentage(yahoo_data.get('revenueGrowth')),
+        "earnings_growth": format_percentage(yahoo_data.get('earningsGrowth')),
+        "dividend_yield": format_percentage(yahoo_data.get('dividendYield')),
+        "beta": yahoo_data.get('beta', 'N/A'),
+        "debt_to_equity": yahoo_data.get('debtToEquity', 'N/A'),
+        "roe": format_percentage(yahoo_data.get('returnOnEquity')),
+        "current_ratio": yahoo_data.get('currentRatio', 'N/A')
+      }
+    },
+    "document_financial_data": document["financial_data"] if document else None,
+    "market_data": yahoo_data,
+    "report_generation_info": dict(
+      {"data_sources": ["PDF Document Analysis", "Yahoo Finance API"]}, **analysis_generation_info(analysis))
+  }
+
+  # Save report to file
+  safe_company_name = re.sub(r'[^a-zA-Z0-9_-]', '_', company_name)
+  report_filename = f"{safe_company_name}_comprehensive_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+
+  artifact_store.put_json(
+    "json_report", report_filename, report_data,
+    company_name=report_data["report_metadata"]["company_name"],
+    symbol=report_data["report_metadata"]["company_symbol"],
+    sector=report_data["report_metadata"]["sector"],
+    industry=report_data["report_metadata"]["industry"],
+    generated_at=report_data["report_generation_info"]["generation_timestamp"]
+  )
+  return {"report": report_data, "saved_to": report_filename}
+
+
+# Output formats an analysis can be rendered to
+REPORT_RENDERERS = {
+  "pdf": render_pdf_report,
+  "json": render_json_report
+}
+
+
+def analysis_view(analysis):
+  """Structured report data of an analysis for the HTML/Markdown views."""
+  yahoo_data = analysis["market_data"]
+  try:
+    with span("chart"):
+      chart_svg = render_svg(financial_chart_spec(report_chart_data(yahoo_data)), 432, 259)
+  except Exception as e:
+    print(f"Error creating chart: {e}")
+    chart_svg = None
+  return {
+    "title": f"Financial Analysis Report - {yahoo_data.get('longName', analysis['company_name'])}",
+    "company_rows": report_company_rows(yahoo_data, analysis["company_name"], analysis["symbol"],
+                                        datetime.fromisoformat(analysis["created_at"])),
+    "metric_rows": report_metric_rows(yahoo_data),
+    "chart_svg": chart_svg,
+    "sections": analysis["sections"] or sections_from_text(analysis["report_text"] or ''),
+    "pdf_url": f"/analyses/{analysis['analysis_id']}/download-pdf"
+  }
+
+
+def report_view_response(analysis_id, fmt, load_analysis):
+  """HTML/Markdown view with ETag revalidation and gzip.
+
+  The ETag only depends on the analysis id and the content encoding, so a
+  matching If-None-Match is answered with 304 before the analysis is loaded
+  or rendered.
+  """
+  view_key = view_etag(analysis_id, fmt)
+  gzipped = bool(request.accept_encodings["gzip"])
+  # The gzip and identity bodies are different representations, each with its own ETag
+  etag = f"{view_key}-gzip" if gzipped else view_key
+  if request.if_none_match.contains(etag):
+    response = Response(status=304)
+  else:
+    body = view_cache.get_or_render(
+      f"{view_key}.{fmt}", lambda: VIEW_RENDERERS[fmt](analysis_view(load_analysis())).encode("utf-8"))
+    response = Response(content_type=VIEW_FORMATS[fmt])
+    if gzipped:
+      body = view_cache.get_or_render(f"{view_key}.{fmt}.gz", lambda: gzip.compress(body, compresslevel=6))
+      response.headers["Content-Encoding"] = "gzip"
+    response.set_data(body)
+  response.set_etag(etag)
+  response.headers["Cache-Control"] = "no-cache"
+  response.headers["Vary"] = "Accept-Encoding"
+  return response
+
+
+def view_format():
+  fmt = request.args.get('format', 'html').lower()
+  return fmt if fmt in VIEW_FORMATS else None
+
+
 @app.route('/generate-pdf-report', methods=['GET'])
 def generate_pdf_report():
   """Generate comprehensive PDF financial report using both PDF data and Yahoo Finance data."""
 
-  # Get company parameter
-  company_name = request.args.get('company')
+  # Check if we have PDF data
+  document, error_response = get_request_document()
+  if error_response:
+    return error_response
+  financial_data = document["financial_data"]
+
+  # Get company parameter, defaulting to the company named in the document
+  company_name = request.args.get('company') or document_company_name(financial_data)
   if not company_name:
     return jsonify({"error": "Missing 'company' parameter. Usage: /generate-pdf-report?company=Apple"}), 400
 
-  # Check if we have PDF data
-  if not current_financial_data:
-    return jsonify({"error": "No PDF financial data available. Please upload a document first using /upload-pdf"}), 400
-
   try:
     print(f"Generating PDF report for company: {company_name}")
 
-    # Get Yahoo Finance data
-    symbols = company_name_to_symbol(company_name)
-    if not symbols:
+    analysis, cached = get_report_analysis(document, company_name, request.args.get('mode'),
+                                           refresh=request.args.get('refresh', 'false').lower() == 'true')
+    if analysis is None:
       return jsonify({"error": f"No stock symbols found for company: {company_name}"}), 404
 
-    print(f"Found symbols: {symbols}")
-    yahoo_data = get_company_info_for_symbols(symbols)[0] if symbols else {}
-
-    # Generate comprehensive report content
-    report_result = generate_comprehensive_report(current_financial_data, yahoo_data)
-
-    if report_result["success"]:
-      # Create PDF report
-      pdf_filename, pdf_filepath = create_professional_pdf_report(
-        report_result,
-        company_name,
-        yahoo_data.get('symbol', 'N/A')
-      )
-
-      # Also save JSON data for reference
-      json_filename = pdf_filename.replace('.pdf', '_data.json')
-      json_filepath = os.path.join(REPORTS_FOLDER, json_filename)
-
-      report_metadata = {
-        "report_metadata": {
-          "title": f"Financial Analysis Report - {yahoo_data.get('longName', company_name)}",
-          "generated_date": datetime.now().strftime("%Y-%m-%d"),
-          "company_symbol": yahoo_data.get('symbol', 'N/A'),
-          "company_name": yahoo_data.get('longName', company_name),
-          "sector": yahoo_data.get('sector', 'N/A'),
-          "industry": yahoo_data.get('industry', 'N/A'),
-          "pdf_filename": pdf_filename,
-          "pdf_filepath": pdf_filepath
-        },
-        "financial_data": current_financial_data,
-        "market_data": yahoo_data,
-        "report_text": report_result["report_text"],
-        "generation_info": {
-          "ai_model": "meta-llama/Llama-3.2-3B-Instruct",
-          "generation_timestamp": datetime.now().isoformat()
-        }
-      }
-
-      with open(json_filepath, 'w') as f:
-        json.dump(report_metadata, f, indent=2)
-
-      return jsonify({
+    if analysis["success"]:
+      rendered = render_pdf_report(analysis, company_name, document)
+      return jsonify(dict({
         "status": "PDF report generated successfully",
         "company": company_name,
-        "symbol": yahoo_data.get('symbol', 'N/A'),
-        "pdf_filename": pdf_filename,
-        "pdf_path": pdf_filepath,
-        "json_data_file": json_filename,
-        "report_metadata": report_metadata["report_metadata"],
+        "symbol": analysis["symbol"],
+        "analysis_id": analysis["analysis_id"],
+        "analysis_cached": cached,
+        "refreshed_sections": analysis.get("refreshed_sections"),
         "generation_time": datetime.now().isoformat()
-      }), 200
+      }, **rendered)), 200
     else:
       return jsonify({
         "error": "Failed to generate report content",
-        "details": report_result["error"]
+        "details": analysis["error"]
       }), 500
 
   except Exception as e:
     return jsonify({"error": f"PDF report generation failed: {str(e)}"}), 500
 
 
+def batch_prepare_pdf_report(item, mode=None):
+  """Prepare stage of a batch PDF report (see services/report_batch.py)."""
+  document = None
+  if item.get("doc_id"):
+    document = document_store.get(item["doc_id"])
+    if document is None:
+      raise LookupError(f"Unknown doc_id '{item['doc_id']}'")
+  financial_data = document["financial_data"] if document else None
+
+  company_name = item.get("company") or (document_company_name(financial_data) if financial_data else None)
+  if not company_name:
+    raise ValueError("Each item needs a 'company' or a 'doc_id' whose document names the company")
+
+  analysis, cached = get_report_analysis(document, company_name, item.get("mode") or mode,
+                                         refresh=bool(item.get("refresh")))
+  if analysis is None:
+    raise LookupError(f"No stock symbols found for company: {company_name}")
+  if not analysis["success"]:
+    raise RuntimeError(f"Failed to generate report content: {analysis['error']}")
+
+  build_args = (analysis_report_data(analysis), company_name, analysis["symbol"], artifact_store.staging_dir)
+  return build_args, (company_name, document, analysis, cached)
+
+
+def batch_finish_pdf_report(item, context, result):
+  """Finish stage of a batch PDF report: JSON data file and catalog rows."""
+  company_name, document, analysis, cached = context
+  pdf_filename, pdf_filepath = result
+  json_filename, _ = record_pdf_report(pdf_filename, pdf_filepath, company_name, document, analysis)
+  return {
+    "company": company_name,
+    "symbol": analysis["symbol"],
+    "doc_id": document["doc_id"] if document else None,
+    "analysis_id": analysis["analysis_id"],
+    "analysis_cached": cached,
+    "refreshed_sections": analysis.get("refreshed_sections"),
+    "pdf_filename": pdf_filename,
+    "json_data_file": json_filename
+  }
+
+
+def run_pdf_report_batch(items, mode=None, concurrency=BATCH_REPORT_CONCURRENCY, processes=BATCH_REPORT_PROCESSES):
+  """Generate a PDF report per item ({"company"} and/or {"doc_id"}), yielding progress events."""
+  # build_pdf_report lives in a module without import side effects, so spawned workers import it cheaply
+  return run_batch(items, lambda item: batch_prepare_pdf_report(item, mode), build_pdf_report,
+                   batch_finish_pdf_report, concurrency=concurrency, processes=processes)
+
+
+@app.route('/generate-pdf-reports', methods=['POST'])
+def generate_pdf_reports():
+  """Generate PDF reports for a list of companies/documents, streamed as NDJSON.
+
+  Body: {"items": [{"company": "Apple"}, {"doc_id": "..."}], "mode": "sectioned"}
+  or {"companies": ["Apple", "Microsoft"]}. Items without a doc_id are
+  reported from market data only. One line per report as it completes, then
+  a summary line with reports per minute ({"event": "error"} if the batch
+  itself fails).
+  """
+  body = request.get_json(silent=True) or {}
+  items = body.get("items") or [{"company": company} for company in body.get("companies") or []]
+  if not items or not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+    return jsonify({"error": "Provide 'items' (objects with 'company' and/or 'doc_id') or 'companies' in the JSON body"}), 400
+  if len(items) > BATCH_REPORT_MAX_ITEMS:
+    return jsonify({"error": f"At most {BATCH_REPORT_MAX_ITEMS} reports per batch"}), 400
+
+  mode = body.get("mode") or request.args.get('mode')
+
+  def stream():
+    # Runs after the response has started, so a failure is reported as a last NDJSON line
+    try:
+      for event in run_pdf_report_batch(items, mode):
+        yield json.dumps(event) + "\n"
+    except Exception as e:
+      yield json.dumps({"event": "error", "error": f"Batch report generation failed: {str(e)}"}) + "\n"
+
+  return Response(stream(), mimetype='application/x-ndjson')
+
+
+@app.route('/report-view', methods=['GET'])
+def report_view():
+  """Report for on-screen reading (?format=html|markdown); the PDF is only built on download."""
+  fmt = view_format()
+  if fmt is None:
+    return jsonify({"error": f"Unknown format. Available: {', '.join(VIEW_FORMATS)}"}), 400
+
+  document, error_response = get_request_document()
+  if error_response:
+    return error_response
+
+  company_name = request.args.get('company') or document_company_name(document["financial_data"])
+  if not company_name:
+    return jsonify({"error": "Missing 'company' parameter. Usage: /report-view?company=Apple"}), 400
+
+  try:
+    analysis, _ = get_report_analysis(document, company_name, request.args.get('mode'),
+                                      refresh=request.args.get('refresh', 'false').lower() == 'true')
+    if analysis is None:
+      return jsonify({"error": f"No stock symbols found for company: {company_name}"}), 404
+    if not analysis["success"]:
+      return jsonify({"error": "Failed to generate report content", "details": analysis["error"]}), 500
+
+    return report_view_response(analysis["analysis_id"], fmt, lambda: analysis)
+
+  except Exception as e:
+    return jsonify({"error": f"Report view failed: {str(e)}"}), 500
+
+
+@app.route('/analyses/<analysis_id>/view', methods=['GET'])
+def view_analysis(analysis_id):
+  """HTML/Markdown view of a stored analysis (?format=html|markdown)."""
+  fmt = view_format()
+  if fmt is None:
+    return jsonify({"error": f"Unknown format. Available: {', '.join(VIEW_FORMATS)}"}), 400
+
+  def load_analysis():
+    analysis = analysis_store.get(analysis_id)
+    if analysis is None:
+      raise LookupError(analysis_id)
+    return analysis
+
+  try:
+    return report_view_response(analysis_id, fmt, load_analysis)
+  except LookupError:
+    return jsonify({"error": f"Unknown analysis_id '{analysis_id}'"}), 404
+  except Exception as e:
+    return jsonify({"error": f"Report view failed: {str(e)}"}), 500
+
+
+@app.route('/analyses/<analysis_id>/download-pdf', methods=['GET'])
+def download_analysis_pdf(analysis_id):
+  """PDF of a stored analysis, built on the first download and reused afterwards."""
+  try:
+    analysis = analysis_store.get(analysis_id)
+    if analysis is None:
+      return jsonify({"error": f"Unknown analysis_id '{analysis_id}'"}), 404
+
+    pdf_filename = (analysis.get("artifacts") or {}).get("pdf")
+    # The PDF may have been pruned by the retention policy since
+    if not pdf_filename or catalog.get("pdf_report", pdf_filename) is None:
+      document = document_store.get(analysis["doc_id"]) if analysis["doc_id"] else None
+      pdf_filename = render_pdf_report(analysis, analysis["company_name"], document)["pdf_filename"]
+      analysis_store.put(dict(analysis, artifacts=dict(analysis.get("artifacts") or {}, pdf=pdf_filename)))
+
+    return send_artifact("pdf_report", pdf_filename, as_attachment=True)
+
+  except Exception as e:
+    return jsonify({"error": f"Failed to download PDF: {str(e)}"}), 500
+
+
+def accepted_encodings():
+  return {encoding for encoding, quality in request.accept_encodings if quality > 0}
+
+
+def send_artifact(kind, filename, as_attachment=False):
+  """Conditional response for a stored artifact, or None if there is no such artifact.
+
+  The ETag is the content hash, so revalidating costs one catalog lookup and
+  a 304. Files on disk are sent with send_file, which also answers Range
+  requests (resumed and partial PDF downloads); compressed artifacts are
+  sent as the precompressed variant the client accepts.
+  """
+  row = catalog.get(kind, filename)
+  if row is None:
+    return None
+  served = artifact_store.serving_file(row, accepted_encodings())
+  if served:
+    source, content_encoding = os.path.abspath(served[0]), served[1]
+  else:
+    # No variant the client accepts: stream it decompressed
+    source, content_encoding = artifact_store.open(kind, filename), None
+    if source is None:
+      return None
+
+  if row["content_hash"]:
+    etag = f"{row['content_hash']}-{content_encoding}" if content_encoding else row["content_hash"]
+  else:
+    etag = True  # legacy file: derived from its mtime and size
+  response = send_file(
+    source,
+    as_attachment=as_attachment,
+    download_name=filename,
+    mimetype=ARTIFACT_MIMETYPES[kind],
+    conditional=True,
+    etag=etag
+  )
+  if content_encoding:
+    response.headers["Content-Encoding"] = content_encoding
+  if row["encoding"] not in (None, "identity"):
+    response.headers["Vary"] = "Accept-Encoding"
+  response.headers["Cache-Control"] = "no-cache"
+  return response
+
+
 @app.route('/download-pdf/<filename>', methods=['GET'])
 def download_pdf(filename):
   """Download a specific PDF report."""
   try:
-    pdf_filepath = os.path.join(PDF_REPORTS_FOLDER, filename)
+    response = send_artifact("pdf_report", filename, as_attachment=True)
 
-    if not os.path.exists(pdf_filepath):
+    if response is None:
       return jsonify({"error": "PDF report not found"}), 404
 
-    return send_file(
-      pdf_filepath,
-      as_attachment=True,
-      download_name=filename,
-      mimetype='application/pdf'
-    )
+    return response
 
   except Exception as e:
     return jsonify({"error": f"Failed to download PDF: {str(e)}"}), 500
 
 
+@app.route('/artifacts/<kind>/<filename>', methods=['GET'])
+def download_artifact(kind, filename):
+  """A stored artifact as is: the PDF, or the JSON without the /report envelope."""
+  try:
+    if kind not in ARTIFACT_MIMETYPES:
+      return jsonify({"error": f"Unknown artifact kind '{kind}'. Use one of: {', '.join(ARTIFACT_MIMETYPES)}"}), 400
+
+    response = send_artifact(kind, filename, as_attachment=kind == "pdf_report")
+
+    if response is None:
+      return jsonify({"error": "Artifact not found"}), 404
+
+    return response
+
+  except Exception as e:
+    return jsonify({"error": f"Failed to download artifact: {str(e)}"}), 500
+
+
+def list_catalog_page(kind):
+  """One page of the catalog for kind, filtered and sorted from the query string.
+
+  The total count is included on the first page, and on later pages only
+  with ?total=true, so following next_cursor stays cheap.
+  """
+  cursor = request.args.get('cursor')
+  return catalog.list_page(
+    kind,
+    company=request.args.get('company'),
+    symbol=request.args.get('symbol'),
+    sector=request.args.get('sector'),
+    date_from=request.args.get('date_from'),
+    date_to=request.args.get('date_to'),
+    sort=request.args.get('sort', 'newest'),
+    limit=request.args.get('limit', 50),
+    cursor=cursor,
+    with_total=request.args.get('total', 'false' if cursor else 'true').lower() == 'true'
+  )
+
+
 @app.route('/pdf-reports', methods=['GET'])
 def list_pdf_reports():
-  """List all generated PDF reports."""
+  """List generated PDF reports (paginated, newest first)."""
   try:
-    reports = []
+    entries, next_cursor, total = list_catalog_page("pdf_report")
 
-    # Get PDF files
-    if os.path.exists(PDF_REPORTS_FOLDER):
-      for filename in os.listdir(PDF_REPORTS_FOLDER):
-        if filename.endswith('.pdf'):
-          try:
-            filepath = os.path.join(PDF_REPORTS_FOLDER, filename)
-            file_stats = os.stat(filepath)
-
-            # Try to find corresponding JSON data file
-            json_filename = filename.replace('.pdf', '_data.json')
-            json_filepath = os.path.join(REPORTS_FOLDER, json_filename)
-
-            metadata = {}
-            if os.path.exists(json_filepath):
-              with open(json_filepath, 'r') as f:
-                data = json.load(f)
-                metadata = data.get("report_metadata", {})
-
-            # Extract info from filename if no metadata
-            if not metadata:
-              parts = filename.replace('.pdf', '').split('_')
-              if len(parts) >= 3:
-                metadata = {
-                  "company_name": parts[0].replace('_', ' '),
-                  "company_symbol": parts[1] if len(parts) > 1 else 'N/A',
-                  "generated_date": "Unknown"
-                }
-
-            reports.append({
-              "filename": filename,
-              "company_name": metadata.get("company_name", "Unknown"),
-              "symbol": metadata.get("company_symbol", "N/A"),
-              "sector": metadata.get("sector", "N/A"),
-              "generated_date": metadata.get("generated_date", "Unknown"),
-              "file_size": f"{file_stats.st_size / 1024:.1f} KB",
-              "download_url": f"/download-pdf/{filename}",
-              "has_json_data": os.path.exists(json_filepath)
-            })
-          except Exception as e:
-            print(f"Error processing PDF report {filename}: {e}")
-            continue
-
-    # Sort by generation date (newest first)
-    reports.sort(key=lambda x: x.get("generated_date", ""), reverse=True)
+    reports = []
+    for entry in entries:
+      reports.append({
+        "filename": entry["filename"],
+        "company_name": entry["company_name"] or "Unknown",
+        "symbol": entry["symbol"] or "N/A",
+        "sector": entry["sector"] or "N/A",
+        "generated_date": entry["generated_at"][:10],
+        "generated_at": entry["generated_at"],
+        "file_size": f"{(entry['file_size'] or 0) / 1024:.1f} KB",
+        "download_url": f"/download-pdf/{entry['filename']}",
+        "has_json_data": bool(entry["data_filename"])
+      })
 
     return jsonify({
       "pdf_reports": reports,
-      "total_reports": len(reports),
+      "total_reports": total,
+      "next_cursor": next_cursor,
       "pdf_reports_folder": PDF_REPORTS_FOLDER
     })
 
+  except ValueError as e:
+    return jsonify({"error": str(e)}), 400
   except Exception as e:
     return jsonify({"error": f"Failed to list PDF reports: {str(e)}"}), 500
 
@@ -928,181 +1421,342 @@ def list_pdf_reports():
 def generate_report():
   """Generate JSON financial report (legacy endpoint)."""
 
-  # Get company parameter
-  company_name = request.args.get('company')
+  # Check if we have PDF data
+  document, error_response = get_request_document()
+  if error_response:
+    return error_response
+  financial_data = document["financial_data"]
+
+  # Get company parameter, defaulting to the company named in the document
+  company_name = request.args.get('company') or document_company_name(financial_data)
   if not company_name:
     return jsonify({"error": "Missing 'company' parameter. Usage: /generate-report?company=Apple"}), 400
 
-  # Check if we have PDF data
-  if not current_financial_data:
-    return jsonify({"error": "No PDF financial data available. Please upload a document first using /upload-pdf"}), 400
-
   try:
     print(f"Generating JSON report for company: {company_name}")
 
-    # Get Yahoo Finance data
-    symbols = company_name_to_symbol(company_name)
-    if not symbols:
+    analysis, cached = get_report_analysis(document, company_name, request.args.get('mode'),
+                                           refresh=request.args.get('refresh', 'false').lower() == 'true')
+    if analysis is None:
       return jsonify({"error": f"No stock symbols found for company: {company_name}"}), 404
 
-    print(f"Found symbols: {symbols}")
-    yahoo_data = get_company_info_for_symbols(symbols)[0] if symbols else {}
-
-    # Generate comprehensive report
-    report_result = generate_comprehensive_report(current_financial_data, yahoo_data)
-
-    if report_result["success"]:
-      # Create structured report data
-      current_date = datetime.now().strftime("%Y-%m-%d")
-
-      report_data = {
-        "report_metadata": {
-          "title": f"Financial Analysis Report - {yahoo_data.get('longName', 'Company Analysis')}",
-          "generated_date": current_date,
-          "company_symbol": yahoo_data.get('symbol', 'N/A'),
-          "company_name": yahoo_data.get('longName', 'N/A'),
-          "sector": yahoo_data.get('sector', 'N/A'),
-          "industry": yahoo_data.get('industry', 'N/A')
-        },
-        "executive_summary": {
-          "full_analysis": report_result["report_text"],
-          "key_metrics_snapshot": {
-            "market_cap": format_number(yahoo_data.get('marketCap')),
-            "current_price": f"${yahoo_data.get('regularMarketPrice', 'N/A')}",
-            "daily_change": format_percentage(yahoo_data.get('regularMarketChangePercent')),
-            "trailing_pe": yahoo_data.get('trailingPE', 'N/A'),
-            "forward_pe": yahoo_data.get('forwardPE', 'N/A'),
-            "profit_margin": format_percentage(yahoo_data.get('profitMargins')),
-            "revenue_growth": format_percentage(yahoo_data.get('revenueGrowth')),
-            "earnings_growth": format_percentage(yahoo_data.get('earningsGrowth')),
-            "dividend_yield": format_percentage(yahoo_data.get('dividendYield')),
-            "beta": yahoo_data.get('beta', 'N/A'),
-            "debt_to_equity": yahoo_data.get('debtToEquity', 'N/A'),
-            "roe": format_percentage(yahoo_data.get('returnOnEquity')),
-            "current_ratio": yahoo_data.get('currentRatio', 'N/A')
-          }
-        },
-        "document_financial_data": current_financial_data,
-        "market_data": yahoo_data,
-        "report_generation_info": {
-          "data_sources": ["PDF Document Analysis", "Yahoo Finance API"],
-          "ai_model": "meta-llama/Llama-3.2-3B-Instruct",
-          "generation_timestamp": datetime.now().isoformat()
-        }
-      }
-
-      # Save report to file
-      safe_company_name = re.sub(r'[^a-zA-Z0-9_-]', '_', company_name)
-      report_filename = f"{safe_company_name}_comprehensive_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-      report_filepath = os.path.join(REPORTS_FOLDER, report_filename)
-
-      with open(report_filepath, 'w') as f:
-        json.dump(report_data, f, indent=2)
-
+    if analysis["success"]:
+      rendered = render_json_report(analysis, company_name, document)
       return jsonify({
         "status": "JSON report generated successfully",
         "company": company_name,
-        "symbol": yahoo_data.get('symbol', 'N/A'),
-        "report": report_data,
-        "saved_to": report_filename,
+        "symbol": analysis["symbol"],
+        "report": rendered["report"],
+        "saved_to": rendered["saved_to"],
+        "analysis_id": analysis["analysis_id"],
+        "analysis_cached": cached,
+        "refreshed_sections": analysis.get("refreshed_sections"),
         "generation_time": datetime.now().isoformat(),
         "note": "For PDF reports, use /generate-pdf-report endpoint"
       }), 200
     else:
       return jsonify({
         "error": "Failed to generate report",
-        "details": report_result["error"]
+        "details": analysis["error"]
       }), 500
 
   except Exception as e:
     return jsonify({"error": f"Report generation failed: {str(e)}"}), 500
 
 
+@app.route('/analyses/<analysis_id>/render', methods=['GET'])
+def render_analysis(analysis_id):
+  """Render a stored analysis to another format (?format=pdf|json) without new model or market data calls."""
+  fmt = request.args.get('format', 'pdf').lower()
+  if fmt not in REPORT_RENDERERS:
+    return jsonify({"error": f"Unknown format '{fmt}'. Available: {', '.join(REPORT_RENDERERS)}"}), 400
+
+  try:
+    analysis = analysis_store.get(analysis_id)
+    if analysis is None:
+      return jsonify({"error": f"Unknown analysis_id '{analysis_id}'"}), 404
+    document = document_store.get(analysis["doc_id"]) if analysis["doc_id"] else None
+    company_name = request.args.get('company') or analysis["company_name"]
+
+    rendered = REPORT_RENDERERS[fmt](analysis, company_name, document)
+    return jsonify(dict({
+      "status": f"{fmt.upper()} report rendered successfully",
+      "company": company_name,
+      "symbol": analysis["symbol"],
+      "analysis_id": analysis_id,
+      "format": fmt,
+      "generation_time": datetime.now().isoformat()
+    }, **rendered)), 200
+
+  except Exception as e:
+    return jsonify({"error": f"Report rendering failed: {str(e)}"}), 500
+
+
 @app.route('/reports', methods=['GET'])
 def list_reports():
-  """List all generated JSON reports."""
+  """List generated JSON reports (paginated, newest first)."""
   try:
+    entries, next_cursor, total = list_catalog_page("json_report")
+
     reports = []
-    if os.path.exists(REPORTS_FOLDER):
-      for filename in os.listdir(REPORTS_FOLDER):
-        if filename.endswith('.json') and 'comprehensive_report' in filename:
-          try:
-            filepath = os.path.join(REPORTS_FOLDER, filename)
-            with open(filepath, 'r') as f:
-              report_data = json.load(f)
-              metadata = report_data.get("report_metadata", {})
-              reports.append({
-                "filename": filename,
-                "company_name": metadata.get("company_name", "Unknown"),
-                "symbol": metadata.get("company_symbol", "N/A"),
-                "sector": metadata.get("sector", "N/A"),
-                "generated_date": metadata.get("generated_date", "Unknown"),
-                "file_path": filepath
-              })
-          except Exception as e:
-            print(f"Error reading report {filename}: {e}")
-            continue
-
-    # Sort by generation date (newest first)
-    reports.sort(key=lambda x: x.get("generated_date", ""), reverse=True)
+    for entry in entries:
+      reports.append({
+        "filename": entry["filename"],
+        "company_name": entry["company_name"] or "Unknown",
+        "symbol": entry["symbol"] or "N/A",
+        "sector": entry["sector"] or "N/A",
+        "generated_date": entry["generated_at"][:10],
+        "generated_at": entry["generated_at"],
+        "file_path": (artifact_store.object_path(entry["content_hash"], entry["encoding"])
+                      if entry["content_hash"] else os.path.join(REPORTS_FOLDER, entry["filename"]))
+      })
 
     return jsonify({
       "json_reports": reports,
-      "total_reports": len(reports),
+      "total_reports": total,
+      "next_cursor": next_cursor,
       "reports_folder": REPORTS_FOLDER,
       "note": "These are JSON reports. For PDF reports, use /pdf-reports endpoint"
     })
 
+  except ValueError as e:
+    return jsonify({"error": str(e)}), 400
   except Exception as e:
     return jsonify({"error": f"Failed to list reports: {str(e)}"}), 500
 
 
+@app.route('/extractions', methods=['GET'])
+def list_extractions():
+  """List stored PDF extractions (paginated, newest first)."""
+  try:
+    entries, next_cursor, total = list_catalog_page("extraction")
+
+    extractions = []
+    for entry in entries:
+      extractions.append({
+        "filename": entry["filename"],
+        "source_filename": entry["metadata"].get("source_filename"),
+        "company_name": entry["company_name"] or "Unknown",
+        "sector": entry["sector"] or "N/A",
+        "generated_at": entry["generated_at"]
+      })
+
+    return jsonify({
+      "extractions": extractions,
+      "total_extractions": total,
+      "next_cursor": next_cursor
+    })
+
+  except ValueError as e:
+    return jsonify({"error": str(e)}), 400
+  except Exception as e:
+    return jsonify({"error": f"Failed to list extractions: {str(e)}"}), 500
+
+
 @app.route('/report/<filename>', methods=['GET'])
 def get_report(filename):
   """Get a specific JSON report by filename."""
   try:
-    report_filepath = os.path.join(REPORTS_FOLDER, filename)
-
-    if not os.path.exists(report_filepath):
+    # JSON reports and PDF report data files are both served here
+    row = catalog.get("json_report", filename) or catalog.get("pdf_data", filename)
+    if row is None:
       return jsonify({"error": "Report not found"}), 404
 
-    with open(report_filepath, 'r') as f:
-      report_data = json.load(f)
-
-    return jsonify({
-      "status": "Report retrieved successfully",
-      "filename": filename,
-      "report": report_data
-    })
+    report_key = f"report-{row['content_hash'] or row['generated_at']}"
+    gzipped = bool(request.accept_encodings["gzip"])
+    # The gzip and identity bodies are different representations, each with its own ETag
+    etag = f"{report_key}-gzip" if gzipped else report_key
+    if request.if_none_match.contains(etag):
+      response = Response(status=304)
+    else:
+      stream = artifact_store.open(row["kind"], filename)
+      if stream is None:
+        return jsonify({"error": "Report not found"}), 404
+
+      # The stored JSON is spliced into the envelope as bytes, never parsed and re-serialised
+      def envelope():
+        with stream:
+          report_bytes = stream.read()
+        return b"".join([
+          b'{"status":"Report retrieved successfully","filename":', json.dumps(filename).encode("utf-8"),
+          b',"report":', report_bytes, b"}"
+        ])
+
+      response = Response(content_type="application/json")
+      if gzipped:
+        body = view_cache.get_or_render(f"{report_key}.{filename}.gz",
+                                        lambda: gzip.compress(envelope(), compresslevel=6))
+        response.headers["Content-Encoding"] = "gzip"
+      else:
+        body = envelope()
+      stream.close()
+      response.set_data(body)
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["Vary"] = "Accept-Encoding"
+    return response
 
   except Exception as e:
     return jsonify({"error": f"Failed to retrieve report: {str(e)}"}), 500
 
 
+@app.route('/market-snapshots/<symbol>', methods=['GET'])
+def market_snapshots(symbol):
+  """Point-in-time market data history for a symbol (newest first)."""
+  try:
+    since = request.args.get('since')
+    until = request.args.get('until')
+    history = snapshot_store.history(
+      symbol.upper(),
+      since=datetime.fromisoformat(since).timestamp() if since else None,
+      until=datetime.fromisoformat(until).timestamp() if until else None,
+      limit=min(int(request.args.get('limit', 100)), 1000)
+    )
+    return jsonify({"symbol": symbol.upper(), "snapshots": history, "refresher": market_refresher.stats()})
+
+  except ValueError as e:
+    return jsonify({"error": str(e)}), 400
+  except Exception as e:
+    return jsonify({"error": f"Failed to read market snapshots: {str(e)}"}), 500
+
+
+@app.route('/extraction-cascade/stats', methods=['GET'])
+def extraction_cascade_stats():
+  """Escalation rate and estimated savings of the cheap-first extraction cascade."""
+  return jsonify(cascade_stats.snapshot())
+
+
+def _list_param(name):
+  value = request.args.get(name, '')
+  return [item.strip() for item in value.split(',') if item.strip()] or None
+
+
+@app.route('/metrics/query', methods=['GET'])
+def query_metrics():
+  """Filter and aggregate extracted metrics across every processed filing."""
+  global metrics_warehouse_synced
+
+  try:
+    if not metrics_warehouse_synced or request.args.get('refresh', 'false').lower() == 'true':
+      metrics_warehouse.sync(FINANCIAL_DATA_FOLDER)
+      metrics_warehouse_synced = True
+
+    results = metrics_warehouse.query(
+      company=_list_param('company'),
+      filing=_list_param('filing'),
+      period=_list_param('period'),
+      metric=_list_param('metric'),
+      group_by=_list_param('group_by'),
+      agg=request.args.get('agg', 'sum'),
+      include_percent=request.args.get('include_percent', 'true').lower() == 'true'
+    )
+    return jsonify({"results": results, "warehouse": metrics_warehouse.stats()})
+
+  except ValueError as e:
+    return jsonify({"error": str(e)}), 400
+  except Exception as e:
+    return jsonify({"error": f"Failed to query metrics: {str(e)}"}), 500
+
+
+@app.before_request
+def ensure_started():
+  if not started:
+    startup()
+
+
+@app.before_request
+def start_request_instrumentation():
+  start_request()
+
+
+@app.after_request
+def finish_request_instrumentation(response):
+  endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+  server_timing = finish_request(endpoint, request.method, response.status_code)
+  if server_timing:
+    response.headers["Server-Timing"] = server_timing
+    response.headers["Timing-Allow-Origin"] = "*"
+  return response
+
+
+def cache_metrics():
+  """Hit/miss counts of the in-process caches, read at scrape time."""
+  caches = {
+    "document": document_store.stats()["cache"],
+    "analysis": analysis_store.stats(),
+    "symbol": symbol_cache.stats(),
+    "quote": quote_cache.stats(),
+    "chart": chart_cache.stats(),
+    "view": view_cache.stats()
+  }
+  samples = [({"cache": name, "result": result}, stats[key])
+             for name, stats in caches.items() for result, key in (("hit", "hits"), ("miss", "misses"))]
+  return [("findoc_cache_requests_total", "counter", "Cache lookups by result", samples)]
+
+
+register_collector(cache_metrics)
+
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+  """Prometheus scrape endpoint."""
+  return Response(render_prometheus(), mimetype="text/plain; version=0.0.4")
+
+
 @app.route('/health', methods=['GET'])
 def health_check():
   """Health check endpoint."""
   return jsonify({
     "status": "healthy",
     "api_available": bool(HF_API_KEY),
-    "financial_data_loaded": bool(current_financial_data),
+    "financial_data_loaded": document_store.latest_id() is not None,
+    "documents": document_store.stats(),
+    "analyses": analysis_store.stats(),
+    "symbol_index": symbol_index.stats(),
+    "market_data_provider": get_provider().name,
+    "chart_cache": chart_cache.stats(),
+    "view_cache": view_cache.stats(),
+    "artifacts": artifact_store.stats(),
+    "instrumentation": instrumentation_stats(),
+    "market_refresher": market_refresher.stats(),
+    "batch_reports": {
+      "concurrency": BATCH_REPORT_CONCURRENCY,
+      "processes": BATCH_REPORT_PROCESSES,
+      "max_items": BATCH_REPORT_MAX_ITEMS
+    },
+    "market_data_cache": {
+      "symbols": symbol_cache.stats(),
+      "quotes": quote_cache.stats()
+    },
     "folders": {
       "uploads": os.path.exists(UPLOAD_FOLDER),
       "financial_data": os.path.exists(FINANCIAL_DATA_FOLDER),
       "reports": os.path.exists(REPORTS_FOLDER),
-      "pdf_reports": os.path.exists(PDF_REPORTS_FOLDER)
+      "pdf_reports": os.path.exists(PDF_REPORTS_FOLDER),
+      "artifacts": os.path.exists(artifact_store.root)
     },
     "endpoints": [
       "POST /upload-pdf",
-      "GET /financial-qa?q=question",
-      "GET /company-overview",
+      "GET /financial-qa?q=question&doc_id=id",
+      "GET /company-overview?doc_id=id",
       "GET /api/company?company=name",
-      "GET /generate-pdf-report?company=name (NEW - Creates PDF)",
-      "GET /generate-report?company=name (Legacy - Creates JSON)",
-      "GET /pdf-reports (List PDF reports)",
+      "GET /generate-pdf-report?doc_id=id[&company=name][&mode=sectioned][&refresh=true] (NEW - Creates PDF)",
+      "POST /generate-pdf-reports {items: [{company, doc_id, refresh}], mode} (Batch PDF reports, streams NDJSON)",
+      "GET /generate-report?doc_id=id[&company=name][&mode=sectioned][&refresh=true] (Legacy - Creates JSON)",
+      "GET /metrics (Prometheus: stage latencies, request latencies, tokens, cache hits)",
+      "GET /artifacts/<kind>/<filename> (Stored PDF/JSON as is; ETag, Range, precompressed gzip/br)",
+      "GET /analyses/<analysis_id>/render[?format=pdf|json][&company=name] (Re-render a stored analysis)",
+      "GET /report-view?doc_id=id[&company=name][&format=html|markdown][&refresh=true] (On-screen report, gzip + ETag)",
+      "GET /analyses/<analysis_id>/view[?format=html|markdown] (On-screen view of a stored analysis)",
+      "GET /analyses/<analysis_id>/download-pdf (PDF built on first download)",
+      "GET /pdf-reports[?company=&symbol=&sector=&date_from=&date_to=&sort=&limit=&cursor=&total=] (List PDF reports)",
       "GET /download-pdf/<filename> (Download PDF)",
-      "GET /reports (List JSON reports)",
+      "GET /reports[?company=&symbol=&sector=&date_from=&date_to=&sort=&limit=&cursor=&total=] (List JSON reports)",
+      "GET /extractions[?company=&sector=&limit=&cursor=&total=] (List stored extractions)",
       "GET /report/<filename> (Get JSON report)",
+      "GET /market-snapshots/<symbol>[?since=&until=&limit=] (Market data history)",
+      "GET /extraction-cascade/stats (Extraction cascade dashboard)",
+      "GET /metrics/query?metric=revenue_data&group_by=company[&agg=sum] (Query extracted metrics)",
       "GET /health"
     ],
     "new_features": [
@@ -1116,11 +1770,20 @@ def health_check():
 
 
 if __name__ == '__main__':
+  if "--maintenance" in sys.argv[1:]:
+    run_maintenance()
+    sys.exit(0)
+  # The debug reloader re-runs this script in a child process that serves; only that one starts up
+  if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+    startup()
   print("Starting Financial PDF Analysis API with Enhanced PDF Report Generation...")
   print(f"Upload folder: {UPLOAD_FOLDER}")
   print(f"Financial data folder: {FINANCIAL_DATA_FOLDER}")
   print(f"JSON reports folder: {REPORTS_FOLDER}")
   print(f"PDF reports folder: {PDF_REPORTS_FOLDER}")
+  print(f"Artifact store: {artifact_store.root} ({artifact_store.compression})")
+  print("Async serving (Q&A and company lookups on an event loop): uvicorn asgi:application")
+  print("Maintenance only (catalog backfill, legacy migration, retention): python app.py --maintenance")
   print("\nKey Features:")
   print("✅ PDF document analysis and financial data extraction")
   print("✅ Yahoo Finance API integration for live market data")
@@ -1130,8 +1793,9 @@ if __name__ == '__main__':
   print("✅ Downloadable PDF reports with modern design")
   print("\nMain Endpoints:")
   print("📄 POST /upload-pdf - Upload and analyze financial documents")
-  print("🔍 GET /financial-qa?q=question - Ask questions about uploaded documents")
+  print("🔍 GET /financial-qa?q=question&doc_id=id - Ask questions about uploaded documents")
   print("📊 GET /generate-pdf-report?company=name - Generate professional PDF reports")
+  print("📚 POST /generate-pdf-reports - Generate PDF reports for a list of companies (NDJSON stream)")
   print("📋 GET /generate-report?company=name - Generate JSON reports")
   print("📂 GET /pdf-reports - List all PDF reports")
   print("⬇️  GET /download-pdf/<filename> - Download PDF reports")
@@ -0,0 +1,151 @@
+"""ASGI entry point: the I/O-bound endpoints served on an event loop.
+
+    uvicorn asgi:application --host 0.0.0.0 --port 5000
+
+GET /financial-qa and GET /api/company are handled here natively. Q&A
+awaits the model through AsyncInferenceClient, so a request waiting on the
+inference API holds a coroutine instead of a thread and one process keeps
+hundreds of questions in flight (ASYNC_LLM_CONCURRENCY caps them). Calls
+with no async client (the document store, symbol search, yfinance) run on
+a bounded thread pool, ASYNC_BLOCKING_WORKERS, and share the Flask app's
+caches. Their responses carry the CORS headers flask-cors adds to the Flask
+app's (the request's Origin, allowed), since the frontend calls them
+cross-origin.
+
+Every other route goes to the Flask app through asgiref's WsgiToAsgi, run
+on a pool of ASYNC_WSGI_WORKERS threads (asgiref's default would put every
+request on one shared thread), so the CPU-heavy ones (PDF uploads with
+PyMuPDF, report builds with ReportLab and matplotlib) never block the loop
+or each other. `python app.py` still serves everything synchronously.
+"""
+import asyncio
+import contextvars
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+from huggingface_hub import AsyncInferenceClient
+
+import app as flask_app
+from services.instrumentation import span, record_tokens, start_request, finish_request
+
+ASYNC_LLM_CONCURRENCY = int(os.getenv("ASYNC_LLM_CONCURRENCY", "256"))
+ASYNC_BLOCKING_WORKERS = int(os.getenv("ASYNC_BLOCKING_WORKERS", "32"))
+ASYNC_WSGI_WORKERS = int(os.getenv("ASYNC_WSGI_WORKERS", "32"))
+
+async_client = AsyncInferenceClient(api_key=flask_app.HF_API_KEY)
+llm_slots = asyncio.Semaphore(ASYNC_LLM_CONCURRENCY)
+blocking_pool = ThreadPoolExecutor(max_workers=ASYNC_BLOCKING_WORKERS, thread_name_prefix="asgi-blocking")
+wsgi_pool = ThreadPoolExecutor(max_workers=ASYNC_WSGI_WORKERS, thread_name_prefix="asgi-wsgi")
+
+
+class PooledWsgiToAsgiInstance(WsgiToAsgiInstance):
+    # asgiref runs the WSGI app with a thread-sensitive sync_to_async, i.e. all requests on one thread
+    _run_wsgi_app = sync_to_async(WsgiToAsgiInstance.__dict__["run_wsgi_app"].func, thread_sensitive=False,
+                                  executor=wsgi_pool)
+
+    async def run_wsgi_app(self, body):
+        await self._run_wsgi_app(body)
+
+
+class PooledWsgiToAsgi(WsgiToAsgi):
+    """WsgiToAsgi that runs each request on wsgi_pool, so Flask requests run concurrently."""
+
+    async def __call__(self, scope, receive, send):
+        await PooledWsgiToAsgiInstance(self.wsgi_application, self.duplicate_header_limit)(scope, receive, send)
+
+
+wsgi_app = PooledWsgiToAsgi(flask_app.app)
+
+
+async def run_blocking(fn, *args):
+    # With the caller's context (like asyncio.to_thread), so spans inside land in its Server-Timing
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(blocking_pool, context.run, fn, *args)
+
+
+async def financial_qa(params):
+    """Async version of app.financial_qa; same parameters and response."""
+    query = params.get("q")
+    if not query:
+        return 400, {"error": "Query parameter 'q' is required"}
+
+    document, error, status = await run_blocking(flask_app.find_document, params.get("doc_id"))
+    if error:
+        return status, {"error": error}
+
+    try:
+        async with llm_slots:
+            with span("llm.qa"):
+                qa_response = await async_client.chat.completions.create(
+                    **flask_app.financial_qa_request(document, query))
+        record_tokens("qa", qa_response)
+        answer = qa_response.choices[0].message.content
+        return 200, flask_app.financial_qa_result(document, query, answer)
+    except Exception as e:
+        return 500, {"error": f"Q&A processing failed: {str(e)}"}
+
+
+async def get_company(params):
+    """Async version of app.get_company; same parameters and response."""
+    company = params.get("company")
+    if not company:
+        return 400, {"error": "Missing 'company' parameter"}
+
+    symbols = await run_blocking(flask_app.company_name_to_symbol, company)
+    if not symbols:
+        return 404, {"error": "No symbols found"}
+
+    info = await run_blocking(flask_app.get_first_company_info, symbols)
+    if info:
+        return 200, info
+    return 404, {"error": "No info found"}
+
+
+ASYNC_ROUTES = {
+    ("GET", "/financial-qa"): financial_qa,
+    ("GET", "/api/company"): get_company,
+}
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            # Catalog backfill, legacy migration, retention and the market refresher
+            await run_blocking(flask_app.startup)
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await async_client.close()
+            blocking_pool.shutdown(wait=False)
+            wsgi_pool.shutdown(wait=False)
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await lifespan(receive, send)
+        return
+
+    handler = ASYNC_ROUTES.get((scope.get("method"), scope.get("path"))) if scope["type"] == "http" else None
+    if handler is None:
+        await wsgi_app(scope, receive, send)
+        return
+
+    start_request()
+    params = {name: values[0] for name, values in parse_qs(scope["query_string"].decode("latin-1")).items()}
+    status, payload = await handler(params)
+    body = json.dumps(payload).encode("utf-8")
+    headers = [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+    origin = dict(scope.get("headers") or []).get(b"origin")
+    if origin:
+        headers += [(b"access-control-allow-origin", origin), (b"vary", b"Origin")]
+    server_timing = finish_request(scope["path"], scope["method"], status)
+    if server_timing:
+        headers += [(b"server-timing", server_timing.encode()), (b"timing-allow-origin", b"*")]
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,54 @@
+"""Generate PDF reports for a coverage list from the command line.
+
+    python batch_reports.py Apple Microsoft
+    python batch_reports.py --file coverage.txt --mode sectioned
+    python batch_reports.py --doc-id 3f2a9c... --concurrency 8 --processes 4
+
+--file holds one company name per line (blank lines and # comments are
+skipped). Progress is printed as one JSON line per finished report, then a
+summary with reports per minute.
+"""
+import argparse
+import json
+import sys
+
+from services.report_batch import BATCH_REPORT_CONCURRENCY, BATCH_REPORT_PROCESSES
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Batch PDF report generation")
+    parser.add_argument("companies", nargs="*", help="company names")
+    parser.add_argument("--file", help="file with one company name per line")
+    parser.add_argument("--doc-id", action="append", default=[], help="ingested document to report on (repeatable)")
+    parser.add_argument("--mode", choices=["single", "sectioned"], help="report generation mode")
+    parser.add_argument("--concurrency", type=int, default=BATCH_REPORT_CONCURRENCY,
+                        help="reports prepared concurrently (market data, LLM)")
+    parser.add_argument("--processes", type=int, default=BATCH_REPORT_PROCESSES,
+                        help="worker processes for charts and PDF builds (0 builds in threads)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    items = [{"company": company} for company in args.companies]
+    if args.file:
+        with open(args.file) as f:
+            items += [{"company": line.strip()} for line in f if line.strip() and not line.startswith("#")]
+    items += [{"doc_id": doc_id} for doc_id in args.doc_id]
+    if not items:
+        print("Nothing to do: give company names, --file or --doc-id", file=sys.stderr)
+        return 2
+
+    # Imported here so --help works without the API key and model client
+    from app import run_pdf_report_batch
+
+    failed = 0
+    for event in run_pdf_report_batch(items, args.mode, concurrency=args.concurrency, processes=args.processes):
+        print(json.dumps(event), flush=True)
+        if event["event"] == "summary":
+            failed = event["failed"]
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
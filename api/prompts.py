@@ -1,12 +1,145 @@
-FINANCIAL_METRICS_PROMPT = """
-You are a senior financial analyst.
+"""Central prompt registry.
+
+Every prompt is laid out static-first so provider prompt/KV caches can reuse
+as much as possible between calls:
+
+1. system + instructions + output schema (identical for every call)
+2. the document block (identical for every call about the same document)
+3. the per-call question/suffix
+
+The static parts are rendered once at registration, and each template has a
+version fingerprint that goes into result-cache keys, so changing a prompt
+invalidates whatever was produced with the old one.
+"""
+import hashlib
+import json
+
+FINANCIAL_DATA_SCHEMA = {
+    "company_info": {
+        "name": "company name if found",
+        "sector": "industry/sector if mentioned",
+        "fiscal_year": "fiscal year period"
+    },
+    "revenue_data": {
+        "total_revenue": "current period revenue",
+        "revenue_growth": "growth rate or change",
+        "revenue_breakdown": "any segment breakdown"
+    },
+    "profitability": {
+        "gross_profit": "gross profit amount",
+        "operating_profit": "operating profit/EBIT",
+        "net_income": "net income/profit",
+        "profit_margins": "any margin percentages"
+    },
+    "financial_position": {
+        "total_assets": "total assets value",
+        "total_liabilities": "total liabilities",
+        "shareholders_equity": "equity amount",
+        "cash_position": "cash and equivalents"
+    },
+    "cash_flow": {
+        "operating_cash_flow": "cash from operations",
+        "free_cash_flow": "free cash flow",
+        "capex": "capital expenditures"
+    },
+    "key_metrics": {
+        "eps": "earnings per share",
+        "pe_ratio": "price to earnings if mentioned",
+        "debt_to_equity": "debt ratios",
+        "roe": "return on equity"
+    },
+    "risks_and_outlook": {
+        "key_risks": "main risk factors mentioned",
+        "guidance": "forward guidance or outlook",
+        "market_conditions": "market commentary"
+    }
+}
+
+FINANCIAL_METRICS_SCHEMA = {
+    "revenue": [],
+    "profit": [],
+    "expenses": [],
+    "margins": [],
+    "assets_liabilities": [],
+    "cash_flow": [],
+    "debt": [],
+    "risks": [],
+    "forecasts": [],
+    "valuation_metrics": [],
+    "other": []
+}
+
+
+class PromptTemplate:
+    """A versioned prompt whose static prefix is rendered once."""
+
+    def __init__(self, name, version, system, instructions, document_label="Document text", question_label=None):
+        self.name = name
+        self.version = version
+        self.system = system.strip()
+        self.instructions = instructions.strip()
+        self.document_label = document_label
+        self.question_label = question_label
+
+        # Rendered once, shared verbatim by every call
+        self.static_prefix = f"{self.system}\n\n{self.instructions}"
+        self.fingerprint = hashlib.sha256(
+            "\x00".join([name, version, self.static_prefix, document_label, question_label or ""]).encode()
+        ).hexdigest()[:12]
+        self.version_key = f"{name}@{version}:{self.fingerprint}"
+
+    def _suffix(self, document, question):
+        parts = []
+        if document:
+            parts.append(f"{self.document_label}:\n{document}")
+        if question:
+            parts.append(f"{self.question_label}: {question}" if self.question_label else question)
+        return "\n\n".join(parts)
+
+    def messages(self, document="", question=""):
+        """Chat messages: static system prompt, then document, then question."""
+        return [
+            {"role": "system", "content": self.static_prefix},
+            {"role": "user", "content": self._suffix(document, question)}
+        ]
+
+    def render(self, document="", question=""):
+        """Single prompt string for completion-style backends (GPT4All, Ollama generate)."""
+        suffix = self._suffix(document, question)
+        body = f"{self.static_prefix}\n\n{suffix}" if suffix else self.static_prefix
+        return f"{body}\n\nAnswer:"
+
+
+PROMPTS = {}
+
+
+def register_prompt(template):
+    PROMPTS[template.name] = template
+    return template
+
+
+def get_prompt(name):
+    return PROMPTS[name]
+
+
+def prompt_cache_key(name, *parts):
+    """Result-cache key that changes whenever the prompt version does."""
+    digest = hashlib.sha256(get_prompt(name).version_key.encode())
+    for part in parts:
+        digest.update(b"\x00")
+        digest.update(part if isinstance(part, bytes) else str(part).encode())
+    return digest.hexdigest()
+
+
+FINANCIAL_METRICS_PROMPT = register_prompt(PromptTemplate(
+    name="financial_metrics",
+    version="1",
+    system="You are a senior financial analyst.",
+    instructions=f"""
 Your task: extract **all possible financial metrics** from the text below.
 Be exhaustive — if a metric is mentioned anywhere, capture it, even if approximate.
 Do not summarize; capture raw values.
 
-Text:
-{context}
-
 Extract the following categories (add others if found):
 - Revenue (total, per product, per region, YoY, QoQ)
 - Profit (gross, operating, net)
@@ -21,20 +154,89 @@ Extract the following categories (add others if found):
 - Any other numeric or percentage KPI relevant to finance
 
 Output JSON with this structure:
-{{
-  "revenue": [],
-  "profit": [],
-  "expenses": [],
-  "margins": [],
-  "assets_liabilities": [],
-  "cash_flow": [],
-  "debt": [],
-  "risks": [],
-  "forecasts": [],
-  "valuation_metrics": [],
-  "other": []
-}}
-
-Question: {question}
-Answer:
-"""
\ No newline at end of file
+{json.dumps(FINANCIAL_METRICS_SCHEMA, indent=2)}
+""",
+    document_label="Text",
+    question_label="Question"
+))
+
+FINANCIAL_DATA_EXTRACTION_PROMPT = register_prompt(PromptTemplate(
+    name="financial_data_extraction",
+    version="1",
+    system="You are an expert financial analyst. Extract all financial information comprehensively and accurately from documents.",
+    instructions=f"""
+Analyze the financial document and extract ALL available financial information.
+Return a comprehensive JSON with the following structure:
+{json.dumps(FINANCIAL_DATA_SCHEMA, indent=2)}
+
+If any field is not available in the document, set it to null.
+Extract specific numbers, percentages, and monetary values.
+"""
+))
+
+FINANCIAL_QA_PROMPT = register_prompt(PromptTemplate(
+    name="financial_qa",
+    version="1",
+    system="You are a financial expert providing precise answers based on company financial documents.",
+    instructions="""
+You have access to comprehensive financial data from a company document.
+Use the extracted financial data and document context to provide a detailed, accurate answer.
+Include specific numbers, percentages, and financial metrics when relevant.
+If the information isn't available in the data, clearly state that.
+""",
+    document_label="Financial data and document context",
+    question_label="Question"
+))
+
+COMPREHENSIVE_REPORT_PROMPT = register_prompt(PromptTemplate(
+    name="comprehensive_report",
+    version="1",
+    system="You are a senior equity research analyst. Create professional, detailed investment reports with specific insights and clear recommendations.",
+    instructions="""
+Create a comprehensive, professional financial analysis report for this company.
+Write in clear, professional language suitable for a financial report.
+
+Structure the analysis in these sections:
+
+1. EXECUTIVE SUMMARY (2-3 paragraphs)
+- Key investment thesis and recommendation
+- Overall financial health assessment
+
+2. COMPANY OVERVIEW (2 paragraphs)
+- Business description and market position
+- Competitive advantages
+
+3. FINANCIAL PERFORMANCE (3-4 paragraphs)
+- Revenue trends and profitability
+- Key financial ratios analysis
+- Cash flow assessment
+
+4. VALUATION ANALYSIS (2 paragraphs)
+- Current valuation metrics
+- Peer comparison insights
+
+5. RISK FACTORS (2 paragraphs)
+- Major operational and market risks
+- Financial stability concerns
+
+6. INVESTMENT RECOMMENDATION (1-2 paragraphs)
+- Buy/Hold/Sell recommendation with rationale
+- Target price considerations if applicable
+
+Make each section substantive and include specific financial metrics and analysis.
+""",
+    document_label="Company data"
+))
+
+REPORT_SECTION_PROMPT = register_prompt(PromptTemplate(
+    name="report_section",
+    version="1",
+    system="You are a senior equity research analyst. Create professional, detailed investment reports with specific insights and clear recommendations.",
+    instructions="""
+You are writing one section of a professional financial analysis report for this company.
+Write only the section body as plain paragraphs, without a heading or markdown.
+Include specific financial metrics and analysis.
+""",
+    document_label="Company data",
+    question_label="Section to write"
+))
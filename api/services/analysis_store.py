@@ -0,0 +1,176 @@
+# services/analysis_store.py
+"""Report analyses, computed once and rendered to any number of formats.
+
+An analysis is the expensive part of a report: the market data it was based
+on and the model's report text/sections. It is keyed by (document, symbol,
+market data, prompt version), so the JSON and PDF renderers (and any later
+format) share one analysis pass and a render after the first only costs
+formatting. The market data is part of the key by content hash, so a new
+quote or snapshot produces a new analysis instead of a stale one.
+
+Analyses live in SQLite (WAL, shared by every worker on the host);
+concurrent requests for the same key in one process wait for a single
+computation. Failed analyses are not kept. Retention follows the artifact
+store's rules: the newest ANALYSIS_KEEP_PER_DOCUMENT analyses per (document,
+symbol) are kept, and with ANALYSIS_MAX_AGE_DAYS older ones expire.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import zlib
+from concurrent.futures import Future
+from datetime import datetime, timedelta
+
+ANALYSIS_STORE_PATH = os.getenv("ANALYSIS_STORE_PATH", "analyses.db")
+ANALYSIS_KEEP_PER_DOCUMENT = int(os.getenv("ANALYSIS_KEEP_PER_DOCUMENT", "10"))  # 0 keeps every analysis
+ANALYSIS_MAX_AGE_DAYS = float(os.getenv("ANALYSIS_MAX_AGE_DAYS", "0"))  # 0 never expires
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS analyses (
+    analysis_id TEXT PRIMARY KEY,
+    doc_id TEXT,
+    symbol TEXT,
+    prompt_version TEXT NOT NULL,
+    analysis BLOB NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_analyses_doc ON analyses (doc_id, symbol);
+"""
+
+
+def market_data_hash(market_data):
+    return hashlib.sha256(json.dumps(market_data or {}, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def analysis_key(doc_id, symbol, market_data, prompt_version, refreshed_from=None):
+    """Analysis id for a document (None for market-data-only reports), symbol, market data and prompt.
+
+    A refresh of an earlier analysis (refreshed_from, its id) gets an id of its
+    own, so it never stands in for a full analysis of the same market data.
+    """
+    digest = hashlib.sha256()
+    parts = [doc_id or "", symbol or "", market_data_hash(market_data), prompt_version]
+    if refreshed_from:
+        parts.append(f"refresh:{refreshed_from}")
+    for part in parts:
+        digest.update(str(part).encode())
+        digest.update(b"\x00")
+    return digest.hexdigest()[:24]
+
+
+class AnalysisStore:
+    """SQLite store of analyses with single-flight creation."""
+
+    def __init__(self, path=ANALYSIS_STORE_PATH, keep_per_document=ANALYSIS_KEEP_PER_DOCUMENT,
+                 max_age_days=ANALYSIS_MAX_AGE_DAYS):
+        self.path = path
+        self.keep_per_document = keep_per_document
+        self.max_age_days = max_age_days
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.inflight = {}
+        self.hits = 0
+        self.misses = 0
+        self.removed = 0
+        self._connection().executescript(_SCHEMA)
+
+    def _connection(self):
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self.local.connection = connection
+        return connection
+
+    def get(self, analysis_id):
+        """The analysis stored under analysis_id, or None."""
+        row = self._connection().execute(
+            "SELECT analysis FROM analyses WHERE analysis_id = ?", (analysis_id,)).fetchone()
+        return json.loads(zlib.decompress(row[0])) if row else None
+
+    def latest(self, doc_id, symbol, prompt_version):
+        """Newest analysis of a document (None for market-data-only) and symbol, any market data."""
+        row = self._connection().execute(
+            "SELECT analysis FROM analyses WHERE doc_id IS ? AND symbol = ? AND prompt_version = ? "
+            "ORDER BY created_at DESC LIMIT 1", (doc_id, symbol, prompt_version)).fetchone()
+        return json.loads(zlib.decompress(row[0])) if row else None
+
+    def put(self, analysis):
+        connection = self._connection()
+        with connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO analyses (analysis_id, doc_id, symbol, prompt_version, analysis, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (analysis["analysis_id"], analysis.get("doc_id"), analysis.get("symbol"), analysis["prompt_version"],
+                 zlib.compress(json.dumps(analysis).encode("utf-8")), analysis.get("created_at") or datetime.now().isoformat()))
+            removed = self._apply_retention(connection, analysis.get("doc_id"), analysis.get("symbol"))
+        if removed:
+            with self.lock:
+                self.removed += removed
+
+    def _apply_retention(self, connection, doc_id, symbol):
+        """Delete analyses of (doc_id, symbol) beyond the newest keep_per_document, and expired ones."""
+        removed = 0
+        if self.keep_per_document > 0:
+            removed += connection.execute(
+                "DELETE FROM analyses WHERE analysis_id IN ("
+                "SELECT analysis_id FROM analyses WHERE doc_id IS ? AND symbol IS ? "
+                "ORDER BY created_at DESC, analysis_id DESC LIMIT -1 OFFSET ?)",
+                (doc_id, symbol, self.keep_per_document)).rowcount
+        if self.max_age_days > 0:
+            older_than = (datetime.now() - timedelta(days=self.max_age_days)).isoformat()
+            removed += connection.execute("DELETE FROM analyses WHERE created_at < ?", (older_than,)).rowcount
+        return removed
+
+    def get_or_create(self, analysis_id, create):
+        """(analysis, cached). create() builds the analysis dict on a miss (or returns
+        None); it is stored when analysis["success"] is true. Concurrent misses on
+        one id compute once."""
+        with self.lock:
+            future = self.inflight.get(analysis_id)
+            leader = future is None
+            if leader:
+                future = self.inflight[analysis_id] = Future()
+
+        if not leader:
+            # A failed analysis was computed for this request too, not served from the store
+            analysis = future.result()
+            cached = bool(analysis and analysis.get("success"))
+            with self.lock:
+                if cached:
+                    self.hits += 1
+                else:
+                    self.misses += 1
+            return analysis, cached
+
+        try:
+            analysis = self.get(analysis_id)
+            cached = analysis is not None
+            if not cached:
+                analysis = create()
+                if analysis and analysis.get("success"):
+                    self.put(analysis)
+        except BaseException as e:
+            with self.lock:
+                del self.inflight[analysis_id]
+            future.set_exception(e)
+            raise
+
+        with self.lock:
+            del self.inflight[analysis_id]
+            if cached:
+                self.hits += 1
+            else:
+                self.misses += 1
+        future.set_result(analysis)
+        return analysis, cached
+
+    def stats(self):
+        total = self._connection().execute("SELECT COUNT(*) FROM analyses").fetchone()[0]
+        with self.lock:
+            return {"analyses": total, "hits": self.hits, "misses": self.misses,
+                    "keep_per_document": self.keep_per_document, "max_age_days": self.max_age_days,
+                    "removed_by_retention": self.removed}
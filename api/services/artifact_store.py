@@ -0,0 +1,264 @@
+# services/artifact_store.py
+"""Content-addressed storage for generated reports.
+
+Artifacts (PDF reports, their JSON data files, JSON reports) are stored once
+per distinct content under objects/<2 hex>/<sha256>, so identical renders
+share one object. JSON is written compactly and compressed with zstd when
+the zstandard package is installed, gzip otherwise; PDFs are already
+compressed and are stored as is, which also lets them be served straight
+from their object file. Reads decompress on the fly as a stream.
+
+Compressed artifacts are also written at store time in every encoding HTTP
+clients commonly accept (gzip always, br when the brotli package is
+installed, plus the store's own encoding), next to the object as
+<sha256>.gz/.br/.zst. serving_file picks the variant a client accepts, so
+a JSON download is a plain file send with no compression work per request.
+
+The catalog is the index: each artifact row records the content hash,
+encoding and stored size of its object. Retention rules (keep the newest N
+per company and kind, expire after T days) run whenever a company gets a
+new artifact and once at startup; an object is deleted when no row
+references it any more. Files written before the store existed stay in
+their folders, readable, until migrate_legacy moves them in.
+"""
+import gzip
+import hashlib
+import json
+import os
+import threading
+import uuid
+from datetime import datetime, timedelta
+
+try:
+    import zstandard
+except ImportError:  # optional; gzip is always available
+    zstandard = None
+
+try:
+    import brotli
+except ImportError:  # optional; without it no br variant is written
+    brotli = None
+
+ARTIFACT_STORE_ROOT = os.getenv("ARTIFACT_STORE_ROOT", "artifacts")
+ARTIFACT_COMPRESSION = os.getenv("ARTIFACT_COMPRESSION", "zstd" if zstandard else "gzip")
+ARTIFACT_KEEP_PER_COMPANY = int(os.getenv("ARTIFACT_KEEP_PER_COMPANY", "10"))  # 0 keeps every artifact
+ARTIFACT_MAX_AGE_DAYS = float(os.getenv("ARTIFACT_MAX_AGE_DAYS", "0"))  # 0 never expires
+
+_SUFFIXES = {"identity": "", "gzip": ".gz", "zstd": ".zst", "br": ".br"}
+# Precompressed variants, in the order they are preferred when a client accepts several
+HTTP_ENCODINGS = tuple(encoding for encoding, available in
+                       (("br", brotli), ("zstd", zstandard), ("gzip", gzip)) if available)
+COMPRESSED_ENCODINGS = ("gzip", "zstd", "br")
+MIMETYPES = {
+    "pdf_report": "application/pdf",
+    "pdf_data": "application/json",
+    "json_report": "application/json",
+}
+# Kinds retention applies to; a PDF report's data file goes with its report
+RETAINED_KINDS = ("pdf_report", "json_report")
+
+
+def _compress(data, encoding):
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=10).compress(data)
+    if encoding == "gzip":
+        return gzip.compress(data, compresslevel=6)
+    if encoding == "br":
+        return brotli.compress(data, quality=9)
+    return data
+
+
+class ArtifactStore:
+    """Deduplicating, compressing artifact storage indexed by the catalog."""
+
+    def __init__(self, catalog, root=ARTIFACT_STORE_ROOT, compression=ARTIFACT_COMPRESSION,
+                 keep_per_company=ARTIFACT_KEEP_PER_COMPANY, max_age_days=ARTIFACT_MAX_AGE_DAYS,
+                 legacy_folders=None):
+        if compression == "zstd" and zstandard is None:
+            print("zstandard is not installed, compressing artifacts with gzip")
+            compression = "gzip"
+        self.catalog = catalog
+        self.root = root
+        self.compression = compression
+        self.keep_per_company = keep_per_company
+        self.max_age_days = max_age_days
+        self.legacy_folders = legacy_folders or {}
+        self.objects_dir = os.path.join(root, "objects")
+        self.staging_dir = os.path.join(root, "staging")
+        self.lock = threading.Lock()
+        self.removed = 0
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.staging_dir, exist_ok=True)
+
+    def object_path(self, content_hash, encoding):
+        return os.path.join(self.objects_dir, content_hash[:2], content_hash + _SUFFIXES[encoding])
+
+    def staging_path(self, filename):
+        """Where a producer (e.g. the PDF builder) writes a file before put_file takes it in."""
+        return os.path.join(self.staging_dir, filename)
+
+    def _write_object(self, data, encoding):
+        content_hash = hashlib.sha256(data).hexdigest()
+        path = self.object_path(content_hash, encoding)
+        if os.path.exists(path):
+            return content_hash, os.path.getsize(path)
+        stored = _compress(data, encoding)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(stored)
+        os.replace(temp_path, path)  # atomic, so readers never see a partial object
+        return content_hash, len(stored)
+
+    def put(self, kind, filename, data, compress=True, **fields):
+        """Store bytes as artifact kind/filename and index it; fields go to the catalog row."""
+        encoding = self.compression if compress else "identity"
+        # Under the lock retention uses, so an object cannot be collected between reuse and indexing
+        with self.lock:
+            content_hash, stored_size = self._write_object(data, encoding)
+            if compress:
+                for variant in HTTP_ENCODINGS:
+                    if variant != encoding:
+                        self._write_object(data, variant)
+            self.catalog.record(kind, filename, file_size=len(data), content_hash=content_hash,
+                                encoding=encoding, stored_size=stored_size, **fields)
+        if kind in RETAINED_KINDS:
+            self.apply_retention(kind, fields.get("company_name"))
+        return {"content_hash": content_hash, "encoding": encoding, "file_size": len(data),
+                "stored_size": stored_size, "path": self.object_path(content_hash, encoding)}
+
+    def put_json(self, kind, filename, obj, **fields):
+        data = json.dumps(obj, separators=(",", ":"), default=str).encode("utf-8")
+        return self.put(kind, filename, data, compress=True, **fields)
+
+    def put_file(self, kind, filename, path, compress=False, **fields):
+        """Move a finished file (e.g. a PDF in staging) into the store."""
+        with open(path, "rb") as f:
+            data = f.read()
+        stored = self.put(kind, filename, data, compress=compress, **fields)
+        os.remove(path)
+        return stored
+
+    def _legacy_path(self, kind, filename):
+        folder = self.legacy_folders.get(kind)
+        return os.path.join(folder, filename) if folder else None
+
+    def serving_file(self, row, accepted):
+        """(path, content_encoding) to send the artifact of a catalog row to a client that accepts
+        the encodings in accepted: an identity object or legacy file as is, a compressed one as
+        its precompressed variant. None if it would have to be decompressed (or is missing)."""
+        if row["content_hash"] is None:
+            path = self._legacy_path(row["kind"], row["filename"])
+            return (path, None) if path and os.path.exists(path) else None
+        if row["encoding"] == "identity":
+            return self.object_path(row["content_hash"], "identity"), None
+        for encoding in HTTP_ENCODINGS:
+            path = self.object_path(row["content_hash"], encoding)
+            if encoding in accepted and os.path.exists(path):
+                return path, encoding
+        return None
+
+    def open(self, kind, filename):
+        """Readable binary stream of the artifact's original bytes, or None if it is unknown."""
+        row = self.catalog.get(kind, filename)
+        if row is None:
+            return None
+        if row["content_hash"] is None:
+            path = self._legacy_path(kind, filename)
+            return open(path, "rb") if path and os.path.exists(path) else None
+
+        path = self.object_path(row["content_hash"], row["encoding"])
+        if not os.path.exists(path):
+            return None
+        if row["encoding"] == "gzip":
+            return gzip.open(path, "rb")
+        if row["encoding"] == "zstd":
+            return zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True)
+        return open(path, "rb")
+
+    def read_json(self, kind, filename):
+        stream = self.open(kind, filename)
+        if stream is None:
+            return None
+        with stream:
+            return json.loads(stream.read())
+
+    def _remove_objects(self, content_hash, encodings):
+        for encoding in encodings:
+            path = self.object_path(content_hash, encoding)
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _delete_rows(self, rows):
+        """Remove rows from the catalog and delete objects/legacy files nothing references any more."""
+        for row in rows:
+            self.catalog.remove(row["kind"], row["filename"])
+            if row["content_hash"] is None:
+                path = self._legacy_path(row["kind"], row["filename"])
+                if path and os.path.exists(path):
+                    os.remove(path)
+            elif row["encoding"] == "identity":
+                if not self.catalog.hash_referenced(row["content_hash"], ("identity",)):
+                    self._remove_objects(row["content_hash"], ("identity",))
+            elif not self.catalog.hash_referenced(row["content_hash"], COMPRESSED_ENCODINGS):
+                # The object and its precompressed variants
+                self._remove_objects(row["content_hash"], COMPRESSED_ENCODINGS)
+            self.removed += 1
+
+    def apply_retention(self, kind=None, company_name=None):
+        """Apply the retention rules to one kind (or all retained kinds), optionally one company.
+
+        Returns the number of artifacts removed.
+        """
+        older_than = None
+        if self.max_age_days > 0:
+            older_than = (datetime.now() - timedelta(days=self.max_age_days)).isoformat()
+        removed = 0
+        with self.lock:
+            for retained_kind in ([kind] if kind else RETAINED_KINDS):
+                rows = self.catalog.retention_candidates(retained_kind, self.keep_per_company, older_than,
+                                                         company_name)
+                data_rows = []
+                for row in rows:
+                    if row["kind"] == "pdf_report" and row["data_filename"]:
+                        data_row = self.catalog.get("pdf_data", row["data_filename"])
+                        if data_row is None and self.catalog.get("json_report", row["data_filename"]) is None:
+                            # Legacy PDF data files were never cataloged on their own
+                            data_row = {"kind": "pdf_data", "filename": row["data_filename"],
+                                        "content_hash": None, "encoding": None}
+                        if data_row is not None:
+                            data_rows.append(data_row)
+                self._delete_rows(rows + data_rows)
+                removed += len(rows)
+        return removed
+
+    def migrate_legacy(self):
+        """Move files written before the store existed into it. Returns the number moved."""
+        moved = 0
+        for row in self.catalog.legacy_rows(RETAINED_KINDS):
+            path = self._legacy_path(row["kind"], row["filename"])
+            if not path or not os.path.exists(path):
+                continue
+            fields = {key: row[key] for key in ("company_name", "symbol", "sector", "industry", "generated_at",
+                                                "data_filename")}
+            try:
+                if row["kind"] == "pdf_report" and row["data_filename"]:
+                    data_path = self._legacy_path("pdf_data", row["data_filename"])
+                    if data_path and os.path.exists(data_path):
+                        with open(data_path, "rb") as f:
+                            data = f.read()
+                        self.put("pdf_data", row["data_filename"], data, compress=True,
+                                 **dict(fields, data_filename=None))
+                        os.remove(data_path)
+                self.put_file(row["kind"], row["filename"], path, compress=row["kind"] != "pdf_report",
+                              metadata=row["metadata"] or None, **fields)
+                moved += 1
+            except Exception as e:
+                print(f"Error moving {row['kind']} {row['filename']} into the artifact store: {e}")
+        return moved
+
+    def stats(self):
+        return dict(self.catalog.storage_stats(), root=self.root, compression=self.compression,
+                    http_encodings=list(HTTP_ENCODINGS),
+                    keep_per_company=self.keep_per_company, max_age_days=self.max_age_days,
+                    removed_by_retention=self.removed)
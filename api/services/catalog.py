@@ -0,0 +1,346 @@
+# services/catalog.py
+"""SQLite catalog of generated artifacts (PDF reports, JSON reports, extractions).
+
+Rows are written when an artifact is written, so listing endpoints query an
+index instead of scanning folders and opening every JSON file. Rows of
+artifacts kept in the artifact store (services/artifact_store.py) also carry
+the content hash and encoding of the stored object; rows without one refer
+to a file in the legacy folders. The database
+runs in WAL mode so readers never block the writer. Pages are fetched with
+keyset cursors on (generated_at, id), which keeps each page the same cost no
+matter how deep into the listing it is.
+"""
+import base64
+import json
+import os
+import sqlite3
+import re
+import threading
+from datetime import datetime
+
+CATALOG_PATH = os.getenv("CATALOG_PATH", "catalog.db")
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+KINDS = ("pdf_report", "json_report", "extraction", "pdf_data")
+_PDF_FILENAME_RE = re.compile(r"^(?P<company>.+)_(?P<symbol>[^_]+)_Financial_Report_(?P<date>\d{8})_(?P<time>\d{6})\.pdf$")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS artifacts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    company_name TEXT COLLATE NOCASE,
+    symbol TEXT,
+    sector TEXT,
+    industry TEXT,
+    generated_at TEXT NOT NULL,
+    file_size INTEGER,
+    data_filename TEXT,
+    metadata TEXT,
+    content_hash TEXT,
+    encoding TEXT,
+    stored_size INTEGER,
+    UNIQUE (kind, filename)
+);
+CREATE INDEX IF NOT EXISTS idx_artifacts_kind_time ON artifacts (kind, generated_at, id);
+CREATE INDEX IF NOT EXISTS idx_artifacts_symbol ON artifacts (kind, symbol COLLATE NOCASE, generated_at, id);
+CREATE INDEX IF NOT EXISTS idx_artifacts_company ON artifacts (kind, company_name, generated_at, id);
+CREATE INDEX IF NOT EXISTS idx_artifacts_sector ON artifacts (kind, sector COLLATE NOCASE, generated_at, id);
+CREATE INDEX IF NOT EXISTS idx_artifacts_hash ON artifacts (content_hash);
+"""
+
+# Columns added after the first release, added in place to existing catalogs
+_ADDED_COLUMNS = (("content_hash", "TEXT"), ("encoding", "TEXT"), ("stored_size", "INTEGER"))
+
+
+def encode_cursor(generated_at, row_id):
+    return base64.urlsafe_b64encode(json.dumps([generated_at, row_id]).encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        generated_at, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return str(generated_at), int(row_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+class Catalog:
+    """Thread-safe artifact index; one SQLite connection per thread."""
+
+    def __init__(self, path=CATALOG_PATH):
+        self.path = path
+        self.local = threading.local()
+        self.write_lock = threading.Lock()
+        with self.write_lock:
+            connection = self._connection()
+            columns = {row["name"] for row in connection.execute("PRAGMA table_info(artifacts)")}
+            if columns:
+                for column, column_type in _ADDED_COLUMNS:
+                    if column not in columns:
+                        connection.execute(f"ALTER TABLE artifacts ADD COLUMN {column} {column_type}")
+            connection.executescript(_SCHEMA)
+
+    def _connection(self):
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self.local.connection = connection
+        return connection
+
+    def record(self, kind, filename, company_name=None, symbol=None, sector=None, industry=None,
+               generated_at=None, file_size=None, data_filename=None, metadata=None,
+               content_hash=None, encoding=None, stored_size=None):
+        """Insert or replace the catalog row of one artifact."""
+        self.record_many([dict(kind=kind, filename=filename, company_name=company_name, symbol=symbol,
+                               sector=sector, industry=industry, generated_at=generated_at,
+                               file_size=file_size, data_filename=data_filename, metadata=metadata,
+                               content_hash=content_hash, encoding=encoding, stored_size=stored_size)])
+
+    def record_many(self, entries):
+        """Insert or replace many rows (keyword dicts as taken by record) in one transaction."""
+        values = []
+        for entry in entries:
+            if entry["kind"] not in KINDS:
+                raise ValueError(f"Unknown artifact kind '{entry['kind']}'")
+            metadata = entry.get("metadata")
+            values.append((entry["kind"], entry["filename"], entry.get("company_name"), entry.get("symbol"),
+                           entry.get("sector"), entry.get("industry"),
+                           entry.get("generated_at") or datetime.now().isoformat(), entry.get("file_size"),
+                           entry.get("data_filename"), json.dumps(metadata) if metadata is not None else None,
+                           entry.get("content_hash"), entry.get("encoding"), entry.get("stored_size")))
+        connection = self._connection()
+        with self.write_lock, connection:
+            connection.executemany(
+                """INSERT INTO artifacts (kind, filename, company_name, symbol, sector, industry,
+                                          generated_at, file_size, data_filename, metadata,
+                                          content_hash, encoding, stored_size)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT (kind, filename) DO UPDATE SET
+                     company_name = excluded.company_name, symbol = excluded.symbol,
+                     sector = excluded.sector, industry = excluded.industry,
+                     generated_at = excluded.generated_at, file_size = excluded.file_size,
+                     data_filename = excluded.data_filename, metadata = excluded.metadata,
+                     content_hash = excluded.content_hash, encoding = excluded.encoding,
+                     stored_size = excluded.stored_size""",
+                values)
+
+    def remove(self, kind, filename):
+        connection = self._connection()
+        with self.write_lock, connection:
+            connection.execute("DELETE FROM artifacts WHERE kind = ? AND filename = ?", (kind, filename))
+
+    def get(self, kind, filename):
+        row = self._connection().execute(
+            "SELECT * FROM artifacts WHERE kind = ? AND filename = ?", (kind, filename)).fetchone()
+        return self._row(row) if row else None
+
+    def filenames(self, kind, legacy_only=False):
+        """Filenames of kind; legacy_only limits them to files outside the artifact store."""
+        query = "SELECT filename FROM artifacts WHERE kind = ?"
+        if legacy_only:
+            query += " AND content_hash IS NULL"
+        return {row["filename"] for row in self._connection().execute(query, (kind,))}
+
+    def legacy_rows(self, kinds):
+        """Rows of kinds whose file is not in the artifact store yet."""
+        rows = self._connection().execute(
+            f"SELECT * FROM artifacts WHERE content_hash IS NULL AND kind IN ({','.join('?' * len(kinds))})",
+            list(kinds)).fetchall()
+        return [self._row(row) for row in rows]
+
+    def retention_candidates(self, kind, keep_per_company=0, older_than=None, company_name=None):
+        """Rows of kind beyond the newest keep_per_company per company, or generated before older_than."""
+        clauses, params = ["kind = ?"], [kind]
+        if company_name is not None:
+            clauses.append("company_name = ?")
+            params.append(company_name)
+        conditions, condition_params = [], []
+        if keep_per_company > 0:
+            conditions.append("rank > ?")
+            condition_params.append(keep_per_company)
+        if older_than:
+            conditions.append("generated_at < ?")
+            condition_params.append(older_than)
+        if not conditions:
+            return []
+        rows = self._connection().execute(
+            f"""SELECT * FROM (
+                  SELECT *, ROW_NUMBER() OVER (PARTITION BY company_name ORDER BY generated_at DESC, id DESC) AS rank
+                  FROM artifacts WHERE {' AND '.join(clauses)})
+                WHERE {' OR '.join(conditions)}""", params + condition_params).fetchall()
+        return [self._row(row) for row in rows]
+
+    def hash_referenced(self, content_hash, encodings):
+        """Whether any artifact row stores content_hash in one of encodings."""
+        placeholders = ", ".join("?" * len(encodings))
+        row = self._connection().execute(
+            f"SELECT 1 FROM artifacts WHERE content_hash = ? AND encoding IN ({placeholders}) LIMIT 1",
+            (content_hash, *encodings)).fetchone()
+        return row is not None
+
+    def storage_stats(self):
+        """Artifact counts and logical vs stored bytes (deduplicated objects counted once)."""
+        connection = self._connection()
+        rows = connection.execute(
+            "SELECT kind, COUNT(*) AS artifacts, COALESCE(SUM(file_size), 0) AS bytes FROM artifacts GROUP BY kind")
+        kinds = {row["kind"]: {"artifacts": row["artifacts"], "bytes": row["bytes"]} for row in rows}
+        stored = connection.execute(
+            "SELECT COUNT(*), COALESCE(SUM(stored_size), 0) FROM "
+            "(SELECT DISTINCT content_hash, encoding, stored_size FROM artifacts WHERE content_hash IS NOT NULL)"
+        ).fetchone()
+        return {"kinds": kinds, "objects": stored[0], "stored_bytes": stored[1]}
+
+    def company_names(self, kind):
+        rows = self._connection().execute(
+            "SELECT DISTINCT company_name FROM artifacts WHERE kind = ? AND company_name IS NOT NULL", (kind,))
+        return [row["company_name"] for row in rows]
+
+    def _where(self, kind, company, symbol, sector, date_from, date_to):
+        clauses, params = ["kind = ?"], [kind]
+        if company:
+            # Prefix match, so "apple" finds "Apple Inc."
+            clauses.append("company_name LIKE ? ESCAPE '\\'")
+            params.append(company.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%")
+        for column, value in (("symbol", symbol), ("sector", sector)):
+            if value:
+                clauses.append(f"{column} = ? COLLATE NOCASE")
+                params.append(value)
+        if date_from:
+            clauses.append("generated_at >= ?")
+            params.append(date_from)
+        if date_to:
+            # A bare date includes the whole day
+            clauses.append("generated_at < ?")
+            params.append(date_to + "~" if len(date_to) == 10 else date_to)
+        return clauses, params
+
+    def list_page(self, kind, company=None, symbol=None, sector=None, date_from=None, date_to=None,
+                  sort="newest", limit=DEFAULT_PAGE_SIZE, cursor=None, with_total=False):
+        """One page of artifacts. Returns (items, next_cursor, total).
+
+        The total is a COUNT over every matching row, so it is only computed
+        with with_total; otherwise total is None and the page costs the same
+        at any depth.
+        """
+        if sort not in ("newest", "oldest"):
+            raise ValueError("sort must be 'newest' or 'oldest'")
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        clauses, params = self._where(kind, company, symbol, sector, date_from, date_to)
+        connection = self._connection()
+
+        total = None
+        if with_total:
+            total = connection.execute(
+                f"SELECT COUNT(*) FROM artifacts WHERE {' AND '.join(clauses)}", params).fetchone()[0]
+
+        page_clauses, page_params = list(clauses), list(params)
+        if cursor:
+            generated_at, row_id = decode_cursor(cursor)
+            page_clauses.append("(generated_at, id) < (?, ?)" if sort == "newest" else "(generated_at, id) > (?, ?)")
+            page_params += [generated_at, row_id]
+        direction = "DESC" if sort == "newest" else "ASC"
+        rows = connection.execute(
+            f"SELECT * FROM artifacts WHERE {' AND '.join(page_clauses)} "
+            f"ORDER BY generated_at {direction}, id {direction} LIMIT ?",
+            page_params + [limit + 1]).fetchall()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1]["generated_at"], rows[-1]["id"])
+        return [self._row(row) for row in rows], next_cursor, total
+
+    @staticmethod
+    def _row(row):
+        item = dict(row)
+        item.pop("rank", None)
+        item["metadata"] = json.loads(item["metadata"]) if item["metadata"] else {}
+        return item
+
+
+def _generated_at(data, path):
+    """Best timestamp for an artifact written before the catalog existed."""
+    for section in ("generation_info", "report_generation_info"):
+        timestamp = (data.get(section) or {}).get("generation_timestamp")
+        if timestamp:
+            return timestamp
+    date = (data.get("report_metadata") or {}).get("generated_date")
+    if date and date != "Unknown":
+        return date
+    return datetime.fromtimestamp(os.path.getmtime(path)).isoformat()
+
+
+def backfill(catalog, pdf_reports_folder, reports_folder, financial_data_folder):
+    """Index artifacts already on disk that the catalog does not know about.
+
+    Runs once at startup; afterwards rows are added as artifacts are written.
+    Rows whose legacy file has disappeared are dropped (rows of artifacts in
+    the artifact store do not refer to these folders).
+    """
+    entries = []
+    for kind, folder, matches in (
+            ("pdf_report", pdf_reports_folder, lambda name: name.endswith(".pdf")),
+            ("json_report", reports_folder, lambda name: name.endswith(".json") and "comprehensive_report" in name),
+            ("extraction", financial_data_folder, lambda name: name.endswith(".json"))):
+        if not os.path.isdir(folder):
+            continue
+        known = catalog.filenames(kind)
+        on_disk = {name for name in os.listdir(folder) if matches(name)}
+        for name in catalog.filenames(kind, legacy_only=True) - on_disk:
+            catalog.remove(kind, name)
+
+        for name in on_disk - known:
+            path = os.path.join(folder, name)
+            try:
+                if kind == "pdf_report":
+                    data_filename = name.replace(".pdf", "_data.json")
+                    data_path = os.path.join(reports_folder, data_filename)
+                    data = {}
+                    if os.path.exists(data_path):
+                        with open(data_path, "r") as f:
+                            data = json.load(f)
+                    else:
+                        data_filename = None
+                    metadata = data.get("report_metadata", {})
+                    match = _PDF_FILENAME_RE.match(name)
+                    if not metadata and match:
+                        metadata = {"company_name": match.group("company").replace("_", " ").strip(),
+                                    "company_symbol": match.group("symbol")}
+                    if data or not match:
+                        generated_at = _generated_at(data, path)
+                    else:
+                        generated_at = datetime.strptime(match.group("date") + match.group("time"),
+                                                         "%Y%m%d%H%M%S").isoformat()
+                else:
+                    with open(path, "r") as f:
+                        data = json.load(f)
+                    data_filename = None
+                    if kind == "json_report":
+                        metadata = data.get("report_metadata", {})
+                    else:
+                        company_info = (data.get("extraction_result", {}).get("financial_data") or {}).get(
+                            "company_info") or {}
+                        metadata = {"company_name": company_info.get("name"), "sector": company_info.get("sector")}
+                    generated_at = _generated_at(data, path)
+
+                entries.append(dict(
+                    kind=kind, filename=name,
+                    company_name=metadata.get("company_name"),
+                    symbol=metadata.get("company_symbol"),
+                    sector=metadata.get("sector"),
+                    industry=metadata.get("industry"),
+                    generated_at=generated_at,
+                    file_size=os.path.getsize(path),
+                    data_filename=data_filename,
+                    metadata={"source_filename": data.get("filename")} if kind == "extraction" else None))
+            except Exception as e:
+                print(f"Error indexing {kind} {name}: {e}")
+
+    if entries:
+        catalog.record_many(entries)
+    return len(entries)
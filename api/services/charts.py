@@ -0,0 +1,272 @@
+# services/charts.py
+"""Thread-safe chart rendering with a content-addressed cache.
+
+Each chart is drawn on its own Figure with the Agg canvas, so nothing goes
+through pyplot's global state and concurrent requests cannot interfere.
+Charts are described by a plain spec dict; the hash of the spec, dpi and
+format is the cache key, so an identical metric set is rendered once and
+then served from a bounded in-memory store.
+
+For PDFs the same spec can instead be drawn as a native ReportLab vector
+Drawing (CHART_BACKEND=reportlab, the default), which is much faster than
+rasterising and keeps report files small; matplotlib remains the fallback.
+The Drawing also exports to SVG for the HTML report views.
+Benchmark both: python services/charts.py
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from io import BytesIO
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from reportlab.graphics import renderSVG
+from reportlab.graphics.charts.barcharts import VerticalBarChart
+from reportlab.graphics.charts.piecharts import Pie
+from reportlab.graphics.shapes import Drawing, String
+from reportlab.lib import colors
+
+CHART_BACKEND = os.getenv("CHART_BACKEND", "reportlab")  # "reportlab" (vector) or "matplotlib" (PNG)
+CHART_DPI = int(os.getenv("CHART_DPI", "150"))
+CHART_CACHE_MAX_BYTES = int(os.getenv("CHART_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+DEFAULT_COLORS = ['#2E86AB', '#A23B72', '#F18F01', '#C73E1D', '#4CAF50', '#9C27B0']
+
+
+class ChartCache:
+    """LRU of rendered chart bytes, bounded by total size."""
+
+    def __init__(self, max_bytes=CHART_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.inflight = {}
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_render(self, key, render):
+        """Cached bytes for key; concurrent misses on the same key render once."""
+        with self.lock:
+            data = self.entries.get(key)
+            if data is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return data
+            future = self.inflight.get(key)
+            leader = future is None
+            if leader:
+                self.misses += 1
+                future = self.inflight[key] = Future()
+            else:
+                self.hits += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            data = render()
+        except BaseException as e:
+            with self.lock:
+                del self.inflight[key]
+            future.set_exception(e)
+            raise
+
+        with self.lock:
+            del self.inflight[key]
+            if len(data) <= self.max_bytes:
+                self.entries[key] = data
+                self.size += len(data)
+                while self.size > self.max_bytes:
+                    _, evicted = self.entries.popitem(last=False)
+                    self.size -= len(evicted)
+        future.set_result(data)
+        return data
+
+    def stats(self):
+        with self.lock:
+            return {"charts": len(self.entries), "bytes": self.size, "max_bytes": self.max_bytes,
+                    "hits": self.hits, "misses": self.misses}
+
+
+chart_cache = ChartCache()
+
+
+def chart_key(spec, dpi, fmt):
+    payload = json.dumps(spec, sort_keys=True, default=str) + f"|{dpi}|{fmt}"
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _style_axes(ax):
+    # The seaborn look the reports used, set on this Axes only instead of through global rcParams
+    ax.set_facecolor('#EAEAF2')
+    ax.grid(True, color='white', linewidth=1.0)
+    ax.set_axisbelow(True)
+    for spine in ax.spines.values():
+        spine.set_visible(False)
+    ax.tick_params(length=0, colors='.15')
+
+
+def _draw_bar(fig, spec):
+    ax = fig.add_subplot()
+    _style_axes(ax)
+    labels, values = spec["labels"], spec["values"]
+    bars = ax.bar(labels, values, color=spec.get("colors") or DEFAULT_COLORS[:len(values)])
+    ax.set_title(spec.get("title", ""), fontsize=16, fontweight='bold')
+    ax.set_ylabel(spec.get("ylabel", "Value"), fontsize=12)
+    if spec.get("rotate_labels", True):
+        for label in ax.get_xticklabels():
+            label.set_rotation(45)
+            label.set_horizontalalignment('right')
+
+    value_format = spec.get("value_format", "{:.1f}")
+    for bar, value in zip(bars, values):
+        ax.text(bar.get_x() + bar.get_width() / 2., bar.get_height(), value_format.format(value),
+                ha='center', va='bottom')
+
+
+def _draw_pie(fig, spec):
+    ax = fig.add_subplot()
+    if spec["values"]:
+        ax.pie(spec["values"], labels=spec["labels"], colors=spec.get("colors") or None,
+               startangle=90, textprops={'fontsize': 10})
+    else:
+        ax.text(0.5, 0.5, spec.get("empty_text", "Data not available"), ha='center', va='center',
+                transform=ax.transAxes)
+    ax.set_title(spec.get("title", ""), fontsize=14, fontweight='bold', pad=20)
+
+
+_DRAWERS = {"bar": _draw_bar, "pie": _draw_pie}
+
+
+def render_chart(spec, dpi=CHART_DPI, fmt="png"):
+    """Render a chart spec, or return it from the cache. Returns (key, image bytes).
+
+    spec: {"type": "bar" | "pie", "labels", "values", "title", optional
+    "colors", "ylabel", "value_format", "size": [width, height] in inches}.
+    """
+    def render():
+        fig = Figure(figsize=tuple(spec.get("size", (10, 6))), facecolor='white')
+        FigureCanvasAgg(fig)
+        _DRAWERS[spec.get("type", "bar")](fig, spec)
+        fig.tight_layout()
+        buffer = BytesIO()
+        fig.savefig(buffer, format=fmt, dpi=dpi, bbox_inches='tight', facecolor='white')
+        return buffer.getvalue()
+
+    key = chart_key(spec, dpi, fmt)
+    return key, chart_cache.get_or_render(key, render)
+
+
+def _vector_bar(drawing, spec, width, height):
+    labels, values = spec["labels"], spec["values"]
+    palette = spec.get("colors") or DEFAULT_COLORS[:len(values)]
+    chart = VerticalBarChart()
+    chart.x, chart.y = 50, 60
+    chart.width, chart.height = width - 70, height - 100
+    chart.data = [list(values)]
+    chart.strokeColor = None
+    chart.fillColor = colors.HexColor('#EAEAF2')
+    chart.barSpacing = 4
+    chart.groupSpacing = 12
+    chart.valueAxis.visibleGrid = True
+    chart.valueAxis.gridStrokeColor = colors.white
+    chart.valueAxis.gridStrokeWidth = 1
+    chart.valueAxis.strokeColor = None
+    chart.valueAxis.labels.fontName = 'Helvetica'
+    chart.valueAxis.labels.fontSize = 8
+    chart.valueAxis.forceZero = True
+    chart.categoryAxis.categoryNames = list(labels)
+    chart.categoryAxis.strokeColor = None
+    chart.categoryAxis.labels.fontName = 'Helvetica'
+    chart.categoryAxis.labels.fontSize = 8
+    if spec.get("rotate_labels", True):
+        chart.categoryAxis.labels.angle = 30
+        chart.categoryAxis.labels.boxAnchor = 'ne'
+    chart.barLabelFormat = lambda value: spec.get("value_format", "{:.1f}").format(value)
+    chart.barLabels.fontName = 'Helvetica'
+    chart.barLabels.fontSize = 8
+    chart.barLabels.nudge = 6
+    for i, color in enumerate(palette):
+        chart.bars[(0, i)].fillColor = colors.HexColor(color)
+        chart.bars[(0, i)].strokeColor = None
+    drawing.add(chart)
+
+
+def _vector_pie(drawing, spec, width, height):
+    if not spec["values"]:
+        drawing.add(String(width / 2, height / 2, spec.get("empty_text", "Data not available"),
+                           textAnchor='middle', fontSize=10))
+        return
+    pie = Pie()
+    size = min(width, height) - 110
+    pie.x, pie.y = (width - size) / 2, (height - size) / 2 - 10
+    pie.width = pie.height = size
+    pie.data = list(spec["values"])
+    pie.labels = [label.replace("\n", " ") for label in spec["labels"]]
+    pie.startAngle = 90
+    pie.slices.strokeColor = colors.white
+    pie.slices.fontName = 'Helvetica'
+    pie.slices.fontSize = 8
+    for i, color in enumerate(spec.get("colors") or DEFAULT_COLORS[:len(spec["values"])]):
+        pie.slices[i].fillColor = colors.HexColor(color)
+    drawing.add(pie)
+
+
+_VECTOR_DRAWERS = {"bar": _vector_bar, "pie": _vector_pie}
+
+
+def render_drawing(spec, width, height):
+    """Draw a chart spec as a ReportLab vector Drawing (a flowable) of width x height points."""
+    drawing = Drawing(width, height)
+    drawing.add(String(width / 2, height - 18, spec.get("title", ""), textAnchor='middle',
+                       fontName='Helvetica-Bold', fontSize=12))
+    _VECTOR_DRAWERS[spec.get("type", "bar")](drawing, spec, width, height)
+    return drawing
+
+
+def render_svg(spec, width, height):
+    """Chart spec as an inline <svg> element (the vector Drawing exported), cached like raster charts."""
+    def render():
+        svg = renderSVG.drawToString(render_drawing(spec, width, height))
+        return svg[svg.index("<svg"):].encode("utf-8")
+
+    return chart_cache.get_or_render(chart_key(spec, f"{width}x{height}", "svg"), render).decode("utf-8")
+
+
+if __name__ == "__main__":
+    import time
+
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.units import inch
+    from reportlab.platypus import Image, SimpleDocTemplate
+
+    spec = {"type": "bar", "title": "Key Financial Metrics", "ylabel": "Value",
+            "labels": ['Market Cap (B)', 'P/E Ratio', 'Profit Margin (%)', 'ROE (%)', 'Beta'],
+            "values": [3012.4, 31.2, 24.3, 147.9, 1.2]}
+    runs = 20
+
+    def build_pdf(flowable):
+        buffer = BytesIO()
+        SimpleDocTemplate(buffer, pagesize=A4).build([flowable])
+        return len(buffer.getvalue())
+
+    for dpi in (300, CHART_DPI):
+        started = time.perf_counter()
+        for i in range(runs):
+            # A fresh title each run so the cache does not hide render cost
+            _, image = render_chart(dict(spec, title=f"Key Financial Metrics {i}"), dpi=dpi)
+        elapsed = (time.perf_counter() - started) / runs
+        size = build_pdf(Image(BytesIO(image), width=6 * inch, height=3.6 * inch))
+        print(f"matplotlib png @{dpi} dpi: {elapsed * 1000:7.1f} ms/chart, PDF {size / 1024:6.1f} KB")
+
+    started = time.perf_counter()
+    for i in range(runs):
+        drawing = render_drawing(dict(spec, title=f"Key Financial Metrics {i}"), 6 * inch, 3.6 * inch)
+        build_pdf(drawing)
+    elapsed = (time.perf_counter() - started) / runs
+    size = build_pdf(render_drawing(spec, 6 * inch, 3.6 * inch))
+    print(f"reportlab vector:        {elapsed * 1000:7.1f} ms/chart (incl. PDF build), PDF {size / 1024:6.1f} KB")
@@ -0,0 +1,148 @@
+# services/document_store.py
+"""Processed documents addressed by doc id.
+
+Every upload is stored under its own id, so concurrent users no longer
+overwrite each other's "current" document. The backing store is SQLite (WAL
+mode), which every worker process on the host shares; each process keeps a
+small LRU of hot documents in front of it, capped by an estimate of their
+size in memory.
+
+A doc id is a hash of the document text and its extraction (see
+document_id), so the content under an id never changes and cached copies
+cannot go stale across workers: a new extraction of the same text is a new
+document.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import zlib
+from collections import OrderedDict
+from datetime import datetime
+
+DOCUMENT_STORE_PATH = os.getenv("DOCUMENT_STORE_PATH", "documents.db")
+DOCUMENT_CACHE_MAX_BYTES = int(os.getenv("DOCUMENT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    doc_id TEXT PRIMARY KEY,
+    filename TEXT,
+    financial_data TEXT NOT NULL,
+    pdf_text BLOB NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_documents_created ON documents (created_at);
+"""
+
+
+def document_id(pdf_text, financial_data):
+    digest = hashlib.sha256(pdf_text.encode("utf-8"))
+    digest.update(b"\x00")
+    digest.update(json.dumps(financial_data, sort_keys=True, default=str).encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def _document_size(document):
+    # Rough in-memory footprint: str payloads dominate
+    return len(document["pdf_text"]) + len(json.dumps(document["financial_data"])) + 256
+
+
+class DocumentStore:
+    """SQLite-backed document store with a bounded in-process LRU."""
+
+    def __init__(self, path=DOCUMENT_STORE_PATH, max_cache_bytes=DOCUMENT_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_cache_bytes = max_cache_bytes
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.cache = OrderedDict()
+        self.cache_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._connection().executescript(_SCHEMA)
+
+    def _connection(self):
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self.local.connection = connection
+        return connection
+
+    def _cache_put(self, document):
+        size = _document_size(document)
+        if size > self.max_cache_bytes:
+            return
+        with self.lock:
+            previous = self.cache.pop(document["doc_id"], None)
+            if previous is not None:
+                self.cache_bytes -= previous[1]
+            self.cache[document["doc_id"]] = (document, size)
+            self.cache_bytes += size
+            while self.cache_bytes > self.max_cache_bytes:
+                _, (_, evicted_size) = self.cache.popitem(last=False)
+                self.cache_bytes -= evicted_size
+
+    def put(self, doc_id, filename, financial_data, pdf_text):
+        """Store a processed document and return it."""
+        document = {
+            "doc_id": doc_id,
+            "filename": filename,
+            "financial_data": financial_data,
+            "pdf_text": pdf_text,
+            "created_at": datetime.now().isoformat()
+        }
+        connection = self._connection()
+        with connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO documents (doc_id, filename, financial_data, pdf_text, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (doc_id, filename, json.dumps(financial_data), zlib.compress(pdf_text.encode("utf-8")),
+                 document["created_at"]))
+        self._cache_put(document)
+        return document
+
+    def get(self, doc_id):
+        """The document stored under doc_id, or None."""
+        with self.lock:
+            cached = self.cache.get(doc_id)
+            if cached is not None:
+                self.cache.move_to_end(doc_id)
+                self.hits += 1
+                return cached[0]
+            self.misses += 1
+
+        row = self._connection().execute(
+            "SELECT doc_id, filename, financial_data, pdf_text, created_at FROM documents WHERE doc_id = ?",
+            (doc_id,)).fetchone()
+        if row is None:
+            return None
+        document = {
+            "doc_id": row[0],
+            "filename": row[1],
+            "financial_data": json.loads(row[2]),
+            "pdf_text": zlib.decompress(row[3]).decode("utf-8"),
+            "created_at": row[4]
+        }
+        self._cache_put(document)
+        return document
+
+    def latest_id(self):
+        """Id of the most recently uploaded document, shared by all workers (any user's)."""
+        row = self._connection().execute(
+            "SELECT doc_id FROM documents ORDER BY created_at DESC LIMIT 1").fetchone()
+        return row[0] if row else None
+
+    def stats(self):
+        with self.lock:
+            cache = {
+                "documents": len(self.cache),
+                "bytes": self.cache_bytes,
+                "max_bytes": self.max_cache_bytes,
+                "hits": self.hits,
+                "misses": self.misses
+            }
+        total = self._connection().execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+        return {"documents": total, "cache": cache}
@@ -0,0 +1,223 @@
+# services/extraction_cascade.py
+"""Cheap-first extraction cascade.
+
+A local model (Ollama or GPT4All) extracts first. Its output is validated for
+schema completeness and numeric consistency, and only the fields that fail
+are escalated to the remote model. The repaired data is validated again, and
+documents the local model cannot handle at all, or that still fail after the
+repair, go to the remote model in full.
+"""
+import os
+import threading
+import time
+
+from services.json_parsing import missing_fields
+from services.normalization import to_amount
+
+CASCADE_BACKEND = os.getenv("EXTRACTION_CASCADE_BACKEND", "")  # "ollama", "gpt4all" or "" (disabled)
+# Long filings (10-Ks) overflow small local context windows, send them straight to the remote model
+CASCADE_MAX_LOCAL_CHARS = int(os.getenv("EXTRACTION_CASCADE_MAX_LOCAL_CHARS", "60000"))
+# Fraction of schema fields allowed to fail before the whole document is escalated
+CASCADE_MAX_FAILED_RATIO = float(os.getenv("EXTRACTION_CASCADE_MAX_FAILED_RATIO", "0.5"))
+REMOTE_COST_PER_1K_TOKENS = float(os.getenv("REMOTE_COST_PER_1K_TOKENS", "0"))
+BALANCE_TOLERANCE = 0.05
+
+# (name, fields involved, predicate over parsed amounts)
+CONSISTENCY_CHECKS = [
+    ("gross_profit <= total_revenue",
+     ["revenue_data.total_revenue", "profitability.gross_profit"],
+     lambda revenue, gross: gross <= revenue),
+    ("operating_profit <= gross_profit",
+     ["profitability.gross_profit", "profitability.operating_profit"],
+     lambda gross, operating: operating <= gross),
+    ("net_income <= total_revenue",
+     ["revenue_data.total_revenue", "profitability.net_income"],
+     lambda revenue, net: net <= revenue),
+    ("assets = liabilities + equity",
+     ["financial_position.total_assets", "financial_position.total_liabilities",
+      "financial_position.shareholders_equity"],
+     lambda assets, liabilities, equity: abs(assets - (liabilities + equity)) <= BALANCE_TOLERANCE * abs(assets)),
+    ("cash_position <= total_assets",
+     ["financial_position.total_assets", "financial_position.cash_position"],
+     lambda assets, cash: cash <= assets),
+]
+
+
+_MISSING = object()
+
+
+def _get_path(data, path, default=None):
+    for key in path.split("."):
+        if not isinstance(data, dict) or key not in data:
+            return default
+        data = data[key]
+    return data
+
+
+def validate_financial_data(data, schema):
+    """Check an extraction for missing fields and inconsistent numbers."""
+    missing = missing_fields(data, schema)
+    inconsistent = []
+    for name, fields, check in CONSISTENCY_CHECKS:
+        amounts = [to_amount(_get_path(data, field)) for field in fields]
+        if any(amount is None for amount in amounts):
+            continue
+        if not check(*amounts):
+            inconsistent.append({"check": name, "fields": fields})
+
+    failing = list(missing)
+    for failure in inconsistent:
+        failing += [field for field in failure["fields"] if field not in failing]
+
+    return {"missing": missing, "inconsistent": inconsistent, "failing_fields": failing}
+
+
+def _leaf_count(schema):
+    return sum(_leaf_count(spec) if isinstance(spec, dict) else 1 for spec in schema.values())
+
+
+class CascadeStats:
+    """Running counters for the cascade dashboard."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.documents = 0
+        self.accepted_local = 0
+        self.escalated_fields_documents = 0
+        self.escalated_full_documents = 0
+        self.escalated_fields = 0
+        self.local_seconds = 0.0
+        self.remote_seconds = 0.0
+        self.remote_full_calls = 0
+        self.remote_full_seconds = 0.0
+        self.remote_tokens_saved = 0
+
+    def record(self, outcome, local_seconds, remote_seconds, escalated_fields=0, tokens_saved=0,
+               repair_seconds=0.0):
+        """repair_seconds: a field repair that did not save the document from full escalation."""
+        with self.lock:
+            self.documents += 1
+            self.local_seconds += local_seconds
+            self.remote_seconds += remote_seconds + repair_seconds
+            self.escalated_fields += escalated_fields
+            self.remote_tokens_saved += tokens_saved
+            if outcome == "local":
+                self.accepted_local += 1
+            elif outcome == "fields":
+                self.escalated_fields_documents += 1
+            else:
+                self.escalated_full_documents += 1
+                self.remote_full_calls += 1
+                self.remote_full_seconds += remote_seconds
+
+    def snapshot(self):
+        with self.lock:
+            avg_remote = self.remote_full_seconds / self.remote_full_calls if self.remote_full_calls else None
+            escalated = self.escalated_fields_documents + self.escalated_full_documents
+            saved_seconds = None
+            if avg_remote is not None:
+                # What the same documents would have cost going straight to the remote model
+                saved_seconds = avg_remote * self.documents - (self.local_seconds + self.remote_seconds)
+            return {
+                "backend": CASCADE_BACKEND or None,
+                "documents": self.documents,
+                "accepted_local": self.accepted_local,
+                "escalated_fields_documents": self.escalated_fields_documents,
+                "escalated_full_documents": self.escalated_full_documents,
+                "escalation_rate": escalated / self.documents if self.documents else 0.0,
+                "escalated_fields": self.escalated_fields,
+                "local_seconds": round(self.local_seconds, 3),
+                "remote_seconds": round(self.remote_seconds, 3),
+                "latency_saved_seconds_estimate": round(saved_seconds, 3) if saved_seconds is not None else None,
+                "remote_tokens_saved_estimate": self.remote_tokens_saved,
+                "cost_saved_estimate": round(self.remote_tokens_saved / 1000 * REMOTE_COST_PER_1K_TOKENS, 4),
+            }
+
+
+cascade_stats = CascadeStats()
+
+
+def local_generate(prompt, schema_json, max_tokens=1024):
+    """Run the prompt on the configured local backend."""
+    if CASCADE_BACKEND == "ollama":
+        from services.ollama_service import ask_ollama
+        return ask_ollama(prompt, model=os.getenv("EXTRACTION_CASCADE_OLLAMA_MODEL", "deepseek-r1:1.5b"),
+                          format=schema_json)
+    if CASCADE_BACKEND == "gpt4all":
+        from services.gpt4all_service import generate_local
+        return generate_local(prompt, max_tokens=max_tokens)
+    raise ValueError(f"Unknown extraction cascade backend: {CASCADE_BACKEND}")
+
+
+def _set_path(data, path, value):
+    keys = path.split(".")
+    for key in keys[:-1]:
+        if not isinstance(data.get(key), dict):
+            data[key] = {}
+        data = data[key]
+    data[keys[-1]] = value
+
+
+def run_cascade(text, schema, local_extract, remote_extract, remote_repair):
+    """Extract with the local model first and escalate only what fails validation.
+
+    local_extract(text) -> (financial data dict, raw output), remote_extract(text)
+    -> extraction result dict, remote_repair(text, fields) -> dict holding the
+    requested fields. Returns (extraction result, cascade info).
+    """
+    # Rough prompt size in tokens for the remote call we would otherwise make
+    estimated_remote_tokens = len(text) // 4 + 1024
+    local_seconds = repair_seconds = 0.0
+
+    if len(text) <= CASCADE_MAX_LOCAL_CHARS:
+        started = time.perf_counter()
+        try:
+            local_data, raw_output = local_extract(text)
+        except Exception as e:
+            print(f"Local extraction failed: {e}")
+            local_data, raw_output = {}, ""
+        local_seconds = time.perf_counter() - started
+
+        validation = validate_financial_data(local_data, schema)
+        failing = validation["failing_fields"]
+        result = {
+            "financial_data": local_data,
+            "extraction_success": bool(local_data),
+            "extraction_complete": True,
+            "repaired_fields": [],
+            "raw_model_output": raw_output
+        }
+
+        if local_data and len(failing) <= CASCADE_MAX_FAILED_RATIO * _leaf_count(schema):
+            if not failing:
+                cascade_stats.record("local", local_seconds, 0.0, tokens_saved=estimated_remote_tokens)
+                return result, {"tier": "local", "validation": validation}
+
+            started = time.perf_counter()
+            try:
+                repaired = remote_repair(text, failing)
+            except Exception as e:
+                print(f"Remote repair failed, escalating whole document: {e}")
+            else:
+                for field in failing:
+                    value = _get_path(repaired, field, _MISSING)
+                    # Only fields the repair returned; a null never replaces a local value
+                    if value is _MISSING or (value is None and _get_path(local_data, field) is not None):
+                        continue
+                    _set_path(local_data, field, value)
+                revalidation = validate_financial_data(local_data, schema)
+                still_failing = revalidation["failing_fields"]
+                if not still_failing:
+                    result["repaired_fields"] = failing
+                    # The document is still sent for the repair, only the output side shrinks
+                    cascade_stats.record("fields", local_seconds, time.perf_counter() - started,
+                                         escalated_fields=len(failing), tokens_saved=512)
+                    return result, {"tier": "local+remote_fields", "escalated_fields": failing,
+                                    "validation": validation}
+                print(f"Remote repair left fields failing, escalating whole document: {still_failing}")
+            repair_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    result = remote_extract(text)
+    cascade_stats.record("full", local_seconds, time.perf_counter() - started, repair_seconds=repair_seconds)
+    return result, {"tier": "remote"}
@@ -1,51 +1,35 @@
-from gpt4all import GPT4All
 import json
+import threading
+
+from prompts import FINANCIAL_METRICS_PROMPT
+from services.gpt4all_worker import MODEL_NAME, N_THREADS, WORKER_ADDRESS, worker_generate
+
+# Only used when no resident worker is configured (GPT4ALL_WORKER_ADDRESS)
+_llm = None
+_llm_lock = threading.Lock()
+
+
+def get_local_llm():
+    """Load the in-process model on first use."""
+    global _llm
+    if _llm is None:
+        from gpt4all import GPT4All
+        _llm = GPT4All(MODEL_NAME, n_threads=N_THREADS)
+    return _llm
+
+
+def generate_local(prompt: str, max_tokens: int = 1000) -> str:
+    """Generate on the resident worker if configured, otherwise in-process."""
+    if WORKER_ADDRESS:
+        return worker_generate(prompt, max_tokens=max_tokens)
+    # The model object is not safe to share between concurrent generations
+    with _llm_lock:
+        return get_local_llm().generate(prompt, max_tokens=max_tokens)
 
-llm = GPT4All("mistral-7b-instruct-v0.1.Q4_0.gguf")
-
-FINANCIAL_METRICS_PROMPT = """
-You are a senior financial analyst.
-Your task: extract **all possible financial metrics** from the text below.
-Be exhaustive — if a metric is mentioned anywhere, capture it, even if approximate.
-Do not summarize; capture raw values.
-
-Text:
-{context}
-
-Extract the following categories (add others if found):
-- Revenue (total, per product, per region, YoY, QoQ)
-- Profit (gross, operating, net)
-- Expenses (cost of goods sold, operating expenses, R&D, marketing, interest)
-- Margins (gross margin %, operating margin %, net margin %)
-- Assets & liabilities (total, current, non-current)
-- Cash flow (operating, investing, financing)
-- Debt (short-term, long-term)
-- Risks (financial, operational, market)
-- Forecasts (next quarter, year, multi-year, guidance changes)
-- Valuation metrics (P/E ratio, EPS, EBITDA, book value, market cap)
-- Any other numeric or percentage KPI relevant to finance
-
-Output JSON with this structure:
-{{
-  "revenue": [],
-  "profit": [],
-  "expenses": [],
-  "margins": [],
-  "assets_liabilities": [],
-  "cash_flow": [],
-  "debt": [],
-  "risks": [],
-  "forecasts": [],
-  "valuation_metrics": [],
-  "other": []
-}}
-
-Answer:
-"""
 
 def ask_local_llm(context: str) -> str:
-    prompt = FINANCIAL_METRICS_PROMPT.format(context=context)
-    output = llm.generate(prompt, max_tokens=1000)
+    prompt = FINANCIAL_METRICS_PROMPT.render(document=context)
+    output = generate_local(prompt, max_tokens=1000)
     print("LLM raw output:", output)
     return output.strip()
 
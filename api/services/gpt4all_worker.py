@@ -0,0 +1,175 @@
+# services/gpt4all_worker.py
+"""Resident GPT4All inference worker.
+
+Owns a single copy of the local model and serves generation requests from
+other processes over a local socket, so several API workers can share one
+model in RAM. Run it next to the API with:
+
+    python -m services.gpt4all_worker
+
+The socket exchanges pickled messages, so the worker and its clients must
+share a secret GPT4ALL_WORKER_AUTHKEY (e.g. `python -c "import secrets;
+print(secrets.token_hex(32))"`); neither side starts without one.
+"""
+import os
+import queue
+import threading
+import time
+from multiprocessing.connection import Client, Listener
+
+MODEL_NAME = os.getenv("GPT4ALL_MODEL", "mistral-7b-instruct-v0.1.Q4_0.gguf")
+N_THREADS = int(os.getenv("GPT4ALL_THREADS", "0")) or None
+N_BATCH = int(os.getenv("GPT4ALL_N_BATCH", "8"))
+# How many queued requests the inference loop drains in one go
+MAX_BATCH = int(os.getenv("GPT4ALL_MAX_BATCH", "8"))
+WORKER_ADDRESS = os.getenv("GPT4ALL_WORKER_ADDRESS", "")
+WORKER_AUTHKEY = os.getenv("GPT4ALL_WORKER_AUTHKEY", "").encode()
+
+
+def parse_address(address):
+    host, _, port = address.rpartition(":")
+    return (host or "127.0.0.1", int(port))
+
+
+def require_authkey(authkey):
+    # Unpickling input from an unauthenticated peer would let it run code on the host
+    if not authkey:
+        raise RuntimeError("GPT4ALL_WORKER_AUTHKEY must be set to a secret shared by the worker and the API")
+    return authkey
+
+
+class InferenceWorker:
+    """Serialises generation requests onto one resident model."""
+
+    def __init__(self, model_name=MODEL_NAME, n_threads=N_THREADS, n_batch=N_BATCH, max_batch=MAX_BATCH):
+        from gpt4all import GPT4All
+
+        self.llm = GPT4All(model_name, n_threads=n_threads)
+        self.model_name = model_name
+        self.n_batch = n_batch
+        self.max_batch = max_batch
+        self.requests = queue.Queue()
+        self.stats_lock = threading.Lock()
+        self.stats = {
+            "requests_served": 0,
+            "requests_deduplicated": 0,
+            "tokens_generated": 0,
+            "generation_seconds": 0.0,
+            "last_tokens_per_sec": 0.0,
+        }
+
+    def submit(self, prompt, max_tokens=1000, temp=0.7):
+        """Queue a generation and block until it has been served."""
+        done = threading.Event()
+        job = {"prompt": prompt, "max_tokens": max_tokens, "temp": temp, "done": done}
+        self.requests.put(job)
+        done.wait()
+        if "error" in job:
+            raise RuntimeError(job["error"])
+        return job["output"]
+
+    def get_stats(self):
+        with self.stats_lock:
+            stats = dict(self.stats)
+        seconds = stats["generation_seconds"]
+        stats["avg_tokens_per_sec"] = stats["tokens_generated"] / seconds if seconds else 0.0
+        stats["queue_depth"] = self.requests.qsize()
+        stats["model"] = self.model_name
+        return stats
+
+    def _generate(self, job):
+        tokens = []
+        started = time.perf_counter()
+        for token in self.llm.generate(job["prompt"], max_tokens=job["max_tokens"], temp=job["temp"],
+                                       n_batch=self.n_batch, streaming=True):
+            tokens.append(token)
+        elapsed = time.perf_counter() - started
+
+        with self.stats_lock:
+            self.stats["tokens_generated"] += len(tokens)
+            self.stats["generation_seconds"] += elapsed
+            self.stats["last_tokens_per_sec"] = len(tokens) / elapsed if elapsed else 0.0
+        return "".join(tokens)
+
+    def run_forever(self):
+        """Inference loop: drain up to max_batch jobs and serve identical prompts once."""
+        while True:
+            batch = [self.requests.get()]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self.requests.get_nowait())
+                except queue.Empty:
+                    break
+
+            groups = {}
+            for job in batch:
+                groups.setdefault((job["prompt"], job["max_tokens"], job["temp"]), []).append(job)
+
+            for jobs in groups.values():
+                try:
+                    output = self._generate(jobs[0])
+                    for job in jobs:
+                        job["output"] = output
+                except Exception as e:
+                    for job in jobs:
+                        job["error"] = str(e)
+                with self.stats_lock:
+                    self.stats["requests_served"] += len(jobs)
+                    self.stats["requests_deduplicated"] += len(jobs) - 1
+                for job in jobs:
+                    job["done"].set()
+
+
+def _handle_connection(worker, conn):
+    try:
+        while True:
+            try:
+                message = conn.recv()
+            except EOFError:
+                break
+
+            try:
+                if message.get("op") == "stats":
+                    conn.send({"ok": True, "stats": worker.get_stats()})
+                else:
+                    output = worker.submit(message["prompt"], message.get("max_tokens", 1000), message.get("temp", 0.7))
+                    conn.send({"ok": True, "output": output})
+            except Exception as e:
+                conn.send({"ok": False, "error": str(e)})
+    finally:
+        conn.close()
+
+
+def serve(address=WORKER_ADDRESS or "127.0.0.1:5055", authkey=WORKER_AUTHKEY):
+    """Load the model once and accept requests until interrupted."""
+    authkey = require_authkey(authkey)
+    worker = InferenceWorker()
+    threading.Thread(target=worker.run_forever, daemon=True).start()
+
+    with Listener(parse_address(address), backlog=64, authkey=authkey) as listener:
+        print(f"GPT4All worker serving {worker.model_name} on {address}")
+        while True:
+            conn = listener.accept()
+            threading.Thread(target=_handle_connection, args=(worker, conn), daemon=True).start()
+
+
+def request_worker(message, address=WORKER_ADDRESS, authkey=WORKER_AUTHKEY):
+    """Send one request to a running worker and return its reply."""
+    with Client(parse_address(address), authkey=require_authkey(authkey)) as conn:
+        conn.send(message)
+        reply = conn.recv()
+    if not reply.get("ok"):
+        raise RuntimeError(reply.get("error", "GPT4All worker request failed"))
+    return reply
+
+
+def worker_generate(prompt, max_tokens=1000, temp=0.7):
+    return request_worker({"op": "generate", "prompt": prompt, "max_tokens": max_tokens, "temp": temp})["output"]
+
+
+def worker_stats():
+    return request_worker({"op": "stats"})["stats"]
+
+
+if __name__ == "__main__":
+    serve()
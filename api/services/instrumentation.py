@@ -0,0 +1,204 @@
+# services/instrumentation.py
+"""Per-stage latency, token and cache metrics, exported in Prometheus format.
+
+span("stage") times one pipeline stage (PDF text extraction, each model
+call, market data fetches, chart rendering, the PDF build, ...) into the
+findoc_stage_seconds histogram. When SERVER_TIMING_ENABLED is on, the stage
+is also added to the current request's Server-Timing header. Request latency
+and model token usage are recorded alongside. Cache hit and miss counts come
+from the caches' own stats, read by collectors when /metrics is scraped.
+render_prometheus() produces the text exposition format.
+
+With INSTRUMENTATION_ENABLED=false, span returns a shared no-op context
+manager and every record function returns at once. Metrics are kept per
+process, so each worker of a multi-process server reports its own. Stages
+built in the batch report process pool are not recorded.
+"""
+import contextvars
+import os
+import threading
+import time
+from bisect import bisect_left
+
+INSTRUMENTATION_ENABLED = os.getenv("INSTRUMENTATION_ENABLED", "true").lower() == "true"
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "false").lower() == "true"
+
+# Seconds; cache hits take milliseconds, model calls and PDF builds tens of seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# (started, {stage: seconds} or None) for the request being handled in this context
+_request = contextvars.ContextVar("instrumentation_request", default=None)
+# Spans of one request can end on several threads (e.g. concurrent report sections)
+_stages_lock = threading.Lock()
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self.lock = threading.Lock()
+        self.values = {}
+
+    def inc(self, *labels, amount=1):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            values = list(self.values.items())
+        lines += [f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}" for labels, value in values]
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        self.series = {}  # labels -> [per-bucket counts (last one is +Inf), sum, count]
+
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            series = [(labels, list(counts), total, count) for labels, (counts, total, count) in self.series.items()]
+        for labels, counts, total, count in series:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+stage_seconds = Histogram("findoc_stage_seconds", "Time spent in a pipeline stage", ("stage",))
+request_seconds = Histogram("findoc_request_seconds", "HTTP request latency", ("endpoint", "method", "status"))
+llm_tokens = Counter("findoc_llm_tokens_total", "Model tokens used, by call purpose", ("purpose", "type"))
+
+METRICS = [stage_seconds, request_seconds, llm_tokens]
+_collectors = []
+
+
+def register_collector(collector):
+    """collector() -> [(name, type, help, [(labels dict, value), ...]), ...], called on every scrape."""
+    _collectors.append(collector)
+
+
+class _Span:
+    __slots__ = ("stage", "started")
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self.started
+        stage_seconds.observe(elapsed, self.stage)
+        current = _request.get()
+        if current is not None and current[1] is not None:
+            with _stages_lock:
+                current[1][self.stage] = current[1].get(self.stage, 0.0) + elapsed
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def span(stage):
+    """Context manager timing one pipeline stage."""
+    return _Span(stage) if INSTRUMENTATION_ENABLED else _NOOP_SPAN
+
+
+def record_tokens(purpose, response):
+    """Count the token usage reported on a chat completion response."""
+    if not INSTRUMENTATION_ENABLED:
+        return
+    usage = getattr(response, "usage", None)
+    for token_type in ("prompt", "completion"):
+        tokens = getattr(usage, f"{token_type}_tokens", None)
+        if isinstance(tokens, int):
+            llm_tokens.inc(purpose, token_type, amount=tokens)
+
+
+def start_request():
+    if INSTRUMENTATION_ENABLED:
+        _request.set((time.perf_counter(), {} if SERVER_TIMING_ENABLED else None))
+
+
+def finish_request(endpoint, method, status):
+    """Record the request's latency. Returns its Server-Timing header value, or None."""
+    current = _request.get()
+    if current is None:
+        return None
+    _request.set(None)
+    started, timings = current
+    elapsed = time.perf_counter() - started
+    request_seconds.observe(elapsed, endpoint, method, str(status))
+    if timings is None:
+        return None
+    entries = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in timings.items()]
+    entries.append(f"total;dur={elapsed * 1000:.1f}")
+    return ", ".join(entries)
+
+
+def render_prometheus():
+    lines = []
+    for metric in METRICS:
+        lines += metric.render()
+    for collector in _collectors:
+        try:
+            families = collector()
+        except Exception as e:
+            print(f"Metrics collector failed: {e}")
+            continue
+        for name, metric_type, help_text, samples in families:
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}"]
+            lines += [f"{name}{_labels(labels.keys(), labels.values())} {_number(value)}" for labels, value in samples]
+    return "\n".join(lines) + "\n"
+
+
+def stats():
+    return {"enabled": INSTRUMENTATION_ENABLED, "server_timing": SERVER_TIMING_ENABLED}
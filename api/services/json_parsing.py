@@ -0,0 +1,166 @@
+# services/json_parsing.py
+"""Tolerant JSON parsing for model output.
+
+Models wrap JSON in prose or code fences, leave trailing commas, or get cut
+off at max_tokens. Instead of giving up on the whole response, parse what is
+there and report which schema fields are still missing so they can be asked
+for again.
+"""
+import json
+import re
+
+_decoder = json.JSONDecoder()
+_FENCE_RE = re.compile(r"```(?:json)?\s*(.*?)```", re.DOTALL)
+_TRAILING_COMMA_RE = re.compile(r",\s*([}\]])")
+
+
+def _close_truncated(fragment):
+    """Cut a truncated JSON fragment back to its last complete value and close it."""
+    stack = []
+    in_string = False
+    string_is_key = False
+    escaped = False
+    previous = ""
+    # Position after the last complete value, with the bracket stack at that point
+    last_good = None
+
+    for i, ch in enumerate(fragment):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+                previous = ch
+                # A string that ends a value (not a key) is a safe cut point
+                if not string_is_key:
+                    last_good = (i + 1, list(stack))
+            continue
+
+        if ch.isspace():
+            continue
+
+        if ch == '"':
+            in_string = True
+            string_is_key = bool(stack) and stack[-1] == "}" and previous in "{,"
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+            last_good = (i + 1, list(stack))
+        elif ch in "}]":
+            if not stack:
+                break
+            stack.pop()
+            last_good = (i + 1, list(stack))
+            if not stack:
+                return fragment[:i + 1]
+        elif ch == ",":
+            last_good = (i, list(stack))
+        elif ch.isalnum() or ch in "-.+":
+            # Bare literal (number, true/false/null): good once it is terminated
+            j = i + 1
+            if j < len(fragment) and not (fragment[j].isalnum() or fragment[j] in "-.+"):
+                last_good = (j, list(stack))
+        previous = ch
+
+    if last_good is None:
+        return None
+
+    end, open_brackets = last_good
+    repaired = fragment[:end].rstrip().rstrip(",")
+    # A dangling key ("key": with no value) cannot be kept
+    repaired = re.sub(r',?\s*"[^"]*"\s*:\s*$', "", repaired)
+    return repaired + "".join(reversed(open_brackets))
+
+
+def parse_json_tolerant(raw_text):
+    """Parse the first JSON object in raw_text.
+
+    Returns (data, complete) where complete is False when the object had to
+    be recovered from a truncated or malformed response.
+    """
+    if not raw_text or not raw_text.strip():
+        return {}, False
+
+    fenced = _FENCE_RE.search(raw_text)
+    text = fenced.group(1) if fenced else raw_text
+
+    start = text.find("{")
+    if start == -1:
+        return {}, False
+    text = text[start:]
+
+    try:
+        data, _ = _decoder.raw_decode(text)
+        return data, True
+    except json.JSONDecodeError:
+        pass
+
+    cleaned = _TRAILING_COMMA_RE.sub(r"\1", text)
+    try:
+        data, _ = _decoder.raw_decode(cleaned)
+        return data, True
+    except json.JSONDecodeError:
+        pass
+
+    repaired = _close_truncated(cleaned)
+    if repaired:
+        try:
+            data = json.loads(_TRAILING_COMMA_RE.sub(r"\1", repaired))
+            if isinstance(data, dict):
+                return data, False
+        except json.JSONDecodeError:
+            pass
+
+    return {}, False
+
+
+def missing_fields(data, schema, prefix=""):
+    """List dotted paths of schema leaves that are absent from data.
+
+    Fields explicitly set to null are not missing: the model looked and found
+    nothing.
+    """
+    missing = []
+    for key, spec in schema.items():
+        path = f"{prefix}{key}"
+        if not isinstance(data, dict) or key not in data:
+            missing.append(path)
+        elif isinstance(spec, dict) and data[key] is not None:
+            missing.extend(missing_fields(data[key], spec, path + "."))
+    return missing
+
+
+def schema_subset(schema, paths):
+    """Build the part of a nested schema that covers the given dotted paths."""
+    subset = {}
+    for path in paths:
+        node, spec = subset, schema
+        keys = path.split(".")
+        for key in keys[:-1]:
+            spec = spec[key]
+            node = node.setdefault(key, {})
+        node[keys[-1]] = spec[keys[-1]]
+    return subset
+
+
+def merge_json(base, update):
+    """Recursively fill base with values from update."""
+    merged = dict(base)
+    for key, value in update.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = merge_json(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+def to_json_schema(schema):
+    """Turn a nested {key: description} template into a JSON Schema for constrained decoding."""
+    if isinstance(schema, dict):
+        return {
+            "type": ["object", "null"],
+            "properties": {key: to_json_schema(spec) for key, spec in schema.items()},
+            "required": list(schema),
+        }
+    return {"type": ["string", "number", "null"], "description": str(schema)}
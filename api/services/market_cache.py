@@ -0,0 +1,121 @@
+# services/market_cache.py
+"""TTL caches with request coalescing for market data lookups.
+
+Company-name -> symbol mappings barely change and are kept for a day;
+quotes and fundamentals go stale quickly and are kept for minutes. When
+several requests ask for the same key at once, only the first one calls the
+provider and the others wait for its result (single flight).
+
+Empty results (no symbol found, often a rate-limited or failing search)
+are only kept for a short negative TTL, so a transient failure does not
+turn into a day of "not found".
+"""
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+SYMBOL_TTL_SECONDS = float(os.getenv("MARKET_SYMBOL_TTL_SECONDS", str(24 * 3600)))
+QUOTE_TTL_SECONDS = float(os.getenv("MARKET_QUOTE_TTL_SECONDS", "300"))
+EMPTY_TTL_SECONDS = float(os.getenv("MARKET_EMPTY_TTL_SECONDS", "60"))
+MARKET_CACHE_MAX_ENTRIES = int(os.getenv("MARKET_CACHE_MAX_ENTRIES", "5000"))
+
+
+class TTLCache:
+    """Thread-safe TTL cache whose loads are coalesced per key.
+
+    Failed loads are not cached: the exception goes to every waiter and the
+    next call tries again.
+    """
+
+    def __init__(self, ttl, max_entries=MARKET_CACHE_MAX_ENTRIES, empty_ttl=EMPTY_TTL_SECONDS):
+        self.ttl = ttl
+        self.empty_ttl = empty_ttl
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.entries = {}   # key -> (expires_at, value)
+        self.inflight = {}  # key -> Future
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def get_or_load(self, key, loader):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self.hits += 1
+                return entry[1]
+            future = self.inflight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                self.misses += 1
+                future = self.inflight[key] = Future()
+                leader = True
+
+        if not leader:
+            return future.result()
+
+        try:
+            value = loader()
+        except BaseException as e:
+            with self.lock:
+                del self.inflight[key]
+            future.set_exception(e)
+            raise
+
+        self.put(key, value)
+        with self.lock:
+            del self.inflight[key]
+        future.set_result(value)
+        return value
+
+    def _evict(self):
+        now = time.monotonic()
+        expired = [key for key, (expires_at, _) in self.entries.items() if expires_at <= now]
+        for key in expired:
+            del self.entries[key]
+        # Still full: drop the entries closest to expiry
+        if len(self.entries) >= self.max_entries:
+            for key, _ in sorted(self.entries.items(), key=lambda item: item[1][0])[:len(self.entries) // 10 + 1]:
+                del self.entries[key]
+
+    def get(self, key):
+        """Fresh cached value or None, without loading."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self.lock:
+            if len(self.entries) >= self.max_entries:
+                self._evict()
+            ttl = self.ttl if value else min(self.ttl, self.empty_ttl)
+            self.entries[key] = (time.monotonic() + ttl, value)
+
+    def invalidate(self, key=None):
+        with self.lock:
+            if key is None:
+                self.entries.clear()
+            else:
+                self.entries.pop(key, None)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "ttl_seconds": self.ttl,
+                "empty_ttl_seconds": self.empty_ttl,
+                "entries": len(self.entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced
+            }
+
+
+symbol_cache = TTLCache(SYMBOL_TTL_SECONDS)
+quote_cache = TTLCache(QUOTE_TTL_SECONDS)
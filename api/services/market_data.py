@@ -0,0 +1,390 @@
+# services/market_data.py
+"""Concurrent, batched company info fetching with per-symbol deadlines.
+
+Providers that can answer many symbols in one upstream request (yahooquery's
+multi-symbol Ticker) get a single batch call; the others are fetched
+concurrently on a bounded pool. Every symbol gets a deadline, and results
+come back per symbol with a status, so one slow ticker no longer holds up
+the rest.
+
+The provider behind all of it is pluggable (MARKET_DATA_PROVIDER): live
+Yahoo, a replay of recorded fixtures, or synthetic data, each optionally
+wrapped with reproducible latency injection, so report endpoints can be
+load-tested on an air-gapped box. Offline benchmark of the fetcher:
+python services/market_data.py
+"""
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+MARKET_FETCH_WORKERS = int(os.getenv("MARKET_FETCH_WORKERS", "8"))
+MARKET_FETCH_DEADLINE_SECONDS = float(os.getenv("MARKET_FETCH_DEADLINE_SECONDS", "8"))
+
+INFO_FIELDS = {
+    'longName': 'longName',
+    'sector': 'sector',
+    'industry': 'industry',
+    'website': 'website',
+    'description': 'longBusinessSummary',
+    'marketCap': 'marketCap',
+    'regularMarketPrice': 'regularMarketPrice',
+    'regularMarketChangePercent': 'regularMarketChangePercent',
+    'trailingPE': 'trailingPE',
+    'forwardPE': 'forwardPE',
+    'beta': 'beta',
+    'dividendYield': 'dividendYield',
+    'profitMargins': 'profitMargins',
+    'revenueGrowth': 'revenueGrowth',
+    'earningsGrowth': 'earningsGrowth',
+    'debtToEquity': 'debtToEquity',
+    'returnOnEquity': 'returnOnEquity',
+    'currentRatio': 'currentRatio',
+    'quickRatio': 'quickRatio'
+}
+
+# yahooquery modules whose fields, merged, match the keys of yfinance's Ticker.info
+_YAHOOQUERY_MODULES = ["summaryProfile", "summaryDetail", "financialData", "defaultKeyStatistics", "price"]
+
+_executor = ThreadPoolExecutor(max_workers=MARKET_FETCH_WORKERS, thread_name_prefix="market-data")
+
+
+def company_data_from_info(symbol, info):
+    """The company dict the report code expects, from a yfinance-style info dict."""
+    company_data = {'symbol': symbol}
+    for field, source in INFO_FIELDS.items():
+        company_data[field] = info.get(source, 'N/A')
+    return company_data
+
+
+class MarketDataProvider:
+    """Interface every market data backend implements.
+
+    search(query) -> list of symbols, fetch_info(symbol) -> company data dict
+    (see company_data_from_info), fetch_batch(symbols) -> {symbol: company
+    data or Exception}. Backends that answer a batch in one upstream request
+    set supports_batch so fetch_company_infos uses it.
+    """
+
+    name = "base"
+    supports_batch = False
+
+    def search(self, query):
+        raise NotImplementedError
+
+    def fetch_info(self, symbol):
+        raise NotImplementedError
+
+    def fetch_batch(self, symbols):
+        results = {}
+        for symbol in symbols:
+            try:
+                results[symbol] = self.fetch_info(symbol)
+            except Exception as e:
+                results[symbol] = e
+        return results
+
+
+class YahooProvider(MarketDataProvider):
+    """yahooquery for search and batches, yfinance for single symbols."""
+
+    name = "yahoo"
+    supports_batch = True
+
+    def search(self, query):
+        from yahooquery import search
+        results = search(query)
+        return [quote['symbol'] for quote in results.get('quotes', [])]
+
+    def fetch_info(self, symbol):
+        import yfinance as yf
+        return company_data_from_info(symbol, yf.Ticker(symbol).info)
+
+    def fetch_batch(self, symbols):
+        from yahooquery import Ticker
+        response = Ticker(symbols).get_modules(_YAHOOQUERY_MODULES)
+        results = {}
+        for symbol in symbols:
+            modules = response.get(symbol) if isinstance(response, dict) else None
+            if not isinstance(modules, dict):
+                results[symbol] = LookupError(modules or f"No data for {symbol}")
+                continue
+            info = {}
+            for name in _YAHOOQUERY_MODULES:
+                if isinstance(modules.get(name), dict):
+                    info.update(modules[name])
+            results[symbol] = company_data_from_info(symbol, info)
+        return results
+
+
+class FixtureProvider(MarketDataProvider):
+    """Replays responses recorded by RecordingProvider from a JSON file.
+
+    The file holds {"search": {normalised query: [symbols]}, "info": {symbol:
+    company data}}; anything not recorded raises LookupError.
+    """
+
+    name = "fixture"
+    supports_batch = True
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "r") as f:
+            fixture = json.load(f)
+        self.searches = fixture.get("search", {})
+        self.infos = fixture.get("info", {})
+
+    def search(self, query):
+        key = query.strip().lower()
+        if key not in self.searches:
+            raise LookupError(f"No recorded search for '{query}'")
+        return list(self.searches[key])
+
+    def fetch_info(self, symbol):
+        if symbol not in self.infos:
+            raise LookupError(f"No recorded info for {symbol}")
+        return dict(self.infos[symbol])
+
+    def fetch_batch(self, symbols):
+        return {symbol: dict(self.infos[symbol]) if symbol in self.infos
+                else LookupError(f"No recorded info for {symbol}") for symbol in symbols}
+
+
+class RecordingProvider(MarketDataProvider):
+    """Wraps a provider and appends every successful response to a fixture file."""
+
+    def __init__(self, provider, path):
+        self.provider = provider
+        self.path = path
+        self.name = f"{provider.name}+recording"
+        self.supports_batch = provider.supports_batch
+        self.lock = threading.Lock()
+        self.fixture = {"search": {}, "info": {}}
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                self.fixture.update(json.load(f))
+
+    def _save(self, section, key, value):
+        with self.lock:
+            self.fixture[section][key] = value
+            with open(self.path, "w") as f:
+                json.dump(self.fixture, f, indent=2)
+
+    def search(self, query):
+        symbols = self.provider.search(query)
+        self._save("search", query.strip().lower(), symbols)
+        return symbols
+
+    def fetch_info(self, symbol):
+        data = self.provider.fetch_info(symbol)
+        self._save("info", symbol, data)
+        return data
+
+    def fetch_batch(self, symbols):
+        results = self.provider.fetch_batch(symbols)
+        for symbol, data in results.items():
+            if isinstance(data, dict):
+                self._save("info", symbol, data)
+        return results
+
+
+class SyntheticProvider(MarketDataProvider):
+    """Deterministic made-up companies for any symbol, for offline load tests."""
+
+    name = "synthetic"
+    supports_batch = True
+
+    def search(self, query):
+        words = [word for word in query.upper().split() if word.isalnum()]
+        return [("".join(word[0] for word in words) if len(words) > 1 else "".join(words)[:4]) or "SYN"]
+
+    def fetch_info(self, symbol):
+        rng = random.Random(symbol)
+        return {
+            'symbol': symbol,
+            'longName': f"{symbol} Corporation",
+            'sector': rng.choice(["Technology", "Consumer Defensive", "Healthcare", "Energy"]),
+            'industry': "Synthetic",
+            'website': f"https://{symbol.lower()}.example.com",
+            'description': f"{symbol} is a synthetic company used for offline benchmarks.",
+            'marketCap': rng.randint(1, 3000) * 1e9,
+            'regularMarketPrice': round(rng.uniform(5, 900), 2),
+            'regularMarketChangePercent': round(rng.uniform(-0.05, 0.05), 4),
+            'trailingPE': round(rng.uniform(5, 60), 2),
+            'forwardPE': round(rng.uniform(5, 60), 2),
+            'beta': round(rng.uniform(0.2, 2.5), 2),
+            'dividendYield': round(rng.uniform(0, 0.06), 4),
+            'profitMargins': round(rng.uniform(-0.1, 0.4), 4),
+            'revenueGrowth': round(rng.uniform(-0.2, 0.5), 4),
+            'earningsGrowth': round(rng.uniform(-0.3, 0.6), 4),
+            'debtToEquity': round(rng.uniform(0, 300), 2),
+            'returnOnEquity': round(rng.uniform(-0.1, 1.5), 4),
+            'currentRatio': round(rng.uniform(0.5, 3), 2),
+            'quickRatio': round(rng.uniform(0.3, 2.5), 2)
+        }
+
+    def fetch_batch(self, symbols):
+        return {symbol: self.fetch_info(symbol) for symbol in symbols}
+
+
+class LatencyInjector(MarketDataProvider):
+    """Adds reproducible latency (and optional failures) to every upstream request of a provider."""
+
+    def __init__(self, provider, latency=0.0, jitter=0.0, fail_rate=0.0, seed=0, supports_batch=None):
+        self.provider = provider
+        self.name = f"{provider.name}+latency"
+        self.latency = latency
+        self.jitter = jitter
+        self.fail_rate = fail_rate
+        self.supports_batch = provider.supports_batch if supports_batch is None else supports_batch
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+
+    def _delay(self, what):
+        with self.lock:
+            self.requests += 1
+            delay = self.latency + self.random.uniform(0, self.jitter)
+            failed = self.random.random() < self.fail_rate
+        time.sleep(delay)
+        if failed:
+            raise ConnectionError(f"Injected failure for {what}")
+
+    def search(self, query):
+        self._delay(query)
+        return self.provider.search(query)
+
+    def fetch_info(self, symbol):
+        self._delay(symbol)
+        return self.provider.fetch_info(symbol)
+
+    def fetch_batch(self, symbols):
+        self._delay("batch")
+        return self.provider.fetch_batch(symbols)
+
+
+def create_provider(name=None):
+    """Build the provider selected by MARKET_DATA_PROVIDER (yahoo, fixture or synthetic).
+
+    MARKET_DATA_FIXTURE_PATH is the fixture to replay; MARKET_DATA_RECORD_PATH
+    records live responses into a fixture; MARKET_DATA_LATENCY_MS,
+    MARKET_DATA_JITTER_MS and MARKET_DATA_FAIL_RATE inject latency and
+    failures (seeded by MARKET_DATA_SEED).
+    """
+    name = (name or os.getenv("MARKET_DATA_PROVIDER", "yahoo")).lower()
+    if name == "yahoo":
+        provider = YahooProvider()
+    elif name == "fixture":
+        provider = FixtureProvider(os.getenv("MARKET_DATA_FIXTURE_PATH", "market_fixture.json"))
+    elif name == "synthetic":
+        provider = SyntheticProvider()
+    else:
+        raise ValueError(f"Unknown market data provider: {name}")
+
+    record_path = os.getenv("MARKET_DATA_RECORD_PATH")
+    if record_path:
+        provider = RecordingProvider(provider, record_path)
+
+    latency = float(os.getenv("MARKET_DATA_LATENCY_MS", "0")) / 1000
+    jitter = float(os.getenv("MARKET_DATA_JITTER_MS", "0")) / 1000
+    fail_rate = float(os.getenv("MARKET_DATA_FAIL_RATE", "0"))
+    if latency or jitter or fail_rate:
+        provider = LatencyInjector(provider, latency, jitter, fail_rate, seed=int(os.getenv("MARKET_DATA_SEED", "0")))
+    return provider
+
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def get_provider():
+    global _provider
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                _provider = create_provider()
+    return _provider
+
+
+def set_provider(provider):
+    """Swap the process-wide provider (benchmarks, load tests)."""
+    global _provider
+    _provider = provider
+
+
+def _result(status, started, data=None, error=None):
+    return {"status": status, "data": data, "error": error, "elapsed": round(time.perf_counter() - started, 4)}
+
+
+def fetch_company_infos(symbols, provider=None, deadline=MARKET_FETCH_DEADLINE_SECONDS):
+    """Fetch company info for many symbols at once.
+
+    Returns {symbol: {"status": "ok" | "error" | "timeout", "data", "error",
+    "elapsed"}} in the order of symbols. Nothing waits past the deadline;
+    fetches that overrun keep running in the pool but are reported as
+    timeouts.
+    """
+    provider = provider or get_provider()
+    symbols = list(dict.fromkeys(symbols))
+    started = time.perf_counter()
+    if not symbols:
+        return {}
+
+    if getattr(provider, "supports_batch", False) and len(symbols) > 1:
+        future = _executor.submit(provider.fetch_batch, symbols)
+        done, _ = wait([future], timeout=deadline)
+        if not done:
+            return {symbol: _result("timeout", started, error="deadline exceeded") for symbol in symbols}
+        try:
+            batch = future.result()
+        except Exception as e:
+            return {symbol: _result("error", started, error=str(e)) for symbol in symbols}
+        results = {}
+        for symbol in symbols:
+            data = batch.get(symbol)
+            if isinstance(data, dict):
+                results[symbol] = _result("ok", started, data=data)
+            else:
+                results[symbol] = _result("error", started, error=str(data or "missing from batch response"))
+        return results
+
+    futures = {symbol: _executor.submit(provider.fetch_info, symbol) for symbol in symbols}
+    wait(list(futures.values()), timeout=deadline)
+    results = {}
+    for symbol, future in futures.items():
+        if not future.done():
+            future.cancel()
+            results[symbol] = _result("timeout", started, error="deadline exceeded")
+        elif future.exception() is not None:
+            results[symbol] = _result("error", started, error=str(future.exception()))
+        else:
+            results[symbol] = _result("ok", started, data=future.result())
+    return results
+
+
+if __name__ == "__main__":
+    symbols = [f"SYM{i}" for i in range(24)]
+
+    provider = LatencyInjector(SyntheticProvider(), latency=0.2, jitter=0.1)
+    started = time.perf_counter()
+    for symbol in symbols:
+        provider.fetch_info(symbol)
+    print(f"serial:     {time.perf_counter() - started:.2f}s for {len(symbols)} symbols")
+
+    for name, supports_batch in (("concurrent", False), ("batched", True)):
+        provider = LatencyInjector(SyntheticProvider(), latency=0.2, jitter=0.1, supports_batch=supports_batch)
+        started = time.perf_counter()
+        results = fetch_company_infos(symbols, provider=provider, deadline=2)
+        ok = sum(result["status"] == "ok" for result in results.values())
+        print(f"{name + ':':<11} {time.perf_counter() - started:.2f}s, {ok}/{len(symbols)} ok, "
+              f"{provider.requests} upstream requests")
+
+    provider = LatencyInjector(SyntheticProvider(), latency=0.2, jitter=1.5, fail_rate=0.1, seed=1,
+                               supports_batch=False)
+    started = time.perf_counter()
+    results = fetch_company_infos(symbols, provider=provider, deadline=0.5)
+    statuses = [result["status"] for result in results.values()]
+    print(f"deadline:   {time.perf_counter() - started:.2f}s with a 0.5s deadline, "
+          + ", ".join(f"{statuses.count(s)} {s}" for s in ("ok", "error", "timeout")))
@@ -0,0 +1,199 @@
+# services/market_snapshots.py
+"""Timestamped market data snapshots and the background job that keeps them fresh.
+
+Every company info fetch is stored as a snapshot, which gives point-in-time
+history, bounded per symbol by MARKET_SNAPSHOT_RETENTION_DAYS and
+MARKET_SNAPSHOT_MAX_PER_SYMBOL (0 disables either). A refresher thread re-fetches a watchlist (MARKET_WATCHLIST plus,
+optionally, the companies of ingested filings) on an interval, so report
+endpoints can read a recent snapshot of those symbols (keeps_fresh) instead
+of waiting on the provider. Other symbols are always fetched live (through
+the quote cache).
+
+With several worker processes only one of them refreshes per interval: the
+cycle is guarded by a lease row in the snapshot database.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+
+MARKET_SNAPSHOT_PATH = os.getenv("MARKET_SNAPSHOT_PATH", "market_snapshots.db")
+MARKET_SNAPSHOT_MAX_AGE_SECONDS = float(os.getenv("MARKET_SNAPSHOT_MAX_AGE_SECONDS", "3600"))
+MARKET_SNAPSHOT_RETENTION_DAYS = float(os.getenv("MARKET_SNAPSHOT_RETENTION_DAYS", "90"))
+MARKET_SNAPSHOT_MAX_PER_SYMBOL = int(os.getenv("MARKET_SNAPSHOT_MAX_PER_SYMBOL", "2000"))
+MARKET_REFRESH_ENABLED = os.getenv("MARKET_REFRESH_ENABLED", "false").lower() == "true"
+MARKET_REFRESH_INTERVAL_SECONDS = float(os.getenv("MARKET_REFRESH_INTERVAL_SECONDS", "900"))
+MARKET_WATCHLIST = [s.strip().upper() for s in os.getenv("MARKET_WATCHLIST", "").split(",") if s.strip()]
+MARKET_REFRESH_FILED_COMPANIES = os.getenv("MARKET_REFRESH_FILED_COMPANIES", "true").lower() == "true"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    symbol TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (symbol, fetched_at)
+);
+CREATE TABLE IF NOT EXISTS leases (
+    name TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+
+class SnapshotStore:
+    """SQLite store of (symbol, fetched_at, company data) rows."""
+
+    def __init__(self, path=MARKET_SNAPSHOT_PATH, retention_days=MARKET_SNAPSHOT_RETENTION_DAYS,
+                 max_per_symbol=MARKET_SNAPSHOT_MAX_PER_SYMBOL):
+        self.path = path
+        self.retention_days = retention_days
+        self.max_per_symbol = max_per_symbol
+        self.local = threading.local()
+        self._connection().executescript(_SCHEMA)
+
+    def _connection(self):
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self.local.connection = connection
+        return connection
+
+    def record(self, symbol, data, fetched_at=None):
+        connection = self._connection()
+        with connection:
+            connection.execute("INSERT OR REPLACE INTO snapshots (symbol, fetched_at, data) VALUES (?, ?, ?)",
+                               (symbol, fetched_at or time.time(), json.dumps(data)))
+            self._prune(connection, symbol)
+
+    def _prune(self, connection, symbol):
+        """Drop symbol's snapshots past the retention window or beyond the per-symbol cap."""
+        if self.retention_days > 0:
+            connection.execute("DELETE FROM snapshots WHERE symbol = ? AND fetched_at < ?",
+                               (symbol, time.time() - self.retention_days * 86400))
+        if self.max_per_symbol > 0:
+            connection.execute(
+                "DELETE FROM snapshots WHERE symbol = ? AND fetched_at < ("
+                "SELECT fetched_at FROM snapshots WHERE symbol = ? ORDER BY fetched_at DESC LIMIT 1 OFFSET ?)",
+                (symbol, symbol, self.max_per_symbol - 1))
+
+    def latest(self, symbol, max_age=None):
+        """(data, fetched_at) of the newest snapshot, or None if there is none younger than max_age."""
+        row = self._connection().execute(
+            "SELECT data, fetched_at FROM snapshots WHERE symbol = ? ORDER BY fetched_at DESC LIMIT 1",
+            (symbol,)).fetchone()
+        if row is None or (max_age is not None and time.time() - row[1] > max_age):
+            return None
+        return json.loads(row[0]), row[1]
+
+    def history(self, symbol, since=None, until=None, limit=100):
+        """Snapshots of symbol, newest first, as [{"fetched_at", "data"}]."""
+        clauses, params = ["symbol = ?"], [symbol]
+        if since is not None:
+            clauses.append("fetched_at >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("fetched_at <= ?")
+            params.append(until)
+        rows = self._connection().execute(
+            f"SELECT data, fetched_at FROM snapshots WHERE {' AND '.join(clauses)} "
+            "ORDER BY fetched_at DESC LIMIT ?", params + [limit]).fetchall()
+        return [{"fetched_at": datetime.fromtimestamp(fetched_at).isoformat(), "data": json.loads(data)}
+                for data, fetched_at in rows]
+
+    def acquire_lease(self, name, owner, ttl):
+        """Take (or renew) a named lease shared by every process using this database."""
+        now = time.time()
+        connection = self._connection()
+        with connection:
+            connection.execute(
+                "INSERT INTO leases (name, owner, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+                "WHERE leases.expires_at < ? OR leases.owner = excluded.owner",
+                (name, owner, now + ttl, now))
+            row = connection.execute("SELECT owner FROM leases WHERE name = ?", (name,)).fetchone()
+        return row is not None and row[0] == owner
+
+
+class MarketRefresher:
+    """Daemon thread that refreshes snapshots for the watched symbols on an interval.
+
+    fetch(symbols) -> {symbol: {"status", "data", ...}} as returned by
+    market_data.fetch_company_infos; watched_symbols() -> extra symbols to
+    refresh (e.g. companies with ingested filings).
+    """
+
+    def __init__(self, store, fetch, watched_symbols=None, interval=MARKET_REFRESH_INTERVAL_SECONDS,
+                 watchlist=MARKET_WATCHLIST):
+        self.store = store
+        self.fetch = fetch
+        self.watched_symbols = watched_symbols
+        self.interval = interval
+        self.watchlist = list(watchlist)
+        self.owner = uuid.uuid4().hex
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.last_run = None
+        self.last_result = {}
+        self.watched = frozenset()
+
+    def symbols(self):
+        symbols = list(self.watchlist)
+        if self.watched_symbols:
+            try:
+                symbols += self.watched_symbols()
+            except Exception as e:
+                print(f"Error collecting watched symbols: {e}")
+        return list(dict.fromkeys(symbols))
+
+    def refresh(self):
+        """Refresh every watched symbol once. Returns {symbol: status}."""
+        symbols = self.symbols()
+        self.watched = frozenset(symbols)
+        results = self.fetch(symbols) if symbols else {}
+        fetched_at = time.time()
+        for symbol, result in results.items():
+            if result["status"] == "ok":
+                self.store.record(symbol, result["data"], fetched_at)
+        self.last_run = datetime.fromtimestamp(fetched_at).isoformat()
+        self.last_result = {symbol: result["status"] for symbol, result in results.items()}
+        return self.last_result
+
+    def keeps_fresh(self, symbol):
+        """Whether the refresher is running and refreshes symbol (in any process)."""
+        return symbol in self.watched and self.thread is not None and self.thread.is_alive()
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            try:
+                # Slightly shorter than the interval so the owner keeps its lease
+                if self.store.acquire_lease("market_refresh", self.owner, self.interval * 0.9):
+                    self.refresh()
+                else:
+                    # Every process tracks the watched set, not only the one refreshing
+                    self.watched = frozenset(self.symbols())
+            except Exception as e:
+                print(f"Market data refresh failed: {e}")
+            self.stop_event.wait(self.interval)
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name="market-refresher", daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def stats(self):
+        return {
+            "running": self.thread is not None and self.thread.is_alive(),
+            "interval_seconds": self.interval,
+            "watchlist": self.watchlist,
+            "last_run": self.last_run,
+            "last_result": self.last_result
+        }
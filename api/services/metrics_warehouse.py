@@ -0,0 +1,317 @@
+# services/metrics_warehouse.py
+"""Columnar metrics warehouse over financial_data/*.json.
+
+One row per (company, filing, period, metric) with the normalized numeric
+value. Columns are NumPy arrays (strings dictionary-encoded as int codes)
+persisted to a single .npz file, and rebuilt incrementally: only extraction
+files that changed since the last sync are re-read.
+
+Every worker process keeps its own copy in memory. The .npz file is the
+shared state: a process reloads it whenever it changed on disk, and updates
+it read-modify-write under an exclusive file lock, so workers neither
+overwrite each other's rows nor miss new ones.
+"""
+import json
+import os
+import re
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # not on Windows; there the file lock is a no-op
+    fcntl = None
+
+from services.normalization import flatten_financial_data, normalize_values
+
+WAREHOUSE_FOLDER = os.getenv("METRICS_WAREHOUSE_FOLDER", "warehouse")
+
+_CATEGORICAL = ("company", "filing", "period", "metric", "currency")
+_NUMERIC = {"value": "f8", "is_percent": "?"}
+_AGGREGATES = ("sum", "mean", "min", "max", "count")
+_FILENAME_PERIOD_RE = re.compile(r"_(\d{4}(?:Q[1-4])?)_")
+
+
+def _company_from(filing, financial_data):
+    name = (financial_data.get("company_info") or {}).get("name") if isinstance(financial_data, dict) else None
+    if isinstance(name, str) and name.strip():
+        return name.strip()
+    return filing.split("_")[0]
+
+
+def _default_period(filing, financial_data):
+    fiscal_year = (financial_data.get("company_info") or {}).get("fiscal_year") if isinstance(financial_data, dict) else None
+    if isinstance(fiscal_year, (str, int)) and str(fiscal_year).strip():
+        return str(fiscal_year).strip()
+    match = _FILENAME_PERIOD_RE.search(filing)
+    return match.group(1) if match else ""
+
+
+def file_signature(path):
+    """What sync compares to decide whether a file changed."""
+    stat = os.stat(path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def rows_for_filing(filing, financial_data):
+    """Turn one extraction into warehouse rows (numeric leaves only)."""
+    items = flatten_financial_data(financial_data)
+    records = normalize_values([value for _, value in items])
+    keep = records["valid"]
+    company = _company_from(filing, financial_data)
+    default_period = _default_period(filing, financial_data)
+
+    periods = np.where(records["period"] != "", records["period"], default_period)[keep]
+    count = int(keep.sum())
+    return {
+        "company": [company] * count,
+        "filing": [filing] * count,
+        "period": periods.tolist(),
+        "metric": [path for (path, _), k in zip(items, keep) if k],
+        "currency": records["currency"][keep].tolist(),
+        "value": records["value"][keep],
+        "is_percent": records["is_percent"][keep],
+    }
+
+
+class MetricsWarehouse:
+    """In-memory columnar table with .npz persistence and a small query API."""
+
+    def __init__(self, folder=WAREHOUSE_FOLDER):
+        self.folder = folder
+        self.path = os.path.join(folder, "metrics.npz")
+        self.manifest_path = os.path.join(folder, "manifest.json")
+        self.lock_path = os.path.join(folder, ".lock")
+        self.lock = threading.Lock()
+        self.manifest = {}
+        self.stored_signature = None
+        self._empty()
+        with self._file_lock(exclusive=False):
+            self._load()
+
+    def _empty(self):
+        self.dictionaries = {name: [] for name in _CATEGORICAL}
+        self.lookup = {name: {} for name in _CATEGORICAL}
+        self.columns = {name: np.zeros(0, dtype="i4") for name in _CATEGORICAL}
+        self.columns.update({name: np.zeros(0, dtype=dtype) for name, dtype in _NUMERIC.items()})
+
+    def _disk_signature(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+    @contextmanager
+    def _file_lock(self, exclusive=True):
+        """Lock shared with the other processes using this folder."""
+        if fcntl is None or not (exclusive or os.path.isdir(self.folder)):
+            yield
+            return
+        os.makedirs(self.folder, exist_ok=True)
+        with open(self.lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _reload_if_changed(self):
+        """Pick up rows another process saved since this one last loaded or saved."""
+        if self._disk_signature() != self.stored_signature:
+            self._load()
+
+    def refresh(self):
+        """Reload the warehouse if another process changed it."""
+        if self._disk_signature() == self.stored_signature:
+            return
+        with self.lock, self._file_lock(exclusive=False):
+            self._reload_if_changed()
+
+    def _load(self):
+        self.stored_signature = self._disk_signature()
+        if self.stored_signature is None:
+            return
+        try:
+            # Built aside and swapped in, so a query running meanwhile sees either version whole
+            dictionaries, lookup, columns = {}, {}, {}
+            with np.load(self.path, allow_pickle=False) as stored:
+                for name in _CATEGORICAL:
+                    dictionaries[name] = stored[f"{name}_dict"].tolist()
+                    lookup[name] = {value: code for code, value in enumerate(dictionaries[name])}
+                    columns[name] = stored[name]
+                for name in _NUMERIC:
+                    columns[name] = stored[name]
+            with open(self.manifest_path, "r") as f:
+                self.manifest = json.load(f)
+            self.dictionaries, self.lookup, self.columns = dictionaries, lookup, columns
+        except Exception as e:
+            print(f"Error loading metrics warehouse, rebuilding: {e}")
+            self.manifest = {}
+            self._empty()
+
+    def _save(self):
+        os.makedirs(self.folder, exist_ok=True)
+        arrays = dict(self.columns)
+        for name in _CATEGORICAL:
+            arrays[f"{name}_dict"] = np.array(self.dictionaries[name], dtype=str)
+        tmp_path = self.path + ".tmp.npz"
+        np.savez_compressed(tmp_path, **arrays)
+        os.replace(tmp_path, self.path)
+        with open(self.manifest_path, "w") as f:
+            json.dump(self.manifest, f)
+        self.stored_signature = self._disk_signature()
+
+    def _encode(self, name, values):
+        lookup = self.lookup[name]
+        dictionary = self.dictionaries[name]
+        codes = np.empty(len(values), dtype="i4")
+        for i, value in enumerate(values):
+            code = lookup.get(value)
+            if code is None:
+                code = lookup[value] = len(dictionary)
+                dictionary.append(value)
+            codes[i] = code
+        return codes
+
+    def _drop_filings(self, filings):
+        codes = [self.lookup["filing"][f] for f in filings if f in self.lookup["filing"]]
+        if not codes:
+            return
+        keep = ~np.isin(self.columns["filing"], codes)
+        self.columns = {name: column[keep] for name, column in self.columns.items()}
+
+    def _append(self, rows):
+        # Swap in a new dict so concurrent queries always see columns of equal length
+        columns = dict(self.columns)
+        for name in _CATEGORICAL:
+            columns[name] = np.concatenate([columns[name], self._encode(name, rows[name])])
+        for name, dtype in _NUMERIC.items():
+            columns[name] = np.concatenate([columns[name], np.asarray(rows[name], dtype=dtype)])
+        self.columns = columns
+
+    def add_extraction(self, filing, financial_data, signature=None):
+        """Replace the rows of one filing with a fresh extraction."""
+        with self.lock, self._file_lock():
+            self._reload_if_changed()
+            self._drop_filings([filing])
+            self._append(rows_for_filing(filing, financial_data))
+            self.manifest[filing] = signature
+            self._save()
+
+    def sync(self, data_folder):
+        """Bring the warehouse in line with the extraction files in data_folder."""
+        if not os.path.isdir(data_folder):
+            return 0
+        current = {}
+        for entry in os.scandir(data_folder):
+            if entry.name.endswith(".json"):
+                current[entry.name] = file_signature(entry.path)
+
+        with self.lock, self._file_lock():
+            self._reload_if_changed()
+            changed = [name for name, signature in current.items() if self.manifest.get(name) != signature]
+            removed = [name for name in self.manifest if name not in current]
+            if not changed and not removed:
+                return 0
+
+            self._drop_filings(changed + removed)
+            for name in removed:
+                del self.manifest[name]
+            for name in changed:
+                try:
+                    with open(os.path.join(data_folder, name), "r") as f:
+                        stored = json.load(f)
+                    financial_data = stored.get("extraction_result", {}).get("financial_data", {})
+                    self._append(rows_for_filing(name, financial_data))
+                except Exception as e:
+                    print(f"Error loading {name} into metrics warehouse: {e}")
+                self.manifest[name] = current[name]
+            self._save()
+            return len(changed) + len(removed)
+
+    def _mask(self, columns, name, wanted, prefix=False):
+        dictionary = self.dictionaries[name]
+        wanted = [wanted] if isinstance(wanted, str) else list(wanted)
+        if prefix:
+            codes = [code for code, value in enumerate(dictionary)
+                     if any(value == w or value.startswith(w + ".") for w in wanted)]
+        else:
+            lowered = {w.lower() for w in wanted}
+            codes = [code for code, value in enumerate(dictionary) if value.lower() in lowered]
+        return np.isin(columns[name], codes)
+
+    def query(self, company=None, filing=None, period=None, metric=None, group_by=None, agg="sum",
+              include_percent=True):
+        """Filter rows and optionally group/aggregate them.
+
+        Filters accept a value or a list of values; metric also matches dotted
+        prefixes ("profitability" covers "profitability.net_income"). Without
+        group_by the matching rows are returned.
+        """
+        if agg not in _AGGREGATES:
+            raise ValueError(f"Unsupported aggregate '{agg}', use one of {', '.join(_AGGREGATES)}")
+
+        self.refresh()
+        columns = self.columns
+        mask = np.ones(len(columns["value"]), dtype=bool)
+        for name, wanted in (("company", company), ("filing", filing), ("period", period)):
+            if wanted:
+                mask &= self._mask(columns, name, wanted)
+        if metric:
+            mask &= self._mask(columns, "metric", metric, prefix=True)
+        if not include_percent:
+            mask &= ~columns["is_percent"]
+
+        if not group_by:
+            rows = np.flatnonzero(mask)
+            return [self._row(columns, i) for i in rows]
+
+        group_by = [group_by] if isinstance(group_by, str) else list(group_by)
+        for name in group_by:
+            if name not in _CATEGORICAL:
+                raise ValueError(f"Cannot group by '{name}'")
+
+        values = columns["value"][mask]
+        if not len(values):
+            return []
+        keys = np.stack([columns[name][mask] for name in group_by], axis=1)
+        unique_keys, inverse = np.unique(keys, axis=0, return_inverse=True)
+        inverse = inverse.ravel()
+
+        counts = np.bincount(inverse, minlength=len(unique_keys))
+        if agg == "count":
+            results = counts.astype("f8")
+        elif agg in ("sum", "mean"):
+            results = np.bincount(inverse, weights=values, minlength=len(unique_keys))
+            if agg == "mean":
+                results = results / counts
+        else:
+            order = np.argsort(inverse, kind="stable")
+            starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+            reducer = np.minimum if agg == "min" else np.maximum
+            results = reducer.reduceat(values[order], starts)
+
+        output = []
+        for key, result, count in zip(unique_keys, results, counts):
+            row = {name: self.dictionaries[name][code] for name, code in zip(group_by, key)}
+            row[agg] = float(result)
+            row["rows"] = int(count)
+            output.append(row)
+        return output
+
+    def _row(self, columns, i):
+        row = {name: self.dictionaries[name][columns[name][i]] for name in _CATEGORICAL}
+        row["value"] = float(columns["value"][i])
+        row["is_percent"] = bool(columns["is_percent"][i])
+        return row
+
+    def stats(self):
+        return {
+            "rows": int(len(self.columns["value"])),
+            "filings": len(self.manifest),
+            "companies": len(self.dictionaries["company"]),
+            "metrics": len(self.dictionaries["metric"]),
+        }
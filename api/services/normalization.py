@@ -0,0 +1,165 @@
+# services/normalization.py
+"""Financial value normalization engine.
+
+Model output carries values as free strings ("$1.2B", "(345)", "12.4%",
+"1,234 million", "EUR 3.1bn in Q2 2023"). This module turns them into typed
+records once, in NumPy-backed batches, so charts, reports and comparisons
+read numbers instead of re-parsing strings.
+"""
+import re
+from functools import lru_cache
+
+import numpy as np
+
+VALUE_DTYPE = np.dtype([
+    ("value", "f8"),        # signed amount in base units (percent values stay in percent points)
+    ("mantissa", "f8"),     # number as written
+    ("scale", "f8"),        # multiplier implied by B/M/K, "million", ...
+    ("negative", "?"),
+    ("is_percent", "?"),
+    ("currency", "U3"),
+    ("period", "U12"),
+    ("valid", "?"),
+])
+
+_SCALES = {
+    "t": 1e12, "tn": 1e12, "trillion": 1e12,
+    "b": 1e9, "bn": 1e9, "billion": 1e9,
+    "m": 1e6, "mm": 1e6, "mn": 1e6, "million": 1e6,
+    "k": 1e3, "thousand": 1e3,
+}
+_CURRENCIES = {"$": "USD", "usd": "USD", "us$": "USD", "€": "EUR", "eur": "EUR",
+               "£": "GBP", "gbp": "GBP", "¥": "JPY", "jpy": "JPY"}
+
+_NUMBER_RE = re.compile(
+    r"(?P<cur1>us\$|\$|€|£|¥|usd|eur|gbp|jpy)?\s*(?P<open>\()?\s*(?P<minus>[-−])?\s*"
+    r"(?P<cur>us\$|\$|€|£|¥|usd|eur|gbp|jpy)?\s*(?P<minus2>[-−])?\s*"
+    r"(?P<num>\d[\d,]*(?:\.\d+)?|\.\d+)\s*(?P<close>\))?"
+    r"(?:\s*(?P<scale>trillion|billion|million|thousand|tn|bn|mm|mn|t|b|m|k)\b)?\s*(?P<close2>\))?"
+    r"\s*(?P<pct>%|percent)?",
+    re.IGNORECASE,
+)
+_PERIOD_RES = [
+    (re.compile(r"\bQ([1-4])\s*(?:FY)?\s*'?(\d{4})\b", re.IGNORECASE), lambda m: f"Q{m.group(1)} {m.group(2)}"),
+    (re.compile(r"\b(\d{4})\s*Q([1-4])\b", re.IGNORECASE), lambda m: f"Q{m.group(2)} {m.group(1)}"),
+    (re.compile(r"\b(?:FY|fiscal(?: year)?)\s*'?(\d{4}|\d{2})\b", re.IGNORECASE),
+     lambda m: f"FY{m.group(1) if len(m.group(1)) == 4 else '20' + m.group(1)}"),
+    (re.compile(r"\b(19\d{2}|20\d{2})\b"), lambda m: m.group(1)),
+]
+_MISSING = {"", "n/a", "na", "none", "null", "-", "—", "not available", "not mentioned"}
+
+
+@lru_cache(maxsize=65536)
+def _parse_token(text):
+    """Parse one string into (mantissa, scale, negative, is_percent, currency, period, valid)."""
+    stripped = text.strip()
+    if stripped.lower() in _MISSING:
+        return 0.0, 1.0, False, False, "", "", False
+
+    period = ""
+    for pattern, fmt in _PERIOD_RES:
+        match = pattern.search(stripped)
+        if match:
+            period = fmt(match)
+            break
+
+    # Skip numbers that are just the period (e.g. the year in "FY2023 revenue of $1.2B")
+    for match in _NUMBER_RE.finditer(stripped):
+        num = match.group("num")
+        currency_symbol = match.group("cur") or match.group("cur1") or ""
+        if period and num.replace(",", "") in period and not (currency_symbol or match.group("scale")):
+            continue
+        mantissa = float(num.replace(",", ""))
+        scale_word = (match.group("scale") or "").lower()
+        currency = _CURRENCIES.get(currency_symbol.lower(), "")
+        negative = bool(match.group("open") and (match.group("close") or match.group("close2"))) or bool(
+            match.group("minus") or match.group("minus2"))
+        return (mantissa, _SCALES.get(scale_word, 1.0), negative, bool(match.group("pct")),
+                currency, period, True)
+
+    return 0.0, 1.0, False, False, "", period, False
+
+
+def normalize_values(values):
+    """Normalize a batch of raw values into a VALUE_DTYPE record array."""
+    count = len(values)
+    records = np.zeros(count, dtype=VALUE_DTYPE)
+    mantissa = np.zeros(count)
+    scale = np.ones(count)
+    negative = np.zeros(count, dtype=bool)
+    is_percent = np.zeros(count, dtype=bool)
+    valid = np.zeros(count, dtype=bool)
+    currency = [""] * count
+    period = [""] * count
+
+    for i, raw in enumerate(values):
+        if raw is None or isinstance(raw, bool):
+            continue
+        if isinstance(raw, (int, float, np.integer, np.floating)):
+            if np.isfinite(raw):
+                mantissa[i] = abs(raw)
+                negative[i] = raw < 0
+                valid[i] = True
+            continue
+        if isinstance(raw, str):
+            mantissa[i], scale[i], negative[i], is_percent[i], currency[i], period[i], valid[i] = _parse_token(raw)
+
+    # Arithmetic runs once over the whole batch
+    records["mantissa"] = mantissa
+    records["scale"] = scale
+    records["negative"] = negative
+    records["is_percent"] = is_percent
+    records["valid"] = valid
+    records["currency"] = currency
+    records["period"] = period
+    records["value"] = np.where(valid, mantissa * scale * np.where(negative, -1.0, 1.0), np.nan)
+    return records
+
+
+def flatten_financial_data(data, prefix=""):
+    """Flatten nested extraction output into (dotted path, leaf value) pairs."""
+    items = []
+    if isinstance(data, dict):
+        for key, value in data.items():
+            items += flatten_financial_data(value, f"{prefix}{key}.")
+    elif isinstance(data, list):
+        for i, value in enumerate(data):
+            items += flatten_financial_data(value, f"{prefix}{i}.")
+    else:
+        items.append((prefix.rstrip("."), data))
+    return items
+
+
+def normalize_document(financial_data):
+    """Normalize every leaf of one document. Returns (paths, records)."""
+    items = flatten_financial_data(financial_data)
+    return [path for path, _ in items], normalize_values([value for _, value in items])
+
+
+def normalize_corpus(documents):
+    """Normalize many documents in one batch.
+
+    documents maps a document id to its extraction output. Returns
+    (doc_ids, paths, records) as parallel arrays, one row per leaf value.
+    """
+    doc_ids, paths, values = [], [], []
+    for doc_id, financial_data in documents.items():
+        for path, value in flatten_financial_data(financial_data):
+            doc_ids.append(doc_id)
+            paths.append(path)
+            values.append(value)
+    return np.array(doc_ids, dtype=object), np.array(paths, dtype=object), normalize_values(values)
+
+
+def to_number(value):
+    """Signed numeric value of a single raw value, or None if it does not parse."""
+    record = normalize_values([value])[0]
+    return float(record["value"]) if record["valid"] else None
+
+
+def to_amount(value):
+    """Like to_number, but percentages are not amounts and give None."""
+    record = normalize_values([value])[0]
+    if not record["valid"] or record["is_percent"]:
+        return None
+    return float(record["value"])
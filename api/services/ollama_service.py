@@ -2,10 +2,16 @@
 import requests
 import json
 
-def ask_ollama(prompt, model="deepseek-r1:1.5b"):
+def ask_ollama(prompt, model="deepseek-r1:1.5b", format=None):
+    """Generate with Ollama; pass format="json" or a JSON Schema dict to constrain the output."""
+    payload = {"model": model, "prompt": prompt}
+    if format is not None:
+        # Constrained output has to come back as a single response object
+        payload["format"] = format
+        payload["stream"] = False
     response = requests.post(
         "http://localhost:11434/api/generate",
-        json={"model": model, "prompt": prompt}
+        json=payload
     )
     response.raise_for_status()
     # Get the raw text response
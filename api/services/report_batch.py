@@ -0,0 +1,113 @@
+# services/report_batch.py
+"""Batch report pipeline: overlapped I/O stages, CPU stages in a process pool.
+
+Each item goes through three stages:
+  prepare(item) -> (build_args, context)   I/O-bound (market data, LLM), run on a
+                                           bounded thread pool
+  build(*build_args) -> result             CPU-bound (charts, PDF build), run in a
+                                           process pool so it does not hold the GIL
+  finish(item, context, result) -> dict    bookkeeping, run in the caller's thread
+
+Items are prepared concurrently and each one is handed to the process pool
+as soon as it is ready, so the LLM calls of later items overlap the PDF
+builds of earlier ones. run_batch yields one event per item as it completes
+and a summary with the throughput at the end.
+
+Build workers are started with the "spawn" method by default
+(BATCH_REPORT_START_METHOD): forking a server that already runs threads can
+copy a lock held by another thread into the child and deadlock it.
+"""
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+BATCH_REPORT_CONCURRENCY = int(os.getenv("BATCH_REPORT_CONCURRENCY", "4"))
+# 0 builds in threads instead of worker processes
+BATCH_REPORT_PROCESSES = int(os.getenv("BATCH_REPORT_PROCESSES", str(min(4, os.cpu_count() or 1))))
+BATCH_REPORT_MAX_ITEMS = int(os.getenv("BATCH_REPORT_MAX_ITEMS", "200"))
+BATCH_REPORT_START_METHOD = os.getenv("BATCH_REPORT_START_METHOD", "spawn")  # "spawn" or "forkserver"
+
+_pool_lock = threading.Lock()
+_build_pool = None
+
+
+def get_build_pool(processes=BATCH_REPORT_PROCESSES):
+    """Process pool shared by every batch; workers are started once and reused."""
+    global _build_pool
+    with _pool_lock:
+        if _build_pool is None:
+            _build_pool = ProcessPoolExecutor(max_workers=processes,
+                                              mp_context=multiprocessing.get_context(BATCH_REPORT_START_METHOD))
+        return _build_pool
+
+
+def _discard_build_pool(pool):
+    # A worker died (e.g. killed for memory); the next batch starts a fresh pool
+    global _build_pool
+    with _pool_lock:
+        if _build_pool is pool:
+            _build_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def run_batch(items, prepare, build, finish, concurrency=BATCH_REPORT_CONCURRENCY,
+              processes=BATCH_REPORT_PROCESSES):
+    """Run items through prepare/build/finish. Yields {"event": "report", ...} per item
+    in completion order, then {"event": "summary", ...}."""
+    started = time.perf_counter()
+    item_started = {}
+    succeeded = failed = 0
+
+    io_pool = ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="report-batch")
+    build_pool = get_build_pool(processes) if processes > 0 else io_pool
+    pending = {}  # future -> (stage, index, context)
+
+    def event(index, status, **fields):
+        return dict({"event": "report", "index": index, "status": status,
+                     "elapsed_seconds": round(time.perf_counter() - item_started[index], 3)}, **fields)
+
+    try:
+        for index, item in enumerate(items):
+            item_started[index] = time.perf_counter()
+            pending[io_pool.submit(prepare, item)] = ("prepare", index, None)
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, index, context = pending.pop(future)
+                try:
+                    result = future.result()
+                    if stage == "prepare":
+                        build_args, context = result
+                        pending[build_pool.submit(build, *build_args)] = ("build", index, context)
+                        continue
+                    fields = finish(items[index], context, result)
+                except Exception as e:
+                    if isinstance(e, BrokenProcessPool) and build_pool is not io_pool:
+                        _discard_build_pool(build_pool)
+                        build_pool = get_build_pool(processes)
+                    failed += 1
+                    yield event(index, "error", stage=stage, error=str(e))
+                    continue
+                succeeded += 1
+                yield event(index, "ok", **fields)
+    finally:
+        # A client that disconnects mid-stream drops the queued items
+        for future in pending:
+            future.cancel()
+        io_pool.shutdown(wait=False, cancel_futures=True)
+
+    elapsed = time.perf_counter() - started
+    yield {
+        "event": "summary",
+        "total": len(items),
+        "succeeded": succeeded,
+        "failed": failed,
+        "elapsed_seconds": round(elapsed, 3),
+        "reports_per_minute": round(succeeded / elapsed * 60, 2) if elapsed > 0 else 0.0,
+        "concurrency": concurrency,
+        "processes": processes
+    }
@@ -0,0 +1,177 @@
+# services/report_build.py
+"""PDF report build: metrics tables, chart and template render.
+
+Everything a PDF report build needs, without the Flask app: importing this
+module opens no database, starts no thread and touches no file, so batch
+build workers (services/report_batch.py) can import it cheaply and safely.
+build_pdf_report takes plain data and writes the PDF into a staging folder;
+storing it is left to the caller.
+"""
+import os
+import re
+from datetime import datetime
+from io import BytesIO
+
+import numpy as np
+from reportlab.lib.units import inch
+from reportlab.platypus import Image
+
+from services.charts import render_chart, render_drawing, CHART_BACKEND
+from services.instrumentation import span
+from services.normalization import normalize_values, to_number
+from services.report_templates import FINANCIAL_REPORT_TEMPLATE, sections_from_text
+
+
+def format_number(value):
+    """Format large numbers for better readability."""
+    if value == 'N/A' or value is None or value == '':
+        return 'N/A'
+
+    num = to_number(value)
+    if num is None:
+        return str(value)
+    if num >= 1e12:
+        return f"${num / 1e12:.2f}T"
+    elif num >= 1e9:
+        return f"${num / 1e9:.2f}B"
+    elif num >= 1e6:
+        return f"${num / 1e6:.2f}M"
+    elif num >= 1e3:
+        return f"${num / 1e3:.2f}K"
+    else:
+        return f"${num:.2f}"
+
+
+def format_percentage(value):
+    """Format percentage values."""
+    if value == 'N/A' or value is None or value == '':
+        return 'N/A'
+    record = normalize_values([value])[0]
+    if not record['valid']:
+        return str(value)
+    num_val = float(record['value'])
+    # "12.4%" is already in percent points, bare ratios like 0.124 are not
+    if record['is_percent'] or abs(num_val) > 1:
+        return f"{num_val:.2f}%"
+    return f"{num_val * 100:.2f}%"
+
+
+def financial_chart_spec(data, chart_type="bar"):
+    """Chart spec (see services/charts.py) for up to six metrics."""
+    metrics = list(data.keys())[:6]  # Take first 6 metrics
+    # One normalization pass over all values, unparseable ones plot as 0
+    records = normalize_values([data[metric] for metric in metrics])
+    values = np.where(records['valid'], records['value'], 0.0).tolist()
+    return {
+        "type": chart_type,
+        "labels": metrics,
+        "values": values,
+        "title": "Key Financial Metrics",
+        "ylabel": "Value"
+    }
+
+
+def create_financial_chart_image(data, width, height, chart_type="bar"):
+    """Chart as a matplotlib PNG flowable."""
+    _, image = render_chart(financial_chart_spec(data, chart_type))
+    return Image(BytesIO(image), width=width, height=height)
+
+
+def create_financial_chart_flowable(data, width, height, chart_type="bar"):
+    """Chart as a PDF flowable: a vector Drawing, or a matplotlib PNG as fallback.
+
+    A Drawing that only fails while the PDF is built is handled by
+    build_pdf_report, which rebuilds with the PNG.
+    """
+    if CHART_BACKEND == "reportlab":
+        try:
+            return render_drawing(financial_chart_spec(data, chart_type), width, height)
+        except Exception as e:
+            print(f"Vector chart failed, falling back to matplotlib: {e}")
+    return create_financial_chart_image(data, width, height, chart_type)
+
+
+def report_company_rows(yahoo_data, company_name, symbol, report_date=None):
+    """Label/value rows of the report's company header."""
+    return [
+        ['Company:', yahoo_data.get('longName', company_name)],
+        ['Symbol:', symbol],
+        ['Sector:', yahoo_data.get('sector', 'N/A')],
+        ['Industry:', yahoo_data.get('industry', 'N/A')],
+        ['Report Date:', (report_date or datetime.now()).strftime('%B %d, %Y')]
+    ]
+
+
+def report_metric_rows(yahoo_data):
+    """Key financial metrics table of a report, header row first."""
+    return [
+        ['Metric', 'Value'],
+        ['Market Cap', format_number(yahoo_data.get('marketCap', 'N/A'))],
+        ['Current Price', f"${yahoo_data.get('regularMarketPrice', 'N/A')}"],
+        ['Daily Change', format_percentage(yahoo_data.get('regularMarketChangePercent', 'N/A'))],
+        ['P/E Ratio (TTM)', str(yahoo_data.get('trailingPE', 'N/A'))],
+        ['Forward P/E', str(yahoo_data.get('forwardPE', 'N/A'))],
+        ['Profit Margin', format_percentage(yahoo_data.get('profitMargins', 'N/A'))],
+        ['Revenue Growth', format_percentage(yahoo_data.get('revenueGrowth', 'N/A'))],
+        ['ROE', format_percentage(yahoo_data.get('returnOnEquity', 'N/A'))],
+        ['Debt-to-Equity', str(yahoo_data.get('debtToEquity', 'N/A'))],
+        ['Beta', str(yahoo_data.get('beta', 'N/A'))],
+        ['Dividend Yield', format_percentage(yahoo_data.get('dividendYield', 'N/A'))]
+    ]
+
+
+def report_chart_data(yahoo_data):
+    """Metrics plotted in the report chart."""
+    chart_fields = ['marketCap', 'trailingPE', 'profitMargins', 'returnOnEquity', 'beta']
+    records = normalize_values([yahoo_data.get(field) for field in chart_fields])
+    market_cap, trailing_pe, profit_margin, roe, beta = np.where(records['valid'], records['value'], 0.0).tolist()
+    return {
+        'Market Cap (B)': market_cap / 1e9,
+        'P/E Ratio': trailing_pe,
+        'Profit Margin (%)': profit_margin * 100,
+        'ROE (%)': roe * 100,
+        'Beta': beta
+    }
+
+
+def build_pdf_report(report_data, company_name, symbol, staging_dir):
+    """Build a report PDF into staging_dir from the precompiled report template.
+
+    report_data: {"report_text", "sections", "yahoo_data"}. Returns (filename, path).
+    """
+    safe_company_name = re.sub(r'[^a-zA-Z0-9_-]', '_', company_name)
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    filename = f"{safe_company_name}_{symbol}_Financial_Report_{timestamp}.pdf"
+    filepath = os.path.join(staging_dir, filename)
+
+    yahoo_data = report_data['yahoo_data']
+
+    # Add financial chart if we have data
+    chart_data = report_chart_data(yahoo_data)
+    chart = None
+    try:
+        with span("chart"):
+            chart = create_financial_chart_flowable(chart_data, 6 * inch, 3.6 * inch)
+    except Exception as e:
+        print(f"Error creating chart: {e}")
+
+    # Sectioned reports are already structured, no need to guess the headers
+    sections = report_data.get('sections') or sections_from_text(report_data['report_text'] or '')
+    data = {
+        "company_rows": report_company_rows(yahoo_data, company_name, symbol),
+        "metric_rows": report_metric_rows(yahoo_data),
+        "metrics_chart": chart,
+        "sections": sections
+    }
+
+    with span("pdf.build"):
+        try:
+            FINANCIAL_REPORT_TEMPLATE.render(filepath, data)
+        except Exception as e:
+            if chart is None or isinstance(chart, Image):
+                raise
+            # The vector chart failed to draw; rebuilding with the PNG is cheaper than failing the report
+            print(f"Vector chart failed in the PDF build, falling back to matplotlib: {e}")
+            data["metrics_chart"] = create_financial_chart_image(chart_data, 6 * inch, 3.6 * inch)
+            FINANCIAL_REPORT_TEMPLATE.render(filepath, data)
+    return filename, filepath
@@ -0,0 +1,110 @@
+# services/report_html.py
+"""HTML and Markdown report views for on-screen reading.
+
+Renders the same structured report data as the PDF template (company rows,
+metric rows, chart, sections) as a single self-contained page with the
+chart inlined as SVG, in a few milliseconds and without a ReportLab build.
+Views of a stored analysis never change, so their ETag is derived from the
+analysis id and the renderer version and a repeat view can be answered
+with a 304 before anything is rendered.
+"""
+import base64
+import hashlib
+from html import escape
+
+# Bump when the markup changes so cached views are not reused
+RENDERER_VERSION = "1"
+
+VIEW_FORMATS = {
+    "html": "text/html; charset=utf-8",
+    "markdown": "text/markdown; charset=utf-8",
+}
+
+_STYLE = """
+body{font-family:Helvetica,Arial,sans-serif;color:#333;max-width:860px;margin:2rem auto;padding:0 1rem;line-height:1.5}
+h1{color:#2E86AB;text-align:center;font-size:2rem}
+h2{color:#2E86AB;margin-top:2rem}
+h3{color:#4A4A4A}
+p{text-align:justify}
+table{border-collapse:collapse;margin:1rem 0;min-width:60%}
+td,th{border:1px solid #DDD;padding:.4rem .8rem;text-align:left;background:#F8F9FA}
+th{background:#2E86AB;color:#FFF}
+table.company td:first-child{color:#2E86AB;font-weight:bold}
+.chart svg{max-width:100%;height:auto}
+.download{display:inline-block;margin-top:1rem;color:#2E86AB}
+"""
+
+
+def view_etag(analysis_id, fmt):
+    return hashlib.sha256(f"{analysis_id}|{fmt}|{RENDERER_VERSION}".encode()).hexdigest()[:32]
+
+
+def _paragraphs(content):
+    return [paragraph.strip() for paragraph in content.split("\n") if paragraph.strip()]
+
+
+def render_html(view):
+    """view: {"title", "company_rows", "metric_rows", "chart_svg", "sections", "pdf_url"}."""
+    parts = [
+        "<!DOCTYPE html><html lang=\"en\"><head><meta charset=\"utf-8\">",
+        f"<meta name=\"viewport\" content=\"width=device-width, initial-scale=1\"><title>{escape(view['title'])}</title>",
+        f"<style>{_STYLE}</style></head><body>",
+        "<h1>FINANCIAL ANALYSIS REPORT</h1>",
+        "<table class=\"company\">",
+    ]
+    parts += [f"<tr><td>{escape(str(label))}</td><td>{escape(str(value))}</td></tr>"
+              for label, value in view["company_rows"]]
+    parts.append("</table><h2>KEY FINANCIAL METRICS</h2><table class=\"metrics\">")
+    header, *rows = view["metric_rows"]
+    parts.append("<tr>" + "".join(f"<th>{escape(str(cell))}</th>" for cell in header) + "</tr>")
+    parts += ["<tr>" + "".join(f"<td>{escape(str(cell))}</td>" for cell in row) + "</tr>" for row in rows]
+    parts.append("</table>")
+
+    if view.get("chart_svg"):
+        parts.append(f"<h2>FINANCIAL METRICS VISUALIZATION</h2><div class=\"chart\">{view['chart_svg']}</div>")
+
+    parts.append("<h2>DETAILED ANALYSIS</h2>")
+    for section in view["sections"]:
+        parts.append(f"<h3>{escape(section['title'])}</h3>")
+        parts += [f"<p>{escape(paragraph)}</p>" for paragraph in _paragraphs(section["content"])]
+
+    if view.get("pdf_url"):
+        parts.append(f"<a class=\"download\" href=\"{escape(view['pdf_url'])}\">Download PDF</a>")
+    parts.append("</body></html>")
+    return "".join(parts)
+
+
+def _markdown_cell(value):
+    return str(value).replace("|", "\\|").replace("\n", " ")
+
+
+def render_markdown(view):
+    """The same view as GitHub-flavoured Markdown; the chart is an SVG data URI image."""
+    lines = ["# FINANCIAL ANALYSIS REPORT", "", "| | |", "|---|---|"]
+    lines += [f"| **{_markdown_cell(label)}** | {_markdown_cell(value)} |" for label, value in view["company_rows"]]
+
+    header, *rows = view["metric_rows"]
+    lines += ["", "## KEY FINANCIAL METRICS", "",
+              "| " + " | ".join(_markdown_cell(cell) for cell in header) + " |",
+              "|" + "---|" * len(header)]
+    lines += ["| " + " | ".join(_markdown_cell(cell) for cell in row) + " |" for row in rows]
+
+    if view.get("chart_svg"):
+        data_uri = base64.b64encode(view["chart_svg"].encode("utf-8")).decode("ascii")
+        lines += ["", "## FINANCIAL METRICS VISUALIZATION", "",
+                  f"![Key Financial Metrics](data:image/svg+xml;base64,{data_uri})"]
+
+    lines += ["", "## DETAILED ANALYSIS"]
+    for section in view["sections"]:
+        lines += ["", f"### {section['title']}", ""]
+        lines += [line for paragraph in _paragraphs(section["content"]) for line in (paragraph, "")][:-1]
+
+    if view.get("pdf_url"):
+        lines += ["", f"[Download PDF]({view['pdf_url']})"]
+    return "\n".join(lines) + "\n"
+
+
+VIEW_RENDERERS = {
+    "html": render_html,
+    "markdown": render_markdown,
+}
@@ -0,0 +1,145 @@
+# services/symbol_index.py
+"""Local company name -> ticker index.
+
+Loaded from a listing CSV (symbol, name, exchange, aliases separated by
+"|"), bundled at data/symbols.csv and reloaded when the file changes, so a
+periodic job can drop a fresher listing in place. Names are normalised
+(case, punctuation, legal suffixes such as "Inc." or "Corporation") and
+matched exactly first, then by trigram similarity. Only names the index
+cannot place need the remote search.
+"""
+import csv
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+
+SYMBOL_LISTING_PATH = os.getenv(
+    "SYMBOL_LISTING_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "symbols.csv"))
+SYMBOL_MATCH_THRESHOLD = float(os.getenv("SYMBOL_MATCH_THRESHOLD", "0.55"))
+RELOAD_CHECK_SECONDS = 60
+
+_LEGAL_SUFFIXES = {
+    "inc", "incorporated", "corp", "corporation", "co", "company", "companies", "ltd", "limited", "plc",
+    "llc", "lp", "holdings", "holding", "group", "sa", "se", "nv", "ag", "the", "de", "class", "a", "b"
+}
+_NON_WORD_RE = re.compile(r"[^a-z0-9& ]+")
+
+
+def normalize_name(name):
+    """Lowercase, drop punctuation and legal suffixes: "The Home Depot, Inc." -> "home depot"."""
+    name = name.lower().replace("'", "").replace("’", "").replace(".com", "")
+    name = _NON_WORD_RE.sub(" ", name).replace("&", " and ")
+    words = [word for word in name.split() if word not in _LEGAL_SUFFIXES]
+    return " ".join(words)
+
+
+def _trigrams(compact):
+    padded = f"  {compact} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SymbolIndex:
+    """Exact and trigram lookups over a listing file."""
+
+    def __init__(self, path=SYMBOL_LISTING_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        self.mtime = None
+        self.next_check = 0.0
+        self.entries = []            # (symbol, name, exchange)
+        self.exact = {}              # compact name or symbol -> [entry ids]
+        self.grams = {}              # trigram -> set of key ids
+        self.keys = []               # (compact key, trigram count, entry id)
+        self.load()
+
+    def load(self):
+        """(Re)build the index from the listing file; keeps the old index if it is unreadable."""
+        try:
+            mtime = os.path.getmtime(self.path)
+            with open(self.path, newline="", encoding="utf-8") as f:
+                rows = list(csv.DictReader(f))
+        except Exception as e:
+            print(f"Error loading symbol listing {self.path}: {e}")
+            return False
+
+        entries, exact, grams, keys = [], defaultdict(list), defaultdict(set), []
+        for row in rows:
+            symbol = (row.get("symbol") or "").strip().upper()
+            name = (row.get("name") or "").strip()
+            if not symbol or not name:
+                continue
+            entry_id = len(entries)
+            entries.append((symbol, name, (row.get("exchange") or "").strip()))
+            exact[symbol.lower()].append(entry_id)
+
+            names = [name] + [alias for alias in (row.get("aliases") or "").split("|") if alias.strip()]
+            for compact in {normalize_name(n).replace(" ", "") for n in names}:
+                if not compact:
+                    continue
+                if entry_id not in exact[compact]:
+                    exact[compact].append(entry_id)
+                key_grams = _trigrams(compact)
+                key_id = len(keys)
+                keys.append((compact, len(key_grams), entry_id))
+                for gram in key_grams:
+                    grams[gram].add(key_id)
+
+        with self.lock:
+            self.entries, self.exact, self.grams, self.keys = entries, dict(exact), dict(grams), keys
+            self.mtime = mtime
+        return True
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now < self.next_check:
+            return
+        self.next_check = now + RELOAD_CHECK_SECONDS
+        try:
+            if os.path.getmtime(self.path) != self.mtime:
+                self.load()
+        except OSError:
+            pass
+
+    def lookup(self, name, limit=5):
+        """Best matches for a company name or ticker as [{"symbol", "name", "exchange", "score"}]."""
+        self._maybe_reload()
+        compact = normalize_name(name).replace(" ", "")
+        if not compact:
+            return []
+
+        with self.lock:
+            entries, exact, grams, keys = self.entries, self.exact, self.grams, self.keys
+
+        matched = exact.get(compact) or exact.get(name.strip().lower())
+        if matched:
+            return [self._match(entries[i], 1.0) for i in matched[:limit]]
+
+        # Dice coefficient over trigrams, computed only for keys sharing a trigram
+        query_grams = _trigrams(compact)
+        shared = defaultdict(int)
+        for gram in query_grams:
+            for key_id in grams.get(gram, ()):
+                shared[key_id] += 1
+
+        best = {}
+        for key_id, count in shared.items():
+            _, key_size, entry_id = keys[key_id]
+            score = 2.0 * count / (len(query_grams) + key_size)
+            if score >= SYMBOL_MATCH_THRESHOLD and score > best.get(entry_id, 0.0):
+                best[entry_id] = score
+
+        ranked = sorted(best.items(), key=lambda item: item[1], reverse=True)[:limit]
+        return [self._match(entries[entry_id], round(score, 3)) for entry_id, score in ranked]
+
+    @staticmethod
+    def _match(entry, score):
+        symbol, name, exchange = entry
+        return {"symbol": symbol, "name": name, "exchange": exchange, "score": score}
+
+    def stats(self):
+        return {"path": self.path, "symbols": len(self.entries), "keys": len(self.keys)}
+
+
+symbol_index = SymbolIndex()
@@ -5,6 +5,7 @@ import fitz  # PyMuPDF
 import os
 import json
 import re
+import uuid
 from dotenv import load_dotenv
 import yfinance as yf
 from yahooquery import search
@@ -20,6 +21,7 @@ import matplotlib.pyplot as plt
 import matplotlib.patches as mpatches
 from io import BytesIO
 import numpy as np
+from services.charts import render_chart
 
 # Load environment variables
 load_dotenv()
@@ -240,15 +242,10 @@ def create_financial_charts(yahoo_data, company_name):
   """Create beautiful financial charts for the PDF report."""
   charts = []
 
-  # Set up the style
-  plt.style.use('default')
   colors_palette = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd', '#8c564b']
 
   try:
     # Chart 1: Financial Health Pie Chart
-    fig1, ax1 = plt.subplots(figsize=(8, 6))
-
-    # Create financial health metrics
     metrics = []
     values = []
     colors_used = []
@@ -271,23 +268,17 @@ def create_financial_charts(yahoo_data, company_name):
       values.append(current_ratio * 10)  # Scale for visualization
       colors_used.append(colors_palette[2])
 
-    if values:
-      wedges, texts, autotexts = ax1.pie(values, labels=metrics, colors=colors_used,
-                                         autopct='', startangle=90, textprops={'fontsize': 10})
-      ax1.set_title(f'{company_name} - Financial Health Metrics', fontsize=14, fontweight='bold', pad=20)
-    else:
-      ax1.text(0.5, 0.5, 'Financial data not available', ha='center', va='center', transform=ax1.transAxes)
-      ax1.set_title(f'{company_name} - Financial Health Metrics', fontsize=14, fontweight='bold')
-
-    plt.tight_layout()
-    chart1_path = os.path.join(CHARTS_FOLDER, f'{company_name.replace(" ", "_")}_financial_health.png')
-    plt.savefig(chart1_path, dpi=300, bbox_inches='tight', facecolor='white')
-    plt.close()
-    charts.append(chart1_path)
+    charts.append(save_chart({
+      "type": "pie",
+      "labels": metrics,
+      "values": values,
+      "colors": colors_used,
+      "title": f'{company_name} - Financial Health Metrics',
+      "empty_text": 'Financial data not available',
+      "size": [8, 6]
+    }, company_name, "financial_health"))
 
     # Chart 2: Valuation Metrics Bar Chart
-    fig2, ax2 = plt.subplots(figsize=(10, 6))
-
     valuation_metrics = []
     valuation_values = []
 
@@ -309,24 +300,16 @@ def create_financial_charts(yahoo_data, company_name):
         valuation_metrics.append('Beta')
         valuation_values.append(abs(beta))
 
-    if valuation_values:
-      bars = ax2.bar(valuation_metrics, valuation_values, color=colors_palette[:len(valuation_values)])
-      ax2.set_title(f'{company_name} - Valuation Metrics', fontsize=14, fontweight='bold')
-      ax2.set_ylabel('Value', fontsize=12)
-
-      # Add value labels on bars
-      for bar, value in zip(bars, valuation_values):
-        ax2.text(bar.get_x() + bar.get_width() / 2, bar.get_height() + max(valuation_values) * 0.01,
-                 f'{value:.2f}', ha='center', va='bottom', fontweight='bold')
-    else:
-      ax2.text(0.5, 0.5, 'Valuation data not available', ha='center', va='center', transform=ax2.transAxes)
-      ax2.set_title(f'{company_name} - Valuation Metrics', fontsize=14, fontweight='bold')
-
-    plt.tight_layout()
-    chart2_path = os.path.join(CHARTS_FOLDER, f'{company_name.replace(" ", "_")}_valuation.png')
-    plt.savefig(chart2_path, dpi=300, bbox_inches='tight', facecolor='white')
-    plt.close()
-    charts.append(chart2_path)
+    charts.append(save_chart({
+      "type": "bar",
+      "labels": valuation_metrics,
+      "values": valuation_values,
+      "colors": colors_palette[:len(valuation_values)],
+      "title": f'{company_name} - Valuation Metrics',
+      "value_format": "{:.2f}",
+      "rotate_labels": False,
+      "empty_text": 'Valuation data not available'
+    }, company_name, "valuation"))
 
   except Exception as e:
     print(f"Error creating charts: {e}")
@@ -334,6 +317,22 @@ def create_financial_charts(yahoo_data, company_name):
   return charts
 
 
+def save_chart(spec, company_name, kind):
+  """Render a chart and write it under a name derived from its content.
+
+  Concurrent requests for the same company no longer overwrite each
+  other's files, and identical charts are written once.
+  """
+  key, image = render_chart(spec)
+  chart_path = os.path.join(CHARTS_FOLDER, f'{company_name.replace(" ", "_")}_{kind}_{key[:16]}.png')
+  if not os.path.exists(chart_path):
+    tmp_path = f"{chart_path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, 'wb') as f:
+      f.write(image)
+    os.replace(tmp_path, chart_path)
+  return chart_path
+
+
 def generate_ai_analysis(pdf_data, yahoo_data, company_name):
   """Generate AI-powered financial analysis for the PDF report."""
   try:
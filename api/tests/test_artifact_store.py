@@ -0,0 +1,118 @@
+import json
+import os
+
+import pytest
+
+from services.artifact_store import ArtifactStore, COMPRESSED_ENCODINGS
+from services.catalog import Catalog
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    return Catalog(str(tmp_path / "catalog.db"))
+
+
+def make_store(catalog, tmp_path, **options):
+    legacy_folders = {kind: str(tmp_path / kind) for kind in ("pdf_report", "pdf_data", "json_report")}
+    for folder in legacy_folders.values():
+        os.makedirs(folder, exist_ok=True)
+    options.setdefault("compression", "gzip")
+    return ArtifactStore(catalog, root=str(tmp_path / "artifacts"), legacy_folders=legacy_folders, **options)
+
+
+def put_report(store, company, index, payload=None):
+    filename = f"{company}_{index}.json"
+    store.put_json("json_report", filename, payload or {"company": company, "index": index},
+                   company_name=company, generated_at=f"2024-01-{index + 1:02d}T00:00:00")
+    return filename
+
+
+def test_retention_keeps_newest_per_company(catalog, tmp_path):
+    store = make_store(catalog, tmp_path, keep_per_company=2)
+    apple = [put_report(store, "Apple", i) for i in range(4)]
+    microsoft = [put_report(store, "Microsoft", i) for i in range(2)]
+
+    assert catalog.filenames("json_report") == set(apple[2:] + microsoft)
+    assert store.removed == 2
+
+
+def test_retention_ranks_by_generated_at_not_insertion_order(catalog, tmp_path):
+    store = make_store(catalog, tmp_path, keep_per_company=1)
+    put_report(store, "Apple", 5)
+    put_report(store, "Apple", 1)
+
+    assert catalog.filenames("json_report") == {"Apple_5.json"}
+
+
+def test_retention_expires_old_artifacts(catalog, tmp_path):
+    store = make_store(catalog, tmp_path, keep_per_company=0, max_age_days=30)
+    put_report(store, "Apple", 0)  # generated in 2024, long expired
+    store.put_json("json_report", "fresh.json", {"fresh": True}, company_name="Apple")
+
+    assert catalog.filenames("json_report") == {"fresh.json"}
+
+
+def test_shared_object_survives_until_last_reference(catalog, tmp_path):
+    store = make_store(catalog, tmp_path, keep_per_company=0)
+    payload = {"same": "content"}
+    stored = store.put_json("json_report", "a.json", payload, company_name="Apple")
+    store.put_json("json_report", "b.json", payload, company_name="Apple")
+    content_hash = stored["content_hash"]
+    variants = [store.object_path(content_hash, encoding) for encoding in COMPRESSED_ENCODINGS]
+
+    store._delete_rows([catalog.get("json_report", "a.json")])
+    assert os.path.exists(stored["path"])
+    assert store.read_json("json_report", "b.json") == payload
+
+    store._delete_rows([catalog.get("json_report", "b.json")])
+    assert not any(os.path.exists(path) for path in variants)
+
+
+def test_identity_object_kept_while_compressed_row_shares_hash(catalog, tmp_path):
+    store = make_store(catalog, tmp_path, keep_per_company=0)
+    data = b"%PDF-1.4 same bytes"
+    identity = store.put("pdf_report", "report.pdf", data, compress=False, company_name="Apple")
+    compressed = store.put("json_report", "copy.json", data, company_name="Apple")
+    assert identity["content_hash"] == compressed["content_hash"]
+
+    store._delete_rows([catalog.get("json_report", "copy.json")])
+    assert os.path.exists(identity["path"])
+    assert not os.path.exists(compressed["path"])
+
+
+def test_retention_removes_pdf_data_file_with_its_report(catalog, tmp_path):
+    store = make_store(catalog, tmp_path, keep_per_company=1)
+    for index in range(2):
+        store.put_json("pdf_data", f"data_{index}.json", {"index": index}, company_name="Apple")
+        store.put("pdf_report", f"report_{index}.pdf", f"%PDF {index}".encode(), compress=False,
+                  company_name="Apple", data_filename=f"data_{index}.json",
+                  generated_at=f"2024-01-0{index + 1}T00:00:00")
+
+    assert catalog.filenames("pdf_report") == {"report_1.pdf"}
+    assert catalog.filenames("pdf_data") == {"data_1.json"}
+
+
+def test_migrate_legacy_moves_files_into_store(catalog, tmp_path):
+    store = make_store(catalog, tmp_path, keep_per_company=0)
+    report = {"company": "Apple"}
+    legacy_report = tmp_path / "json_report" / "legacy.json"
+    legacy_report.write_text(json.dumps(report))
+    (tmp_path / "pdf_report" / "legacy.pdf").write_bytes(b"%PDF legacy")
+    (tmp_path / "pdf_data" / "legacy_data.json").write_text(json.dumps({"data": 1}))
+    catalog.record("json_report", "legacy.json", company_name="Apple", generated_at="2024-01-01T00:00:00")
+    catalog.record("pdf_report", "legacy.pdf", company_name="Apple", generated_at="2024-01-01T00:00:00",
+                   data_filename="legacy_data.json")
+    catalog.record("json_report", "missing.json", company_name="Apple")
+
+    assert store.migrate_legacy() == 2
+
+    assert not legacy_report.exists()
+    assert not (tmp_path / "pdf_data" / "legacy_data.json").exists()
+    assert store.read_json("json_report", "legacy.json") == report
+    assert store.read_json("pdf_data", "legacy_data.json") == {"data": 1}
+    row = catalog.get("pdf_report", "legacy.pdf")
+    assert row["encoding"] == "identity" and row["generated_at"] == "2024-01-01T00:00:00"
+    with store.open("pdf_report", "legacy.pdf") as f:
+        assert f.read() == b"%PDF legacy"
+    # A row whose legacy file is gone is left alone
+    assert catalog.get("json_report", "missing.json")["content_hash"] is None
@@ -0,0 +1,97 @@
+from services.extraction_cascade import run_cascade, validate_financial_data
+
+SCHEMA = {
+    "company_info": {"name": "", "sector": ""},
+    "revenue_data": {"total_revenue": ""},
+    "profitability": {"gross_profit": "", "net_income": ""},
+}
+
+LOCAL = {
+    "company_info": {"name": "Apple", "sector": "Technology"},
+    "revenue_data": {"total_revenue": "$100 million"},
+    "profitability": {"gross_profit": "$40 million", "net_income": "$20 million"},
+}
+
+REMOTE = {"financial_data": {"company_info": {"name": "Apple (remote)"}}, "extraction_success": True}
+
+
+def cascade(local_data, repair):
+    calls = {"repair": [], "remote": 0}
+
+    def local_extract(text):
+        return local_data, "raw"
+
+    def remote_extract(text):
+        calls["remote"] += 1
+        return dict(REMOTE)
+
+    def remote_repair(text, fields):
+        calls["repair"].append(list(fields))
+        return repair(fields)
+
+    result, info = run_cascade("document text", SCHEMA, local_extract, remote_extract, remote_repair)
+    return result, info, calls
+
+
+def with_fields(data, **sections):
+    merged = {section: dict(values) for section, values in data.items()}
+    for section, values in sections.items():
+        merged[section] = dict(merged.get(section, {}), **values)
+    return merged
+
+
+def test_valid_local_extraction_is_accepted():
+    result, info, calls = cascade(with_fields(LOCAL), lambda fields: {})
+    assert info["tier"] == "local"
+    assert calls == {"repair": [], "remote": 0}
+    assert result["extraction_complete"] is True
+
+
+def test_repair_fills_only_failing_fields():
+    local = with_fields(LOCAL)
+    del local["company_info"]["sector"]
+    result, info, calls = cascade(local, lambda fields: {"company_info": {"sector": "Technology"}})
+    assert info["tier"] == "local+remote_fields"
+    assert calls["repair"] == [["company_info.sector"]]
+    assert result["financial_data"]["company_info"] == {"name": "Apple", "sector": "Technology"}
+    assert result["repaired_fields"] == ["company_info.sector"]
+    assert calls["remote"] == 0
+
+
+def test_empty_repair_keeps_local_values_and_escalates():
+    # gross_profit > total_revenue fails a consistency check; both fields go to the repair
+    local = with_fields(LOCAL, profitability={"gross_profit": "$400 million"})
+    result, info, calls = cascade(local, lambda fields: {})
+    assert calls["repair"] == [["revenue_data.total_revenue", "profitability.gross_profit"]]
+    assert local["revenue_data"]["total_revenue"] == "$100 million"
+    assert info["tier"] == "remote"
+    assert calls["remote"] == 1
+    assert result["financial_data"] == REMOTE["financial_data"]
+
+
+def test_null_repair_does_not_replace_local_value():
+    local = with_fields(LOCAL, profitability={"gross_profit": "$400 million"})
+    result, info, calls = cascade(local, lambda fields: {"revenue_data": {"total_revenue": None},
+                                                        "profitability": {"gross_profit": None}})
+    assert local["profitability"]["gross_profit"] == "$400 million"
+    assert info["tier"] == "remote"
+
+
+def test_partial_repair_is_revalidated():
+    local = with_fields(LOCAL, profitability={"gross_profit": "$400 million"})
+    del local["company_info"]["sector"]
+    # The sector comes back, but the numbers are still inconsistent
+    result, info, calls = cascade(local, lambda fields: {"company_info": {"sector": "Technology"},
+                                                        "profitability": {"gross_profit": "$300 million"}})
+    assert validate_financial_data(local, SCHEMA)["inconsistent"]
+    assert info["tier"] == "remote"
+    assert calls["remote"] == 1
+
+
+def test_consistent_repair_is_accepted():
+    local = with_fields(LOCAL, profitability={"gross_profit": "$400 million"})
+    result, info, calls = cascade(local, lambda fields: {"profitability": {"gross_profit": "$40 million"}})
+    assert info["tier"] == "local+remote_fields"
+    assert result["extraction_complete"] is True
+    assert result["financial_data"]["profitability"]["gross_profit"] == "$40 million"
+    assert calls["remote"] == 0
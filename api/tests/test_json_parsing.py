@@ -0,0 +1,73 @@
+import json
+
+from services.json_parsing import _close_truncated, missing_fields, parse_json_tolerant
+
+
+def test_complete_object():
+    assert parse_json_tolerant('{"a": 1, "b": {"c": "x"}}') == ({"a": 1, "b": {"c": "x"}}, True)
+
+
+def test_prose_and_code_fence():
+    raw = 'Here is the data:\n```json\n{"revenue": 10}\n```\nHope this helps.'
+    assert parse_json_tolerant(raw) == ({"revenue": 10}, True)
+
+
+def test_trailing_commas():
+    assert parse_json_tolerant('{"a": [1, 2,], "b": 3,}') == ({"a": [1, 2], "b": 3}, True)
+
+
+def test_empty_and_non_json():
+    assert parse_json_tolerant("") == ({}, False)
+    assert parse_json_tolerant("no json here") == ({}, False)
+
+
+def test_truncated_inside_string_value_drops_it():
+    data, complete = parse_json_tolerant('{"company_info": {"name": "Apple", "sector": "Tech')
+    assert complete is False
+    assert data == {"company_info": {"name": "Apple"}}
+
+
+def test_truncated_after_key_drops_dangling_key():
+    data, complete = parse_json_tolerant('{"a": 1, "b": {"c": 2, "d":')
+    assert complete is False
+    assert data == {"a": 1, "b": {"c": 2}}
+
+
+def test_truncated_inside_key():
+    data, complete = parse_json_tolerant('{"a": "x", "lon')
+    assert complete is False
+    assert data == {"a": "x"}
+
+
+def test_truncated_number_is_not_kept_half_written():
+    # The number may have been cut mid-digits, so it is not trusted
+    data, complete = parse_json_tolerant('{"a": 1, "b": 12')
+    assert complete is False
+    assert data == {"a": 1}
+
+
+def test_truncated_inside_array():
+    data, complete = parse_json_tolerant('{"risks": ["supply", "fx", "rat')
+    assert complete is False
+    assert data == {"risks": ["supply", "fx"]}
+
+
+def test_escaped_quote_in_string():
+    data, complete = parse_json_tolerant('{"a": "say \\"hi\\"", "b": "cut')
+    assert complete is False
+    assert data == {"a": 'say "hi"'}
+
+
+def test_close_truncated_output_is_valid_json():
+    repaired = _close_truncated('{"a": {"b": [1, 2, {"c": true, "d": nul')
+    assert json.loads(repaired) == {"a": {"b": [1, 2, {"c": True}]}}
+
+
+def test_close_truncated_nothing_recoverable():
+    assert _close_truncated('"just a string') is None
+
+
+def test_missing_fields_after_recovery():
+    schema = {"company_info": {"name": "", "sector": ""}, "revenue_data": {"total": ""}}
+    data, _ = parse_json_tolerant('{"company_info": {"name": "Apple", "sector": null}, "revenue_da')
+    assert missing_fields(data, schema) == ["revenue_data"]
@@ -103,7 +103,12 @@ export default function Component() {
     setOverviewError(null)
     setFinancialOverview(null)
     try {
-      const res = await fetch('http://localhost:5000/company-overview')
+      // Set by the financial agent when this browser uploads a document
+      const docId = localStorage.getItem("findocDocId")
+      if (!docId) {
+        throw new Error("No financial documents uploaded yet")
+      }
+      const res = await fetch(`http://localhost:5000/company-overview?doc_id=${encodeURIComponent(docId)}`)
       if (!res.ok) {
         if (res.status === 400) {
           throw new Error("No financial documents uploaded yet")
@@ -51,6 +51,7 @@ interface Document {
     riskLevel: "low" | "medium" | "high"
   }
   financialData?: any // Store the complete financial data from API
+  docId?: string // doc_id returned by /upload-pdf; every API call about this document passes it
 }
 
 interface FinancialSummary {
@@ -107,6 +108,9 @@ export default function Component() {
     scrollToBottom()
   }, [messages])
 
+  // doc_id of the selected document, for the API calls about it
+  const selectedDocId = documents.find((doc) => doc.id === selectedDocumentId)?.docId
+
   // Function to handle document selection and fetch its financial data
   const handleDocumentSelect = async (document: Document) => {
     if (document.status !== "completed") return
@@ -127,8 +131,8 @@ export default function Component() {
         }
         setMessages((prev) => [...prev, systemMessage])
       } else {
-        // Fall back to general overview if no stored data
-        await fetchFinancialOverview()
+        // Fall back to the document's overview if no stored data
+        await fetchFinancialOverview(document.docId)
         
         // Add a system message indicating document switch
         const systemMessage: Message = {
@@ -231,9 +235,10 @@ export default function Component() {
   }, [messages])
 
   // Function to fetch financial overview from API
-  const fetchFinancialOverview = async () => {
+  const fetchFinancialOverview = async (docId?: string) => {
+    if (!docId) return
     try {
-      const response = await fetch('http://localhost:5000/company-overview')
+      const response = await fetch(`http://localhost:5000/company-overview?doc_id=${encodeURIComponent(docId)}`)
       if (response.ok) {
         const data = await response.json()
         // Update financial summary with real data if available
@@ -358,7 +363,7 @@ export default function Component() {
 
     try {
       // Call the API for Q&A
-      const response = await fetch(`http://localhost:5000/financial-qa?q=${encodeURIComponent(currentQuestion)}`)
+      const response = await fetch(`http://localhost:5000/financial-qa?q=${encodeURIComponent(currentQuestion)}&doc_id=${encodeURIComponent(selectedDocId ?? "")}`)
       
       if (!response.ok) {
         throw new Error('Failed to get response from API')
@@ -462,8 +467,11 @@ export default function Component() {
             category: result.financial_data?.company_info?.sector || "Financial Document",
             riskLevel: "low" as const,
           },
-          financialData: result.financial_data // Store the complete financial data
+          financialData: result.financial_data, // Store the complete financial data
+          docId: result.doc_id
         }
+        // The dashboard reads the overview of the last document uploaded in this browser
+        localStorage.setItem("findocDocId", result.doc_id)
         
         setDocuments((docs) =>
           docs.map((doc) =>
@@ -487,7 +495,7 @@ export default function Component() {
         setMessages((prev) => [...prev, aiMessage])
 
         // Fetch updated financial overview
-        await fetchFinancialOverview()
+        await fetchFinancialOverview(result.doc_id)
 
       } catch (error) {
         console.error('Upload error:', error)
@@ -558,7 +566,7 @@ export default function Component() {
       }, 500)
 
       // Call the PDF generation endpoint
-      const response = await fetch(`http://localhost:5000/generate-pdf-report?company=${encodeURIComponent(financialSummary.companyName)}`)
+      const response = await fetch(`http://localhost:5000/generate-pdf-report?company=${encodeURIComponent(financialSummary.companyName)}&doc_id=${encodeURIComponent(selectedDocId ?? "")}`)
       
       clearInterval(progressInterval)
       